@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, List
+
+import pytest
+
+# 导入服务端模块前设置：数据和索引放在临时目录，索引同步生成
+_ROOT = tempfile.mkdtemp(prefix="vvtr-test-")
+os.environ["API_DATA_PATH"] = os.path.join(_ROOT, "data")
+os.environ["USER_DATA_PATH"] = os.path.join(_ROOT, "data")
+os.environ["INDEX_PATH"] = os.path.join(_ROOT, "index")
+os.environ["ZONE_MAP_BACKGROUND"] = "0"
+os.environ["SYMBOL_STORE_BACKGROUND"] = "0"
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_ROOT, ignore_errors=True)
+
+
+HEADER = "id,symbol,interval,open,high,close,low,amount,volume,position,bob,eob,type,sequence"
+
+
+def bar_line(index: int, symbol: str, interval: str, bob: datetime, minutes: int, close: float = 10.0) -> str:
+    """生成一行K线数据，列见 HEADER"""
+    eob = bob + timedelta(minutes=minutes)
+    return (f"{index},{symbol},{interval},{close:.2f},{close + 0.1:.2f},{close:.2f},{close - 0.1:.2f},"
+            f"{close * 100:.1f},100,0,{bob:%Y-%m-%d %H:%M:%S}+0800,{eob:%Y-%m-%d %H:%M:%S}+0800,11,{index}")
+
+
+@pytest.fixture
+def write_csv() -> Callable[[Path, List[str]], Path]:
+    """写入带 HEADER 表头的CSV文件，自动创建目录"""
+    def write(path: Path, lines: List[str], header: str = HEADER) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("\n".join([header] + lines) + "\n", encoding="utf-8")
+        return path
+
+    return write
+
+
+@pytest.fixture
+def minute_files(tmp_path: Path, write_csv) -> List[Path]:
+    """3天的1m文件，每天 09:30 开始各 60 根K线，路径为 1m/<yyyyMM>/<yyyyMMdd>/600000.csv"""
+    paths = []
+    for day in (2, 3, 4):
+        start = datetime(2024, 1, day, 9, 30)
+        lines = [bar_line(day * 100 + i, "600000", "1m", start + timedelta(minutes=i), 1, 10 + i / 100)
+                 for i in range(60)]
+        paths.append(write_csv(tmp_path / "11" / "1m" / "202401" / f"202401{day:02d}" / "600000.csv", lines))
+    return paths
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.conftest import bar_line
+from vvtr_mcp_server.cal_data.bar_resampler import BarResampler
+from vvtr_mcp_server.cal_data.bar_series import BarSeries, np
+
+pytestmark = pytest.mark.skipif(np is None, reason="需要numpy")
+
+
+def load_series(tmp_path, write_csv, interval="1m", minutes=1):
+    """两个symbol各10根K线，09:30 开始，收盘价递增"""
+    start = datetime(2024, 1, 2, 9, 30)
+    paths = []
+    for symbol in ("600000", "600001"):
+        lines = [bar_line(i, symbol, interval, start + timedelta(minutes=i * minutes), minutes, 10 + i)
+                 for i in range(10)]
+        paths.append(write_csv(tmp_path / "11" / interval / "202401" / "20240102" / f"{symbol}.csv", lines))
+    return BarSeries.load(paths)
+
+
+@pytest.fixture
+def series(tmp_path, write_csv):
+    return load_series(tmp_path, write_csv)
+
+
+@pytest.mark.parametrize("interval, seconds", [("5m", 300), ("1h", 3600), ("1d", 86400), (" 2w ", 14 * 86400)])
+def test_parse_interval(interval, seconds):
+    assert BarResampler.parse_interval(interval)[0] == seconds
+
+
+@pytest.mark.parametrize("interval", ["", "5", "0m", "5s", "m5"])
+def test_parse_interval_rejects(interval):
+    with pytest.raises(ValueError):
+        BarResampler.parse_interval(interval)
+
+
+def test_base_span_from_interval_directory(series):
+    assert series.interval == "1m"
+    assert BarResampler.base_span(series) == 60
+
+
+def test_resample_5m(series):
+    bars = BarResampler.resample(series, "5m")
+    assert len(bars["symbol"]) == 4
+    assert list(bars["count"]) == [5, 5, 5, 5]
+    first = bars["symbol"] == bars["symbol"][0]
+    assert list(bars["open"][first]) == [10, 15]
+    assert list(bars["close"][first]) == [14, 19]
+    assert list(bars["high"][first]) == pytest.approx([14.1, 19.1])
+    assert list(bars["low"][first]) == pytest.approx([9.9, 14.9])
+    assert list(bars["volume"][first]) == [500, 500]
+    data, count = BarResampler.to_csv(series, bars, "5m", limit=3)
+    lines = data.splitlines()
+    assert count == 3 and lines[0] == BarResampler.HEADER
+    assert lines[1].startswith("600000,5m,10,") and "2024-01-02 09:30:00+0800,2024-01-02 09:35:00+0800,5" in lines[1]
+
+
+@pytest.mark.parametrize("interval", ["5m", "20m"])
+def test_resample_rejects_interval_not_multiple_of_base(tmp_path, write_csv, interval):
+    series = load_series(tmp_path, write_csv, "15m", 15)
+    assert BarResampler.base_span(series) == 900
+    with pytest.raises(ValueError):
+        BarResampler.resample(series, interval)
+    assert list(BarResampler.resample(series, "30m")["count"]) == [2] * 10
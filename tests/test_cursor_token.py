@@ -0,0 +1,31 @@
+import pytest
+
+from vvtr_mcp_server.util.cursor_token import CursorToken
+
+
+def test_round_trip():
+    query_hash = CursorToken.filter_hash("min", ["a.csv", "b.csv"], "2024-01-02 09:30:00", None)
+    token = CursorToken.encode(1, 123456789012, query_hash)
+    assert CursorToken.decode(token, query_hash) == (1, 123456789012)
+
+
+def test_empty_token_is_first_page():
+    assert CursorToken.decode("", 0) == (0, 0)
+
+
+def test_rejects_token_from_another_query():
+    token = CursorToken.encode(0, 10, CursorToken.filter_hash("min", ["a.csv"], None, None))
+    with pytest.raises(ValueError):
+        CursorToken.decode(token, CursorToken.filter_hash("min", ["b.csv"], None, None))
+
+
+@pytest.mark.parametrize("token", ["not-a-token", "AAAA", "!!!"])
+def test_rejects_malformed_token(token):
+    with pytest.raises(ValueError):
+        CursorToken.decode(token, 0)
+
+
+def test_filter_hash_keeps_list_boundaries():
+    assert CursorToken.filter_hash(["a", "b"], "c") != CursorToken.filter_hash(["a"], "b", "c")
+    assert CursorToken.filter_hash("day", None) == CursorToken.filter_hash("day", "")
+    assert CursorToken.filter_hash("day", "x") != CursorToken.filter_hash("min", "x")
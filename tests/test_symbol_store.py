@@ -0,0 +1,72 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from tests.conftest import bar_line
+from vvtr_mcp_server.util.symbol_store import SymbolStore
+
+
+@pytest.fixture
+def day_root(tmp_path, write_csv):
+    """5个日线文件，每天两个symbol"""
+    root = tmp_path / "11" / "1d"
+    for day in range(2, 7):
+        write_day(write_csv, root, day)
+    return root
+
+
+def write_day(write_csv, root, day, close=10.0, symbols=("600000", "600001")):
+    bob = datetime(2024, 1, day)
+    lines = [bar_line(day * 10 + i, symbol, "1d", bob, 1439, close) for i, symbol in enumerate(symbols)]
+    path = write_csv(root / "202401" / f"202401{day:02d}" / f"202401{day:02d}.csv", lines)
+    # 保证修改时间变化
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + day * 1000 + int(close * 1000)))
+    return path
+
+
+def day_paths(root, days):
+    return [root / "202401" / f"202401{day:02d}" / f"202401{day:02d}.csv" for day in days]
+
+
+def closes(selected):
+    return [[line.split(",")[5] for line in lines] if lines is not None else None for lines in selected]
+
+
+def test_select_after_rebuild(day_root):
+    SymbolStore.rebuild(day_root)
+    header, selected = SymbolStore.select(day_paths(day_root, range(2, 7)), "600001")
+    assert header.startswith("id,symbol")
+    assert [len(lines) for lines in selected] == [1] * 5
+    assert all(line.split(",")[1] == "600001" for lines in selected for line in lines)
+    assert SymbolStore.select(day_paths(day_root, [2]), "000001")[1] == [[]]
+
+
+def test_refresh_appends_later_day(day_root, write_csv):
+    SymbolStore.rebuild(day_root)
+    write_day(write_csv, day_root, 8, close=12.0)
+    _, selected = SymbolStore.select(day_paths(day_root, [6, 8]), "600000")
+    assert closes(selected) == [["10.00"], ["12.00"]]
+
+
+def test_refresh_remerges_changed_last_day(day_root, write_csv):
+    SymbolStore.rebuild(day_root)
+    write_day(write_csv, day_root, 6, close=13.0, symbols=("600000",))
+    _, selected = SymbolStore.select(day_paths(day_root, [5, 6]), "600000")
+    assert closes(selected) == [["10.00"], ["13.00"]]
+    _, selected = SymbolStore.select(day_paths(day_root, [5, 6]), "600001")
+    assert closes(selected) == [["10.00"], []]
+
+
+def test_changed_earlier_day_is_read_from_file(day_root, write_csv):
+    SymbolStore.rebuild(day_root)
+    write_day(write_csv, day_root, 3, close=14.0)
+    _, selected = SymbolStore.select(day_paths(day_root, [2, 3, 4]), "600000")
+    # 变化的日期由调用方读取原文件，其他日期仍使用合并数据
+    assert closes(selected) == [["10.00"], None, ["10.00"]]
+
+
+def test_select_rejects_unsorted_paths(day_root):
+    SymbolStore.rebuild(day_root)
+    assert SymbolStore.select(day_paths(day_root, [3, 2]), "600000") is None
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.conftest import bar_line
+from vvtr_mcp_server.util.time_seek import TimeSeek
+
+BOB_INDEX = 10
+
+
+@pytest.fixture
+def sorted_file(tmp_path, write_csv, monkeypatch):
+    """按 bob 排序的文件，中间夹着无法解析时间的行；缩小顺序查找的区间以覆盖二分查找"""
+    monkeypatch.setattr(TimeSeek, "LINEAR_BYTES", 256)
+    start = datetime(2024, 1, 2, 9, 30)
+    lines = []
+    for i in range(300):
+        lines.append(bar_line(i, "600000", "1m", start + timedelta(minutes=i), 1))
+        if i % 7 == 3:
+            lines.extend(["x,garbage"] * (i % 5 + 1))
+    return write_csv(tmp_path / "600000.csv", lines)
+
+
+def linear(path, target, after=False):
+    data = path.read_bytes()
+    offset = data.index(b"\n") + 1
+    for line in data[offset:].splitlines(keepends=True):
+        key = TimeSeek.parse_time(line, BOB_INDEX)
+        if key is not None and (key > target or (not after and key == target)):
+            return offset
+        offset += len(line)
+    return offset
+
+
+@pytest.mark.parametrize("after", [False, True])
+def test_seek_matches_linear_scan(sorted_file, after):
+    start = datetime(2024, 1, 2, 9, 30)
+    targets = [f"{start + timedelta(minutes=m):%Y-%m-%d %H:%M:%S}" for m in range(0, 300, 11)]
+    targets += ["2024-01-01 00:00:00", "2024-01-02 12:00:30", "2024-01-03 00:00:00"]
+    for target in targets:
+        assert TimeSeek.seek(sorted_file, BOB_INDEX, target, after) == linear(sorted_file, target, after), target
+
+
+def test_seek_past_end_returns_file_size(sorted_file):
+    assert TimeSeek.seek(sorted_file, BOB_INDEX, "2030-01-01 00:00:00") == sorted_file.stat().st_size
+
+
+def test_line_before_and_read_lines(sorted_file):
+    offset = TimeSeek.seek(sorted_file, BOB_INDEX, "2024-01-02 10:00:00")
+    previous = TimeSeek.line_before(sorted_file, offset)
+    assert TimeSeek.parse_time(previous.encode(), BOB_INDEX) < "2024-01-02 10:00:00"
+    lines = list(TimeSeek.read_lines(sorted_file, offset, BOB_INDEX, "2024-01-02 10:04:00"))
+    times = [TimeSeek.parse_time(line.encode(), BOB_INDEX) for line in lines]
+    assert [t for t in times if t is not None] == [f"2024-01-02 10:0{m}:00" for m in range(5)]
+    assert TimeSeek.line_before(sorted_file, TimeSeek.header_end(sorted_file)) is None
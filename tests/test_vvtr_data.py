@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+from tests.conftest import HEADER, bar_line
+from vvtr_mcp_server.cal_data.vvtr_data import VvtrData
+
+BOB_INDEX = 10
+
+
+def rows_of(paths):
+    """与 scan_rows 相同的行流：(文件序号, 行起始偏移, 行结束偏移, 数据行)"""
+    for i, path in enumerate(paths):
+        data = path.read_bytes()
+        offset = data.index(b"\n") + 1
+        for raw in data[offset:].splitlines(keepends=True):
+            yield i, offset, offset + len(raw), raw.decode().rstrip("\n")
+            offset += len(raw)
+
+
+def test_take_page_stops_at_count(minute_files):
+    reader = VvtrData()
+    lines, position = reader.take_page(minute_files, rows_of(minute_files), 70)
+    assert len(lines) == 70
+    assert lines[-1].split(",")[BOB_INDEX].startswith("2024-01-03 09:39")
+    # 下一页从第二个文件的第11行开始
+    next_line = minute_files[1].read_bytes()[position[1]:].decode().splitlines()[0]
+    assert position[0] == 1 and next_line.split(",")[BOB_INDEX].startswith("2024-01-03 09:40")
+
+
+def test_take_page_stops_at_max_bytes(minute_files):
+    reader = VvtrData()
+    lines, position = reader.take_page(minute_files, rows_of(minute_files), 1000, max_bytes=1000)
+    assert sum(len(line.encode()) + 1 for line in lines) <= 1000
+    next_line = minute_files[0].read_bytes()[position[1]:].decode().splitlines()[0]
+    assert position[0] == 0 and next_line not in lines
+
+
+def test_take_page_returns_at_least_one_row(minute_files):
+    lines, position = VvtrData().take_page(minute_files, rows_of(minute_files), 10, max_bytes=1)
+    assert len(lines) == 1 and position is not None
+
+
+def test_take_page_ends_at_header_change(minute_files, write_csv, tmp_path):
+    other = write_csv(tmp_path / "other.csv", [bar_line(1, "600000", "1m", datetime(2024, 1, 5, 9, 30), 1)],
+                      header=",".join(reversed(HEADER.split(","))))
+    paths = minute_files[:1] + [other]
+    lines, position = VvtrData().take_page(paths, rows_of(paths), 1000)
+    assert len(lines) == 60 and position == (1, 0)
+
+
+def test_take_page_reads_to_end(minute_files):
+    lines, position = VvtrData().take_page(minute_files, rows_of(minute_files), 1000)
+    assert len(lines) == 180 and position is None
+
+
+def test_min_data_pages_concatenate_to_full_read(minute_files):
+    reader = VvtrData()
+    start, end = "2024-01-02 10:00:00", "2024-01-04 09:45:00"
+    full = reader.get_min_data(minute_files, start, end, BOB_INDEX, count=10 ** 6).data
+    for count, max_bytes in ((1, 0), (17, 0), (500, 700)):
+        pages = []
+        file_index = offset = 0
+        while True:
+            page = reader.get_min_data(minute_files, start, end, BOB_INDEX, file_index, offset, count, max_bytes)
+            pages.append(page.data)
+            if not page.has_next:
+                break
+            file_index, offset = page.file_index, page.offset
+        assert "".join(pages) == full
+    first = datetime(2024, 1, 2, 9, 59)
+    assert full.splitlines()[0].split(",")[BOB_INDEX] == f"{first:%Y-%m-%d %H:%M:%S}+0800"
+    assert len(full.splitlines()) == 31 + 60 + 16
@@ -0,0 +1,58 @@
+import pytest
+
+from vvtr_mcp_server.util.zone_map import ZoneMap
+
+ZONE = {
+    "rows": 3,
+    "bob": ["2024-01-02 09:30:00", "2024-01-02 15:00:00"],
+    "days": ["2024-01-02", "2024-01-02"],
+    "created_at": None,
+    "unparsed": 0,
+    "symbols": ["600000", "600001"],
+    "bloom": None,
+}
+
+
+@pytest.mark.parametrize("start_key, end_key, expected", [
+    (None, None, True),
+    ("2024-01-02 10:00:00", "2024-01-02 11:00:00", True),
+    ("2024-01-02 15:00:00", None, True),
+    (None, "2024-01-02 09:30:00", True),
+    ("2024-01-02 15:00:01", None, False),
+    (None, "2024-01-02 09:29:59", False),
+])
+def test_matches_time_range(start_key, end_key, expected):
+    assert ZoneMap.matches(ZONE, "bob", start_key, end_key, None) is expected
+
+
+def test_matches_symbol_list():
+    assert ZoneMap.matches(ZONE, None, None, None, "600000")
+    assert not ZoneMap.matches(ZONE, None, None, None, "000001")
+    assert not ZoneMap.matches(ZONE, "days", "2024-01-02", "2024-01-02", "000001")
+
+
+def test_column_without_parsed_times_never_matches():
+    assert not ZoneMap.matches(ZONE, "created_at", None, None, None)
+
+
+def test_unparsed_tick_times_disable_time_pruning():
+    zone = dict(ZONE, created_at=["2024-01-02 09:30:00", "2024-01-02 09:31:00"], unparsed=1)
+    assert ZoneMap.matches(zone, "created_at", "2024-01-03 00:00:00", None, None)
+
+
+def test_bloom_has_no_false_negatives():
+    symbols = {f"{i:06d}" for i in range(ZoneMap.SYMBOL_LIMIT * 4)}
+    zone = dict(ZONE, symbols=None, bloom=ZoneMap._bloom(symbols))
+    assert all(ZoneMap.matches(zone, None, None, None, symbol) for symbol in symbols)
+    misses = sum(ZoneMap.matches(zone, None, None, None, f"X{i}") for i in range(1000))
+    assert misses < 100
+
+
+def test_build_then_may_contain(minute_files):
+    path = minute_files[0]
+    zone = ZoneMap.build(path)
+    assert zone["bob"] == ["2024-01-02 09:30:00", "2024-01-02 10:30:00"]
+    assert zone["symbols"] == ["600000"]
+    assert ZoneMap.may_contain(path, "bob", "2024-01-02 10:00:00", "2024-01-02 10:10:00")
+    assert not ZoneMap.may_contain(path, "bob", "2024-01-03 09:00:00", None)
+    assert not ZoneMap.may_contain(path, symbol="000001")
@@ -1,7 +1,12 @@
 """金融数据计算模块"""
 
 # 导入关键类
+from .bar_analytics import BarAnalytics
+from .bar_resampler import BarResampler
+from .bar_series import BarSeries
+from .cross_section import CrossSection
+from .history_planner import HistoryPlanner
 from .vvtr_data import VvtrData
 
 # 暴露为包接口
-__all__ = ["VvtrData"]
\ No newline at end of file
+__all__ = ["BarAnalytics", "BarResampler", "BarSeries", "CrossSection", "HistoryPlanner", "VvtrData"]
\ No newline at end of file
@@ -0,0 +1,125 @@
+import math
+import logging
+from typing import Dict, Optional
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖，BarSeries.load 会给出提示
+    np = None
+
+from vvtr_mcp_server.cal_data.bar_series import BarSeries
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class BarAnalytics:
+    """
+    基于本地K线的统计指标，按symbol分组后在NumPy数组上计算，只返回结果数值。
+
+    - returns: 区间收益率，最后一根收盘价 / 第一根开盘价 - 1
+    - vwap: 成交量加权均价，成交额之和 / 成交量之和
+    - volatility: 收盘价对数收益率的标准差，另按每年252个交易日折算年化波动率
+    - drawdown: 收盘价的最大回撤及其高点、低点的时间
+    - volume: 每根K线的平均成交量和总成交量
+    """
+    METRICS = ("returns", "vwap", "volatility", "drawdown", "volume")
+    # 年化使用的每年交易日数
+    TRADING_DAYS = 252
+
+    @staticmethod
+    def compute(series: BarSeries, metric: str) -> Dict[str, dict]:
+        """
+        按symbol计算指标
+
+        Args:
+            series: 按 (symbol, bob) 排序的K线
+            metric: 指标名称，见 METRICS
+        Returns:
+            {symbol: 指标字典}，每个字典都包含 bars(K线数)、start(第一根的bob)、end(最后一根的eob)
+        Raises:
+            ValueError: 指标名称错误
+        """
+        if metric not in BarAnalytics.METRICS:
+            raise ValueError(f"指标名称错误，可选: {','.join(BarAnalytics.METRICS)}")
+        if len(series) == 0:
+            return {}
+
+        symbol = series["symbol"]
+        starts = np.flatnonzero(np.concatenate(([True], symbol[1:] != symbol[:-1])))
+        ends = np.concatenate((starts[1:], [len(series)]))
+
+        calculate = getattr(BarAnalytics, f"_{metric}")
+        results = {}
+        for start, end in zip(starts, ends):
+            result = {
+                "bars": int(end - start),
+                "start": BarSeries.format_time(series["bob"][start], series.suffix),
+                "end": BarSeries.format_time(series["eob"][end - 1], series.suffix),
+            }
+            result.update(calculate(series, slice(start, end)))
+            results[series.symbols[symbol[start]]] = {key: BarAnalytics._clean(value) for key, value in result.items()}
+        return results
+
+    @staticmethod
+    def _returns(series: BarSeries, rows: slice) -> dict:
+        first_open = series["open"][rows][0]
+        last_close = series["close"][rows][-1]
+        return {
+            "open": first_open,
+            "close": last_close,
+            "return": last_close / first_open - 1 if first_open else None,
+        }
+
+    @staticmethod
+    def _vwap(series: BarSeries, rows: slice) -> dict:
+        amount = series["amount"][rows].sum()
+        volume = series["volume"][rows].sum()
+        return {"vwap": amount / volume if volume else None, "amount": amount, "volume": volume}
+
+    @staticmethod
+    def _volatility(series: BarSeries, rows: slice) -> dict:
+        close = series["close"][rows]
+        valid = close > 0
+        close = close[valid]
+        if len(close) < 3:
+            return {"volatility": None, "annualized_volatility": None}
+
+        log_returns = np.diff(np.log(close))
+        volatility = float(np.std(log_returns, ddof=1))
+        # 每年的K线数 = 252 * 平均每个交易日的K线数
+        days = len(np.unique(series["bob"][rows][valid] // 86400))
+        per_year = BarAnalytics.TRADING_DAYS * len(close) / max(days, 1)
+        return {"volatility": volatility, "annualized_volatility": volatility * math.sqrt(per_year)}
+
+    @staticmethod
+    def _drawdown(series: BarSeries, rows: slice) -> dict:
+        close = series["close"][rows]
+        peaks = np.maximum.accumulate(close)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drawdowns = np.where(peaks > 0, 1 - close / peaks, 0.0)
+        trough = int(np.argmax(drawdowns))
+        peak = int(np.argmax(close[:trough + 1]))
+        bob = series["bob"][rows]
+        return {
+            "max_drawdown": drawdowns[trough],
+            "peak": close[peak],
+            "peak_time": BarSeries.format_time(bob[peak], series.suffix),
+            "trough": close[trough],
+            "trough_time": BarSeries.format_time(bob[trough], series.suffix),
+        }
+
+    @staticmethod
+    def _volume(series: BarSeries, rows: slice) -> dict:
+        volume = series["volume"][rows]
+        return {"average_volume": volume.mean(), "total_volume": volume.sum()}
+
+    @staticmethod
+    def _clean(value) -> Optional[object]:
+        """NumPy数值转为Python数值，NaN和无穷大转为None"""
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, float) and not math.isfinite(value):
+            return None
+        return value
@@ -0,0 +1,133 @@
+import re
+import logging
+from typing import List, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖，BarSeries.load 会给出提示
+    np = None
+
+from vvtr_mcp_server.cal_data.bar_series import BarSeries
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class BarResampler:
+    """
+    把本地K线合成为更大周期的K线。
+
+    按 symbol 和周期分组：开盘价取组内第一根、收盘价和持仓量取最后一根，最高/最低价取极值，
+    成交量和成交额求和；bob 为组内第一根的 bob，eob 为最后一根的 eob。
+    分钟和小时周期按自然时间对齐(如 1h 为整点)，日周期按自然日，周周期从周一开始。
+    """
+    # 输出的列
+    HEADER = "symbol,interval,open,high,close,low,amount,volume,position,bob,eob,count"
+    # 周期单位对应的秒数
+    UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+    # 1970-01-01 是周四，周周期从 1970-01-05(周一) 开始对齐
+    WEEK_ORIGIN = 4 * 86400
+
+    @staticmethod
+    def parse_interval(interval: str) -> Tuple[int, int]:
+        """
+        解析周期
+
+        Args:
+            interval: 周期,eg:5m,30m,1h,1d,1w
+        Returns:
+            (周期秒数, 对齐的起点秒数)
+        Raises:
+            ValueError: 周期格式错误
+        """
+        match = re.fullmatch(r"\s*(\d+)\s*([mhdw])\s*", interval or "")
+        if not match or int(match.group(1)) <= 0:
+            raise ValueError(f"周期格式错误，应为数字加单位m/h/d/w,eg:5m,30m,1h,1w: {interval}")
+        unit = match.group(2)
+        origin = BarResampler.WEEK_ORIGIN if unit == "w" else 0
+        return int(match.group(1)) * BarResampler.UNITS[unit], origin
+
+    @staticmethod
+    def resample(series: BarSeries, interval: str) -> dict:
+        """
+        合成K线
+
+        Args:
+            series: 按 (symbol, bob) 排序的原始K线
+            interval: 目标周期,eg:5m,30m,1h,1d,1w
+        Returns:
+            字典：各输出列的数组(symbol 为编码)
+        Raises:
+            ValueError: 周期格式错误，或目标周期不是原始K线周期的整数倍
+        """
+        size, origin = BarResampler.parse_interval(interval)
+        if len(series) == 0:
+            return {"symbol": np.array([], dtype=np.int32)}
+
+        span = BarResampler.base_span(series)
+        if span > 0 and (size < span or size % span):
+            raise ValueError(f"目标周期 {interval} 不是原始K线周期({span}秒)的整数倍")
+
+        symbol = series["symbol"]
+        bucket = (series["bob"] - origin) // size
+        # 数据已按 (symbol, bob) 排序，symbol 或周期变化的位置是每组的开始
+        changed = (symbol[1:] != symbol[:-1]) | (bucket[1:] != bucket[:-1])
+        starts = np.flatnonzero(np.concatenate(([True], changed)))
+        ends = np.concatenate((starts[1:], [len(series)])) - 1
+
+        return {
+            "symbol": symbol[starts],
+            "open": series["open"][starts],
+            "high": np.maximum.reduceat(series["high"], starts),
+            "close": series["close"][ends],
+            "low": np.minimum.reduceat(series["low"], starts),
+            "amount": np.add.reduceat(series["amount"], starts),
+            "volume": np.add.reduceat(series["volume"], starts),
+            "position": series["position"][ends],
+            "bob": series["bob"][starts],
+            "eob": series["eob"][ends],
+            "count": ends - starts + 1,
+        }
+
+    @staticmethod
+    def base_span(series: BarSeries) -> int:
+        """
+        原始K线的周期秒数：优先按数据文件所在的周期目录(1m/15m/1d)，
+        目录名不是周期时取 eob - bob 的中位数(1d 的 eob 为 23:59:59，向上取整到分钟)，个别不规则的K线不影响结果
+        """
+        if series.interval:
+            try:
+                return BarResampler.parse_interval(series.interval)[0]
+            except ValueError:
+                pass
+        span = int(np.median(series["eob"] - series["bob"]))
+        return -(-span // 60) * 60
+
+    @staticmethod
+    def to_csv(series: BarSeries, bars: dict, interval: str, limit: int = 0) -> Tuple[str, int]:
+        """
+        把合成的K线转为CSV字符串
+
+        Args:
+            series: 原始K线(用于symbol名称和时区后缀)
+            bars: resample 的结果
+            interval: 目标周期
+            limit: 最多输出的条数，为0时不限制
+        Returns:
+            (带表头的CSV字符串, 输出的条数)
+        """
+        total = len(bars["symbol"])
+        count = min(total, limit) if limit > 0 else total
+        lines: List[str] = [BarResampler.HEADER]
+        number = BarSeries.format_number
+        for i in range(count):
+            lines.append(",".join((
+                series.symbols[bars["symbol"][i]], interval.strip(),
+                number(bars["open"][i]), number(bars["high"][i]), number(bars["close"][i]), number(bars["low"][i]),
+                number(bars["amount"][i]), number(bars["volume"][i]), number(bars["position"][i]),
+                BarSeries.format_time(bars["bob"][i], series.suffix),
+                BarSeries.format_time(bars["eob"][i], series.suffix),
+                str(int(bars["count"][i])),
+            )))
+        return '\n'.join(lines) + '\n', count
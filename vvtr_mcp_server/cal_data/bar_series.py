@@ -0,0 +1,268 @@
+import time
+import logging
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖，未安装时不能使用服务端计算
+    np = None
+
+from vvtr_mcp_server.util.columnar_cache import ColumnarCache, ColumnarTable
+from vvtr_mcp_server.util.csv_fields import CsvFields
+from vvtr_mcp_server.util.csv_schema import CsvSchema
+from vvtr_mcp_server.util.data_file import DataFile
+from vvtr_mcp_server.util.partition_cache import PartitionCache
+from vvtr_mcp_server.util.scan_executor import ScanExecutor
+from vvtr_mcp_server.util.time_filter import TimeFilter
+from vvtr_mcp_server.util.zone_map import ZoneMap
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class BarSeries:
+    """
+    从本地K线文件(1m/15m/1d)读取的OHLCV数据，各列为NumPy数组，按 (symbol, bob) 排序。
+
+    有列式缓存时直接取列式数组做向量化过滤，否则逐行解析文本；
+    时间为 ColumnarCache.to_epoch 的秒数(按数据中的本地时间，不处理时区)。
+    """
+    # 读取的数值列
+    VALUE_COLUMNS = ("open", "high", "low", "close", "amount", "volume", "position")
+
+    def __init__(self, columns: Dict[str, "np.ndarray"], symbols: List[str], suffix: str, interval: str = ""):
+        # symbol编码(对应 symbols 中的位置)、bob、eob 及 VALUE_COLUMNS 中的各列
+        self.columns = columns
+        self.symbols = symbols
+        # 时间字段的时区后缀,eg:+0800，输出时原样加上
+        self.suffix = suffix
+        # 数据文件所在的周期目录,eg:1m,15m,1d，文件来自多个周期目录时为空字符串
+        self.interval = interval
+
+    def __len__(self) -> int:
+        return len(self.columns["bob"])
+
+    def __getitem__(self, name: str) -> "np.ndarray":
+        return self.columns[name]
+
+    @staticmethod
+    def available() -> bool:
+        """是否安装了numpy"""
+        return np is not None
+
+    @staticmethod
+    def load(paths: List[Path], symbol: Optional[Union[str, List[str]]] = None, start_time: Optional[str] = None,
+             end_time: Optional[str] = None) -> "BarSeries":
+        """
+        读取多个K线文件中与时间范围有交集的数据，文件由 ScanExecutor 并行读取
+
+        Args:
+            paths: 文件路径列表
+            symbol: 种类代码或种类代码列表，为空则读取所有symbol
+            start_time: 开始时间(yyyy-MM-dd 或 yyyy-MM-dd HH:mm:ss)，保留 eob 不早于该时间的数据，为空则不限制
+            end_time: 结束时间(yyyy-MM-dd 或 yyyy-MM-dd HH:mm:ss)，保留 bob 不晚于该时间的数据，为空则不限制
+        Returns:
+            BarSeries
+        Raises:
+            RuntimeError: 未安装numpy
+            ValueError: 时间格式错误
+        """
+        if np is None:
+            raise RuntimeError("服务端计算需要安装numpy: pip install vvtr-mcp-server[columnar]")
+
+        start_epoch = BarSeries.to_epoch(start_time) if start_time else None
+        # 只有日期的结束时间包含当天
+        end_epoch = BarSeries.to_epoch(end_time) if end_time else None
+        if end_epoch is not None and TimeFilter.time_key(end_time.strip()) is None:
+            end_epoch += 86399
+
+        wanted = [symbol] if isinstance(symbol, str) else list(symbol or [])
+
+        read = partial(BarSeries._read_matching, symbols=wanted, start_epoch=start_epoch, end_epoch=end_epoch)
+        results = list(ScanExecutor.map(read, paths))
+
+        parts = [part for part in results if part is not None and len(part["bob"])]
+        suffix = next((part["suffix"] for part in parts if part["suffix"]), "")
+
+        # 各文件的symbol编码按各自的名称表，只对用到的名称换算为全局编码
+        names = sorted({part["names"][code] for part in parts for code in np.unique(part["symbol"])})
+        codes = {name: code for code, name in enumerate(names)}
+        columns = {}
+        for name in ("bob", "eob") + BarSeries.VALUE_COLUMNS:
+            columns[name] = np.concatenate([part[name] for part in parts]) if parts else np.array([])
+        columns["bob"] = columns["bob"].astype(np.int64)
+        columns["eob"] = columns["eob"].astype(np.int64)
+        columns["symbol"] = np.concatenate(
+            [np.array([codes.get(name, -1) for name in part["names"]], dtype=np.int32)[part["symbol"]]
+             for part in parts]) if parts else np.array([], dtype=np.int32)
+
+        # 按 (symbol, bob) 排序，同一时间的数据保持文件顺序
+        order = np.lexsort((columns["bob"], columns["symbol"]))
+        columns = {name: column[order] for name, column in columns.items()}
+        # 路径为 <type>/<interval>/<yyyyMM>/<yyyyMMdd>/<文件>
+        intervals = {Path(path).parent.parent.parent.name for path in paths}
+        return BarSeries(columns, names, suffix, intervals.pop() if len(intervals) == 1 else "")
+
+    @staticmethod
+    def _read_matching(path: Path, symbols: List[str], start_epoch: Optional[int],
+                       end_epoch: Optional[int]) -> Optional[dict]:
+        """
+        根据 zone map 跳过一定没有匹配数据的文件，再读取单个文件，读取失败时记录日志并返回None
+        """
+        try:
+            start_key, end_key = BarSeries.to_key(start_epoch), BarSeries.to_key(end_epoch)
+            if not any(ZoneMap.may_contain(path, "bob", start_key, end_key, name) for name in symbols or [None]):
+                return None
+            return BarSeries._read_file(path, symbols, start_epoch, end_epoch)
+        except Exception as e:
+            logger.error(f"读取文件失败: {path} - {str(e)}")
+            return None
+
+    @staticmethod
+    def _read_file(path: Path, symbols: List[str], start_epoch: Optional[int],
+                   end_epoch: Optional[int]) -> Optional[dict]:
+        """
+        读取单个文件中匹配的数据(symbols 为空时不按symbol过滤)，缺少需要的列时返回None
+        """
+        columns = CsvSchema.load(path)["columns"]
+        indexes = {name: columns.get(name, -1) for name in ("symbol", "bob", "eob") + BarSeries.VALUE_COLUMNS}
+        if indexes["bob"] < 0 or indexes["eob"] < 0:
+            logger.warning(f"文件缺少bob或eob列，已跳过: {path}")
+            return None
+
+        table = ColumnarCache.load(path)
+        if table is not None and all(table.kinds.get(index) in ("time", "float") for name, index in indexes.items()
+                                     if name != "symbol" and index >= 0):
+            return BarSeries._read_table(table, indexes, symbols, start_epoch, end_epoch)
+        return BarSeries._read_lines(path, indexes, symbols, start_epoch, end_epoch)
+
+    @staticmethod
+    def _read_table(table: ColumnarTable, indexes: Dict[str, int], symbols: List[str],
+                    start_epoch: Optional[int], end_epoch: Optional[int]) -> dict:
+        """
+        在列式数据上向量化过滤
+        """
+        bob = table.column(indexes["bob"])
+        eob = table.column(indexes["eob"])
+        mask = (bob != ColumnarCache.NAT) & (eob != ColumnarCache.NAT)
+        if start_epoch is not None:
+            mask &= eob >= start_epoch
+        if end_epoch is not None:
+            mask &= bob <= end_epoch
+
+        symbol_index = indexes["symbol"]
+        if symbol_index >= 0 and table.kinds.get(symbol_index) == "symbol":
+            codes = table.column(symbol_index)
+            if symbols:
+                mask &= np.isin(codes, [table.symbol_code(name) for name in symbols])
+            names = table.symbols
+        elif symbols:
+            return {"bob": np.array([])}
+        else:
+            codes = np.zeros(table.rows, dtype=np.int32)
+            names = [""]
+
+        rows = table.rows_where(mask)
+        part = {"symbol": np.asarray(codes[rows], dtype=np.int32), "names": names, "bob": bob[rows], "eob": eob[rows]}
+        for name in BarSeries.VALUE_COLUMNS:
+            index = indexes[name]
+            part[name] = table.column(index)[rows] if index >= 0 else np.zeros(len(rows))
+        part["suffix"] = BarSeries._suffix(CsvFields.field(table.lines(rows[:1])[0], indexes["bob"])) \
+            if len(rows) else ""
+        return part
+
+    @staticmethod
+    def _read_lines(path: Path, indexes: Dict[str, int], symbols: List[str],
+                    start_epoch: Optional[int], end_epoch: Optional[int]) -> dict:
+        """
+        逐行解析文本，数值无法解析的行跳过
+        """
+        partition = PartitionCache.rows(path, full=True)
+        if partition is not None:
+            lines = partition.lines
+        else:
+            with DataFile.open_text(path) as f:
+                f.readline()
+                lines = [raw.rstrip('\r\n') for raw in f]
+
+        names = ("bob", "eob") + BarSeries.VALUE_COLUMNS
+        values = {name: [] for name in names}
+        row_symbols = []
+        local: Dict[str, int] = {}
+        wanted = set(symbols)
+        suffix = ""
+        width = max(indexes.values()) + 1
+        for line in lines:
+            if not line.strip():
+                continue
+            fields = CsvFields.parse_line(line)
+            if len(fields) < width:
+                continue
+            row_symbol = fields[indexes["symbol"]] if indexes["symbol"] >= 0 else ""
+            if wanted and row_symbol not in wanted:
+                continue
+            bob = ColumnarCache.to_epoch(fields[indexes["bob"]])
+            eob = ColumnarCache.to_epoch(fields[indexes["eob"]])
+            if bob == ColumnarCache.NAT or eob == ColumnarCache.NAT:
+                continue
+            if (start_epoch is not None and eob < start_epoch) or (end_epoch is not None and bob > end_epoch):
+                continue
+            try:
+                row = [float(fields[indexes[name]]) if indexes[name] >= 0 else 0.0 for name in BarSeries.VALUE_COLUMNS]
+            except ValueError:
+                logger.warning(f"数值无法解析，已跳过: {line}")
+                continue
+
+            suffix = suffix or BarSeries._suffix(fields[indexes["bob"]])
+            row_symbols.append(local.setdefault(row_symbol, len(local)))
+            values["bob"].append(bob)
+            values["eob"].append(eob)
+            for name, value in zip(BarSeries.VALUE_COLUMNS, row):
+                values[name].append(value)
+
+        part = {name: np.array(column, dtype=np.int64 if name in ("bob", "eob") else np.float64)
+                for name, column in values.items()}
+        part["symbol"] = np.array(row_symbols, dtype=np.int32)
+        part["names"] = list(local)
+        part["suffix"] = suffix
+        return part
+
+    @staticmethod
+    def to_epoch(value: str) -> int:
+        """
+        把查询条件中的时间转为秒数
+
+        Raises:
+            ValueError: 时间格式错误
+        """
+        epoch = ColumnarCache.to_epoch(value)
+        if epoch == ColumnarCache.NAT:
+            raise ValueError(f"时间格式错误，应为yyyy-MM-dd或yyyy-MM-dd HH:mm:ss: {value}")
+        return epoch
+
+    @staticmethod
+    def to_key(epoch: Optional[int]) -> Optional[str]:
+        """秒数转为 yyyy-MM-dd HH:mm:ss 比较键"""
+        return time.strftime(TimeFilter.TIME_FORMAT, time.gmtime(epoch)) if epoch is not None else None
+
+    @staticmethod
+    def format_time(epoch: int, suffix: str = "") -> str:
+        """秒数转为数据中的时间格式,eg:2024-01-02 09:30:00+0800"""
+        return BarSeries.to_key(int(epoch)) + suffix
+
+    @staticmethod
+    def format_number(value: float) -> str:
+        """格式化数值，整数不带小数部分"""
+        value = float(value)
+        if value.is_integer() and abs(value) < 1e15:
+            return str(int(value))
+        return repr(round(value, 8))
+
+    @staticmethod
+    def _suffix(value: Optional[str]) -> str:
+        """取出时间字段中的时区后缀"""
+        value = (value or "").strip()
+        return value[19:] if len(value) > 19 and value[19] == '+' else ""
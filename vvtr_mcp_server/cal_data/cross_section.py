@@ -0,0 +1,142 @@
+import logging
+from functools import partial
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from vvtr_mcp_server.util.csv_fields import CsvFields
+from vvtr_mcp_server.util.csv_schema import CsvSchema
+from vvtr_mcp_server.util.data_file import DataFile
+from vvtr_mcp_server.util.scan_executor import ScanExecutor
+from vvtr_mcp_server.util.time_filter import TimeFilter
+from vvtr_mcp_server.util.time_seek import TimeSeek
+from vvtr_mcp_server.util.zone_map import ZoneMap
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class CrossSection:
+    """
+    横截面查询：同一时间点所有symbol的一行数据。
+
+    分钟和tick文件按时间排序，每个文件只做一次二分定位：找到第一条时间晚于目标时间的数据，
+    它前面的一行就是目标时间(或之前最近)的数据，不读取整个文件；多个文件由 ScanExecutor 并行定位。
+    日线文件每个文件包含当天所有symbol，直接按日期和symbol过滤。
+    """
+
+    @staticmethod
+    def snapshot(paths: List[Path], time_column: str, target: str,
+                 as_of: bool = True) -> Tuple[List[Tuple[Path, str]], int]:
+        """
+        在每个文件中定位目标时间的数据行
+
+        Args:
+            paths: 文件路径列表(每个文件一个symbol)
+            time_column: 用于定位的时间列,eg:bob,created_at
+            target: 目标时间的比较键(yyyy-MM-dd HH:mm:ss)
+            as_of: 为True时取不晚于目标时间的最近一行，否则只取时间等于目标时间的行
+        Returns:
+            ([(文件路径, 数据行)], 根据 zone map 跳过的文件数)，按 paths 的顺序，没有匹配行的文件不返回
+        """
+        # 只使用已有的 zone map，不为此读取整个文件
+        candidates = [path for path in paths if ZoneMap.may_contain(path, time_column, None, target, build=False)]
+
+        locate = partial(CrossSection._try_locate, time_column=time_column, target=target, as_of=as_of)
+        lines = list(ScanExecutor.map(locate, candidates))
+
+        rows = [(path, line) for path, line in zip(candidates, lines) if line is not None]
+        return rows, len(paths) - len(candidates)
+
+    @staticmethod
+    def _try_locate(path: Path, time_column: str, target: str, as_of: bool) -> Optional[str]:
+        """定位单个文件，读取失败时记录日志并返回None"""
+        try:
+            return CrossSection.locate(path, time_column, target, as_of)
+        except Exception as e:
+            logger.error(f"读取文件失败: {path} - {str(e)}")
+            return None
+
+    @staticmethod
+    def locate(path: Path, time_column: str, target: str, as_of: bool = True) -> Optional[str]:
+        """
+        定位单个文件中目标时间的数据行
+
+        Returns:
+            数据行，没有匹配的行或文件缺少时间列时返回None
+        """
+        time_index = CsvSchema.index(path, time_column)
+        if time_index < 0:
+            return None
+
+        offset = TimeSeek.seek(path, time_index, target, after=True)
+        line = TimeSeek.line_before(path, offset)
+        if line is None:
+            return None
+        record_time = TimeSeek.parse_time(line.encode('utf-8'), time_index)
+        if record_time is None or (not as_of and record_time != target):
+            return None
+        return line
+
+    @staticmethod
+    def day_rows(path: Path, day: Optional[str], symbols: Optional[List[str]] = None) -> List[str]:
+        """
+        取出日线文件中 bob 日期为 day 的数据行
+
+        Args:
+            path: 日线文件路径
+            day: 日期比较键(yyyy-MM-dd)，为None时不按日期过滤
+            symbols: 种类代码列表，为空则返回所有symbol
+        Returns:
+            数据行列表
+        """
+        bob_index = CsvSchema.index(path, "bob")
+        symbol_index = CsvSchema.index(path, "symbol")
+        if bob_index < 0:
+            return []
+
+        wanted = set(symbols or [])
+        rows = []
+        with DataFile.open_text(path) as f:
+            f.readline()
+            for raw in f:
+                line = raw.rstrip('\r\n')
+                if wanted and CsvFields.field(line, symbol_index) not in wanted:
+                    continue
+                if not line.strip():
+                    continue
+                field = CsvFields.field(line, bob_index)
+                if day is None or (field is not None and TimeFilter.date_key(field.strip()) == day):
+                    rows.append(line)
+        return rows
+
+    @staticmethod
+    def to_table(header: str, lines: List[str], columns: Optional[List[str]] = None) -> Tuple[str, int]:
+        """
+        生成CSV表格，可以只保留部分列
+
+        Args:
+            header: 表头行
+            lines: 数据行
+            columns: 保留的列名(不区分大小写)，为空则保留所有列
+        Returns:
+            (带表头的CSV字符串, 数据行数)
+        """
+        if columns:
+            names = [name.strip().lower() for name in header.split(',')]
+            indexes = [names.index(name.lower()) for name in columns if name.lower() in names]
+            header = ','.join(header.split(',')[i] for i in indexes)
+            projected = []
+            for line in lines:
+                fields = CsvFields.parse_line(line)
+                projected.append(','.join(CrossSection._quote(fields[i]) if i < len(fields) else ""
+                                          for i in indexes))
+            lines = projected
+        return '\n'.join([header] + lines) + '\n', len(lines)
+
+    @staticmethod
+    def _quote(value: str) -> str:
+        """含逗号或引号的字段加上引号"""
+        if ',' in value or '"' in value:
+            return '"' + value.replace('"', '""') + '"'
+        return value
@@ -0,0 +1,434 @@
+import os
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from vvtr_mcp_server.cal_data.vvtr_data import VvtrData
+from vvtr_mcp_server.main_station.history_kline_stream import HistoryKlineStream
+from vvtr_mcp_server.main_station.main_station_data import MainStationData
+from vvtr_mcp_server.util.csv_fields import CsvFields
+from vvtr_mcp_server.util.csv_merger import CsvMerger
+from vvtr_mcp_server.util.csv_schema import CsvSchema
+from vvtr_mcp_server.util.data_file import DataFile
+from vvtr_mcp_server.util.file_stats import FileStats
+from vvtr_mcp_server.util.scan_executor import ScanExecutor
+from vvtr_mcp_server.util.time_filter import TimeFilter
+from vvtr_mcp_server.util.time_seek import TimeSeek
+from vvtr_mcp_server.util.tool_runner import ToolRunner
+from vvtr_mcp_server.util.zone_map import ZoneMap
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class HistoryPlanner:
+    """
+    本地与远程结合的历史K线查询。
+
+    按日期检查本地数据目录中是否有该symbol的文件(分钟K线为 <yyyyMMdd>/<symbol>.csv，日线为 <yyyyMMdd>/<yyyyMMdd>.csv)，
+    并确认文件覆盖了当天需要的数据：分钟K线比较文件中第一根K线的 bob 和最后一根的 eob 与查询时间段
+    (按各文件中最早开盘、最晚收盘的时刻截取)，日线确认文件中有该symbol；今天(及之后)的文件可能还在写入，
+    不完整的文件都视为缺失。连续缺失的日期合并为一个区间，只向 /kline/history 请求这些区间。
+    本地文件和远程区间按时间顺序依次读取，达到行数上限后停止，不再读取后面的文件、不再请求后面的区间；
+    读取当前的本地文件或远程区间时，提前请求下一个远程区间的第一页，页满时取消。
+    在远程区间中停止时返回的 next_cursor_token 带有该区间的远程游标，继续查询时从中断的位置接着请求。
+    只包含周末的缺失区间视为休市不请求(WEEKEND_TYPES 中的品种除外)；本地没有该周期目录时整个范围都请求远程。
+    """
+    # 周末也交易的品种，周末缺失的日期也要请求远程
+    WEEKEND_TYPES = tuple(os.environ.get("HYBRID_WEEKEND_TYPES", "31").split(','))
+    # 一次最多返回的行数
+    MAX_ROWS = int(os.environ.get("HYBRID_MAX_ROWS", "5000"))
+    # 提前请求下一个远程区间时最多获取的行数(一页)，设置为0则不提前请求
+    PREFETCH_ROWS = int(os.environ.get("HYBRID_PREFETCH_ROWS", "2000"))
+    # 日线周期
+    DAY_INTERVAL = "1d"
+
+    @staticmethod
+    def plan(type: str, interval: str, symbol: str, start: datetime,
+             end: datetime) -> Tuple[List[Path], List[Tuple[date, date]]]:
+        """
+        检查本地数据的覆盖范围
+
+        Args:
+            type: 产品类型
+            interval: K线周期
+            symbol: 种类代码
+            start: 开始时间
+            end: 结束时间
+        Returns:
+            (本地文件路径列表, 需要请求远程的日期区间列表[(开始日期, 结束日期)])，都按日期排序
+        """
+        start_day, end_day = start.date(), end.date()
+        root_dir = Path(CsvMerger.ROOT) / type / interval
+        if not root_dir.is_dir():
+            return [], [(start_day, end_day)]
+
+        today = date.today()
+        found = []
+        missing = []
+        day = start_day
+        while day <= end_day:
+            key = day.strftime("%Y%m%d")
+            name = key if interval == HistoryPlanner.DAY_INTERVAL else symbol
+            day_dir = root_dir / key[:6] / key
+            path = next((day_dir / file_name for file_name in DataFile.names(name) if (day_dir / file_name).exists()),
+                        None)
+            if path is None or day >= today:
+                missing.append(day)
+            elif interval == HistoryPlanner.DAY_INTERVAL:
+                if HistoryPlanner._has_symbol(path, symbol):
+                    found.append((day, path, None))
+                else:
+                    missing.append(day)
+            else:
+                bounds = HistoryPlanner._bounds(path)
+                if bounds is None:
+                    missing.append(day)
+                else:
+                    found.append((day, path, bounds))
+            day += timedelta(days=1)
+
+        paths = []
+        bounded = [(day, bounds) for day, _, bounds in found if bounds is not None]
+        # 各文件中最早的开盘时刻和最晚的收盘时刻作为每天应有数据的时间段
+        opening = min((HistoryPlanner._clock(first, day) for day, (first, _) in bounded), default="")
+        closing = max((HistoryPlanner._clock(last, day) for day, (_, last) in bounded), default="")
+        start_key, end_key = TimeFilter.to_time_key(start), TimeFilter.to_time_key(end)
+        for day, path, bounds in found:
+            if bounds is not None:
+                day_key = day.strftime(TimeFilter.DATE_FORMAT)
+                need_from = max(opening, start_key[11:] if start_key[:10] == day_key else "00:00:00")
+                need_to = min(closing, end_key[11:] if end_key[:10] == day_key else "24:00:00")
+                if need_from < need_to and (HistoryPlanner._clock(bounds[0], day) > need_from
+                                            or HistoryPlanner._clock(bounds[1], day) < need_to):
+                    # 只有一部分时间段的文件(如写入的部分远程数据)
+                    missing.append(day)
+                    continue
+            paths.append(path)
+        missing.sort()
+
+        gaps = []
+        for day in missing:
+            if gaps and (day - gaps[-1][1]).days == 1:
+                gaps[-1][1] = day
+            else:
+                gaps.append([day, day])
+        trade_weekend = type in HistoryPlanner.WEEKEND_TYPES
+        return paths, [(first, last) for first, last in gaps
+                       if trade_weekend or any((first + timedelta(days=i)).weekday() < 5
+                                               for i in range((last - first).days + 1))]
+
+    @staticmethod
+    async def query(type: str, interval: str, symbol: str, start: datetime, end: datetime, apikey: str,
+                    max_rows: int = 0, cursor_token: str = "") -> dict:
+        """
+        查询一个symbol在时间范围内的K线，本地缺失的日期从远程获取
+
+        Args:
+            type: 产品类型
+            interval: K线周期,eg:1m,15m,1d
+            symbol: 种类代码
+            start: 开始时间
+            end: 结束时间
+            apikey: 您的apiKey
+            max_rows: 最多返回的行数，为0时使用 MAX_ROWS
+            cursor_token: 上一次返回的 next_cursor_token，第一次查询为空字符串
+        Returns:
+            字典：data(带表头的CSV数据)、rows(行数)、has_next(是否还有数据未返回)、
+            next_start_time(继续查询时使用的开始时间)、next_cursor_token(继续查询时使用的游标)、
+            local_files(读取的本地文件数)、remote_ranges(请求远程的日期区间)、remote_rows(远程获取的行数)、
+            errors(远程请求失败的说明)
+        Raises:
+            ValueError: cursor_token 格式错误或与查询时间范围不一致
+        """
+        max_rows = max_rows or HistoryPlanner.MAX_ROWS
+        segments = []
+        resume = HistoryPlanner._decode(cursor_token, start, end)
+        plan_start = start
+        if resume is not None:
+            # 接着上一次中断的远程区间，之后的日期重新检查本地数据
+            segments.append((resume[0], None, resume))
+            plan_start = max(start, datetime.combine(resume[1] + timedelta(days=1), datetime.min.time()))
+        paths, gaps = ([], []) if plan_start > end else await ToolRunner.run(
+            "local", HistoryPlanner.plan, type, interval, symbol, plan_start, end, timeout=0)
+        segments.extend((HistoryPlanner._path_day(path), path, None) for path in paths)
+        segments.extend((first, None, (first, last, "")) for first, last in gaps)
+        segments.sort(key=lambda segment: segment[0])
+
+        def fetch(remote: Tuple[date, date, str], token: str, budget: int) -> asyncio.Task:
+            first, last, _ = remote
+            return asyncio.create_task(HistoryKlineStream.collect(
+                symbol, interval, type, apikey, first.strftime("%Y-%m-%d"), last.strftime("%Y-%m-%d"),
+                cursor_token=token or None, max_rows=budget))
+
+        rows: List[Tuple[str, str]] = []
+        errors = []
+        remote_rows = 0
+        local_files = 0
+        next_start_time = ""
+        next_cursor_token = ""
+        index = 0
+        # 提前请求的远程区间第一页：段序号 -> 任务
+        prefetched: Dict[int, asyncio.Task] = {}
+        try:
+            while index < len(segments) and len(rows) <= max_rows:
+                # 读取当前段的同时提前请求下一个远程区间的第一页
+                following = next((i for i in range(index + 1, len(segments)) if segments[i][2] is not None), None)
+                if (following is not None and following not in prefetched and len(rows) < max_rows
+                        and HistoryPlanner.PREFETCH_ROWS > 0):
+                    prefetched[following] = fetch(segments[following][2], segments[following][2][2],
+                                                  min(max_rows - len(rows), HistoryPlanner.PREFETCH_ROWS))
+
+                if segments[index][2] is None:
+                    # 连续的本地文件一起读取，取满一页后不再读取后面的文件
+                    run = []
+                    while index < len(segments) and segments[index][2] is None:
+                        run.append(segments[index][1])
+                        index += 1
+                    lines, files = await ToolRunner.run("local", HistoryPlanner.read_local, run, interval, symbol,
+                                                        start, end, max_rows - len(rows), timeout=0)
+                    rows.extend(HistoryPlanner._merge(lines))
+                    local_files += files
+                    continue
+
+                remote = segments[index][2]
+                first, last, token = remote
+                task = prefetched.pop(index, None)
+                index += 1
+                if len(rows) >= max_rows:
+                    # 页已满，下一次从这个区间开始
+                    next_start_time = TimeFilter.to_time_key(max(start, datetime.combine(first, datetime.min.time())))
+                    break
+                page = await (task or fetch(remote, token, max_rows - len(rows)))
+                lines = page["data"].split('\n')[1:] if page["data"] else []
+                if task is not None and page["has_next"] and not page["error"] and len(rows) + len(lines) < max_rows:
+                    # 提前请求的第一页不够时接着请求这个区间
+                    page = await fetch(remote, page["next_cursor_token"], max_rows - len(rows) - len(lines))
+                    lines.extend(page["data"].split('\n')[1:] if page["data"] else [])
+                remote_rows += len(lines)
+                rows.extend(HistoryPlanner._merge(HistoryPlanner._filter(lines, interval, start, end)))
+                if page["error"]:
+                    errors.append(f"{first}~{last}: {page['error']}")
+                if page["has_next"]:
+                    # 在远程区间中停止：继续查询时用该区间的远程游标接着请求
+                    next_start_time = TimeFilter.to_time_key(max(start, datetime.combine(first, datetime.min.time())))
+                    next_cursor_token = HistoryPlanner._encode(first, last, page["next_cursor_token"])
+                    break
+        finally:
+            for task in prefetched.values():
+                task.cancel()
+
+        has_next = bool(next_start_time) or len(rows) > max_rows
+        if len(rows) > max_rows:
+            next_start_time = rows[max_rows][0]
+            next_cursor_token = ""
+            rows = rows[:max_rows]
+
+        lines = [line for _, line in rows]
+        return {
+            "data": "\n".join([MainStationData.HISTORY_HEADER] + lines) if lines else "",
+            "rows": len(lines),
+            "has_next": has_next,
+            "next_start_time": next_start_time,
+            "next_cursor_token": next_cursor_token,
+            "local_files": local_files,
+            "remote_ranges": [f"{remote[0]}~{remote[1]}" for _, _, remote in segments if remote is not None],
+            "remote_rows": remote_rows,
+            "errors": errors,
+        }
+
+    @staticmethod
+    def read_local(paths: List[Path], interval: str, symbol: str, start: datetime, end: datetime,
+                   max_rows: int) -> Tuple[List[str], int]:
+        """
+        按文件顺序读取本地文件中 bob 在时间范围内的数据行，列顺序转为 HISTORY_HEADER 的顺序；
+        取到超过 max_rows 条(按 bob 去重)后停止，当前文件剩下的行和后面的文件不再读取
+
+        Args:
+            paths: 本地文件路径
+            interval: K线周期
+            symbol: 种类代码
+            start: 开始时间
+            end: 结束时间
+            max_rows: 本页还需要的行数，多取一条用于确定下一页的开始时间
+        Returns:
+            (数据行列表, 读取的文件数)
+        """
+        if not paths:
+            return [], 0
+        reader = VvtrData()
+        bob_index = CsvSchema.index(paths[0], "bob")
+        if interval == HistoryPlanner.DAY_INTERVAL:
+            symbol_index = CsvSchema.index(paths[0], "symbol")
+            scan = partial(reader.scan_day_file, symbol=symbol, symbol_index=symbol_index, bob_index=bob_index,
+                           start_date=start.date(), end_date=end.date())
+            rows = HistoryPlanner._day_rows(ScanExecutor.map(scan, paths, ramp=True))
+        else:
+            # 当前文件流式读取，后面的文件按还需要的行数预读
+            pruned = []
+            skip = reader.zone_skip(pruned, "bob", TimeFilter.to_time_key(start), TimeFilter.to_time_key(end))
+            scan = partial(reader.scan_min_file, bob_index=bob_index, start_datetime=start, end_datetime=end)
+            prefetch = partial(reader.scan_min_rows, bob_index=bob_index, start_datetime=start, end_datetime=end)
+            rows = reader.scan_rows_parallel(paths, 0, scan, prefetch, skip, pruned, max_rows + 1)
+
+        history_bob_index = MainStationData.HISTORY_HEADER.split(',').index("bob")
+        lines = []
+        keys = set()
+        batch = []
+        current = 0
+
+        def flush() -> None:
+            # 同一文件的数据行一起转换列顺序和过滤
+            for line in HistoryPlanner._filter(HistoryPlanner._reorder(paths[current], batch), interval, start, end):
+                bob = CsvFields.field(line, history_bob_index) or ""
+                keys.add(TimeFilter.time_key(bob.strip()) or bob)
+                lines.append(line)
+            batch.clear()
+
+        try:
+            for i, _, _, line in rows:
+                if i != current:
+                    flush()
+                    current = i
+                batch.append(line)
+                if len(batch) > max_rows - len(keys):
+                    flush()
+                    if len(keys) > max_rows:
+                        return lines, i + 1
+            flush()
+        finally:
+            rows.close()
+        return lines, len(paths)
+
+    @staticmethod
+    def _day_rows(results: Iterator[Optional[List[str]]]) -> Iterator[Tuple[int, int, int, str]]:
+        """把按文件顺序的日线读取结果转为与 scan_rows_parallel 相同的 (文件序号, 0, 0, 数据行)"""
+        try:
+            for i, result in enumerate(results):
+                for line in result or []:
+                    yield i, 0, 0, line
+        finally:
+            results.close()
+
+    @staticmethod
+    def _reorder(path: Path, lines: List[str]) -> List[str]:
+        """本地文件的列顺序与 HISTORY_HEADER 不同时按列名重新排列"""
+        header = MainStationData.HISTORY_HEADER.split(',')
+        columns = CsvSchema.load(path)["columns"]
+        indexes = [columns.get(name.lower(), -1) for name in header]
+        if indexes == list(range(len(header))):
+            return lines
+        result = []
+        for line in lines:
+            fields = CsvFields.parse_line(line)
+            result.append(','.join(fields[i] if 0 <= i < len(fields) else "" for i in indexes))
+        return result
+
+    @staticmethod
+    def _filter(lines: List[str], interval: str, start: datetime, end: datetime) -> List[str]:
+        """
+        保留 bob 在时间范围内的数据行，日线按日期比较；
+        以 bob 而不是与区间有交集判断，用 next_start_time 继续查询时不会重复返回上一根K线
+        """
+        bob_index = MainStationData.HISTORY_HEADER.split(',').index("bob")
+        if interval == HistoryPlanner.DAY_INTERVAL:
+            convert, start_key, end_key = TimeFilter.date_key, TimeFilter.to_date_key(start), TimeFilter.to_date_key(end)
+        else:
+            convert, start_key, end_key = TimeFilter.time_key, TimeFilter.to_time_key(start), TimeFilter.to_time_key(end)
+        result = []
+        for line in lines:
+            bob = CsvFields.field(line, bob_index)
+            key = convert(bob.strip()) if bob else None
+            if key is not None and start_key <= key <= end_key:
+                result.append(line)
+        return result
+
+    @staticmethod
+    def _merge(lines: List[str]) -> List[Tuple[str, str]]:
+        """按 bob 去重并排序，返回 [(bob比较键, 数据行)]"""
+        bob_index = MainStationData.HISTORY_HEADER.split(',').index("bob")
+        rows: Dict[str, str] = {}
+        for line in lines:
+            bob = CsvFields.field(line, bob_index) or ""
+            rows.setdefault(TimeFilter.time_key(bob.strip()) or bob, line)
+        return sorted(rows.items())
+
+    @staticmethod
+    def _has_symbol(path: Path, symbol: str) -> bool:
+        """日线文件中是否有该symbol的数据(按 FileStats 的精确统计，写入部分远程数据的文件可能缺少其他symbol)"""
+        try:
+            return symbol in FileStats.load(path, by_symbol=True).get("symbols", {})
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning(f"统计日线文件失败: {path} - {str(e)}")
+            return False
+
+    @staticmethod
+    def _bounds(path: Path) -> Optional[Tuple[str, str]]:
+        """
+        分钟K线文件中第一根K线的 bob 和最后一根K线的 eob(时间比较键)，优先使用 zone map，
+        否则读取第一行和最后一行(文件按 bob 排序)；没有数据或无法解析时返回None
+        """
+        zone = ZoneMap.load(path, build=False)
+        if zone is not None:
+            return tuple(zone["bob"]) if zone.get("bob") else None
+        try:
+            bob_index = CsvSchema.index(path, "bob")
+            if bob_index < 0:
+                return None
+            with DataFile.open_text(path) as f:
+                f.readline()
+                first = f.readline().rstrip('\r\n')
+            last = TimeSeek.line_before(path, DataFile.size(path))
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning(f"读取文件失败: {path} - {str(e)}")
+            return None
+        bob = CsvFields.field(first, bob_index)
+        eob = CsvFields.field(last, bob_index + 1) if last else None
+        first_key = TimeFilter.time_key(bob.strip()) if bob else None
+        last_key = TimeFilter.time_key(eob.strip()) if eob else None
+        return (first_key, last_key) if first_key and last_key else None
+
+    @staticmethod
+    def _clock(key: str, day: date) -> str:
+        """时间比较键在当天的时刻(HH:mm:ss)，前一天的时间为 00:00:00，之后的日期为 24:00:00"""
+        day_key = day.strftime(TimeFilter.DATE_FORMAT)
+        if key[:10] < day_key:
+            return "00:00:00"
+        if key[:10] > day_key:
+            return "24:00:00"
+        return key[11:19]
+
+    @staticmethod
+    def _path_day(path: Path) -> date:
+        """本地文件所在的日期(<yyyyMMdd>/<文件>)"""
+        return datetime.strptime(path.parent.name, "%Y%m%d").date()
+
+    @staticmethod
+    def _encode(first: date, last: date, remote_token: str) -> str:
+        """继续查询的游标：中断的远程区间和该区间的远程游标"""
+        return f"{first:%Y%m%d}~{last:%Y%m%d}~{remote_token}"
+
+    @staticmethod
+    def _decode(token: str, start: datetime, end: datetime) -> Optional[Tuple[date, date, str]]:
+        """
+        解析继续查询的游标，为空时返回None
+
+        Raises:
+            ValueError: 游标格式错误或与查询时间范围不一致
+        """
+        if not token:
+            return None
+        try:
+            first, last, remote_token = token.split('~', 2)
+            first_day = datetime.strptime(first, "%Y%m%d").date()
+            last_day = datetime.strptime(last, "%Y%m%d").date()
+        except ValueError:
+            raise ValueError("cursorToken格式错误")
+        if not remote_token or first_day != start.date() or last_day > end.date():
+            raise ValueError("cursorToken与本次查询条件不一致，请把startTime设为返回的next_start_time")
+        return first_day, last_day, remote_token
+
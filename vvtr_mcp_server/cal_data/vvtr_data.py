@@ -1,9 +1,24 @@
+import calendar
 import logging
+from collections import deque
+from functools import partial
+from itertools import islice
 from pathlib import Path
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
+from vvtr_mcp_server.util.columnar_cache import ColumnarCache, ColumnarTable
+from vvtr_mcp_server.util.csv_fields import CsvFields
 from vvtr_mcp_server.util.csv_merger import CsvMerger
+from vvtr_mcp_server.util.csv_schema import CsvSchema
+from vvtr_mcp_server.util.data_file import DataFile
+from vvtr_mcp_server.util.file_stats import FileStats
+from vvtr_mcp_server.util.partition_cache import PartitionCache
+from vvtr_mcp_server.util.scan_executor import ScanExecutor
+from vvtr_mcp_server.util.symbol_store import SymbolStore
+from vvtr_mcp_server.util.time_filter import TimeFilter
+from vvtr_mcp_server.util.time_seek import TimeSeek
+from vvtr_mcp_server.util.zone_map import ZoneMap
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -11,73 +26,26 @@ logger = logging.getLogger(__name__)
 
 
 # 返回数据类
-class DataLabel:
-    def __init__(self, data: str, next_index: int, remaining_paths: List[Path]):
+class DataPage:
+    def __init__(self, data: str, file_index: Optional[int], offset: int, pruned: int = 0):
         self.data = data
-        self.next_index = next_index
-        self.remaining_paths = remaining_paths
+        # 下一页开始的文件序号和字节偏移，读完时 file_index 为None
+        self.file_index = file_index
+        self.offset = offset
+        # 本页根据 zone map 跳过(未打开)的文件数
+        self.pruned = pruned
 
-
-class DataBack:
-    def __init__(self, data: str, remaining_paths: List[Path]):
-        self.data = data
-        self.remaining_paths = remaining_paths
+    @property
+    def has_next(self) -> bool:
+        return self.file_index is not None
 
 class VvtrData:
+    # 列式缓存中每次取回的原始行数
+    FETCH_ROWS = 256
+
     def __init__(self):
         pass
 
-    def get_minute_data(self, paths: List[Path], next_index: int, count: int) -> DataLabel:
-        """
-        获取分钟数据
-
-        Args:
-            paths: 解析的文件路径
-            next_index: 上一次的读取位置
-            count: 一共需要的读取条数
-
-        Returns:
-            DataLabel: 包含数据、下一次的读取位置和剩余文件路径
-        """
-        all_content = ""  # 用于存储查询到的所有结果
-        result_data = []  # 用于存储返回的结果
-        total_lines_processed = 0  # 总的行数
-        processed_path_index = 0  # 文件索引
-        line = 0
-        index = 0
-
-        for i, path in enumerate(paths):
-            data = CsvMerger.parse_csv_without_header_as_string(path)
-            all_content += data
-            lines = CsvMerger.count_lines(data)
-            line = lines
-            total_lines_processed += lines
-            processed_path_index = i
-
-            if i == 0 and (total_lines_processed - next_index) > count:
-                break
-            elif total_lines_processed > count:
-                break
-
-        # 将合并后的内容按行分割
-        all_lines = all_content.split('\n')
-        actual_limit = min(count, len(all_lines))
-
-        result_data = all_lines[next_index:next_index + actual_limit]
-        result_str = '\n'.join(result_data)
-
-        # 计算下一次索引
-        if count < len(all_lines):
-            index = next_index + actual_limit + line - total_lines_processed
-            if index < 0:
-                lines = CsvMerger.count_lines(CsvMerger.parse_csv_without_header_as_string(paths[0]))
-                index = lines + index
-
-        # 剩余的路径
-        remaining_paths = paths[processed_path_index:]
-
-        return DataLabel(result_str, index, remaining_paths)
-
     def get_day_data(self, filter_data: str, offset: int, limit: int) -> str:
         """
         获取日线数据
@@ -109,9 +77,10 @@ class VvtrData:
         return result
 
     def get_day_data_with_paths(self, paths: List[Path], symbol: str, symbol_index: int,
-                                start_time: str, end_time: str, bob_index: int) -> DataBack:
+                                start_time: str, end_time: str, bob_index: int,
+                                file_index: int = 0, offset: int = 0, count: int = 1000) -> DataPage:
         """
-        获取日线数据
+        获取日线数据，限制1000条
 
         Args:
             paths: 文件路径列表
@@ -120,12 +89,17 @@ class VvtrData:
             start_time: 开始时间(yyyy-MM-dd)
             end_time: 结束时间(yyyy-MM-dd)
             bob_index: 时间字段索引
+            file_index: 本页开始的文件序号
+            offset: 本页开始的文件中已经返回的匹配行数
+            count: 本页最多返回的条数
 
         Returns:
-            DataBack: 包含过滤后的数据和剩余文件路径
+            DataPage: 包含过滤后的数据和下一页开始的位置
         """
-        processed_path_index = 0
         result_lines = []
+        pruned = 0
+        position = None
+        paths_left = paths[file_index:]
 
         # 解析日期
         start_date = None
@@ -138,49 +112,130 @@ class VvtrData:
         except Exception as e:
             logger.error(f"日期时间解析失败，将使用字符串比较: {str(e)}")
 
-        for i, path in enumerate(paths):
-            processed_path_index = i
-            data = CsvMerger.parse_csv_without_header_as_string(path)
-            lines = data.split('\n')
-
-            for line in lines:
-                if not line.strip():
-                    continue
-
-                single = line.split(',')
-                if len(single) <= bob_index + 1:
-                    continue
-
-                # 时间校验
-                try:
-                    start_data_time = single[bob_index].split(' ')[0]
-                    end_data_time = single[bob_index + 1].split(' ')[0]
-
-                    start_date_local_time = datetime.strptime(start_data_time, "%Y-%m-%d").date()
-                    end_date_local_time = datetime.strptime(end_data_time, "%Y-%m-%d").date()
-
-                    if start_date and end_date and symbol:
-                        if (not start_date_local_time > end_date and
-                                not end_date_local_time < start_date and
-                                single[symbol_index] == symbol):
-                            result_lines.append(line)
-                    elif symbol:
-                        if single[symbol_index] == symbol:
-                            result_lines.append(line)
-                    else:
-                        result_lines.append(line)
-                except Exception as e:
-                    logger.error(f"处理行时出错: {str(e)}")
+        # 单个symbol优先从按symbol合并的数据中顺序读取，没有合并或已经变化的日期再读取日线文件
+        stored_lines: List[Optional[List[str]]] = [None] * len(paths_left)
+        stored_bob_index = stored_symbol_index = -1
+        stored = SymbolStore.select(paths_left, symbol) if symbol and paths_left else None
+        if stored is not None:
+            header, selected = stored
+            columns = [field.strip().lower() for field in header.split(',')]
+            if "bob" in columns and "symbol" in columns:
+                stored_lines = selected
+                stored_bob_index, stored_symbol_index = columns.index("bob"), columns.index("symbol")
+        paths_to_read = [path for path, lines in zip(paths_left, stored_lines) if lines is None]
+
+        # 各文件并行读取和过滤，按路径顺序合并，本页取满后不再读取后面的文件
+        scan = partial(self.scan_day_file, symbol=symbol, symbol_index=symbol_index, bob_index=bob_index,
+                       start_date=start_date, end_date=end_date)
+        scanned = ScanExecutor.map(scan, paths_to_read, ramp=True)
+        try:
+            for i, lines in enumerate(stored_lines):
+                if lines is not None:
+                    lines = self.filter_day_lines(lines, symbol, start_date, end_date,
+                                                  stored_bob_index, stored_symbol_index)
+                else:
+                    lines = next(scanned)
+                    if lines is None:
+                        pruned += 1
+                        continue
+                skip = offset if i == 0 else 0
+                end = skip + count - len(result_lines)
+                result_lines.extend(lines[skip:end])
+                if len(result_lines) >= count:
+                    # 下一页从当前文件剩下的行或下一个文件开始
+                    if end < len(lines):
+                        position = (i, end)
+                    elif i + 1 < len(paths_left):
+                        position = (i + 1, 0)
+                    break
+        finally:
+            scanned.close()
 
-        # 剩余的路径
-        remaining_paths = paths[processed_path_index + 1:]
         result_str = '\n'.join(result_lines)
         if result_str and not result_str.endswith('\n'):
             result_str += '\n'
 
-        return DataBack(result_str, remaining_paths)
+        self.log_pruned(pruned, len(paths_to_read))
+        return self.to_page(result_str, file_index, position, pruned)
+
+    def scan_day_file(self, path: Path, symbol: str, symbol_index: int, bob_index: int,
+                      start_date: Optional[date], end_date: Optional[date]) -> Optional[List[str]]:
+        """
+        读取单个日线文件中匹配的数据(由 ScanExecutor 并行调用)
+
+        Args:
+            path: 文件路径
+            symbol: 符号
+            symbol_index: 第一个文件中符号的索引
+            bob_index: 第一个文件中时间字段的索引
+            start_date: 开始日期
+            end_date: 结束日期
+
+        Returns:
+            匹配的数据行，根据 zone map 跳过时返回None
+        """
+        # 与逐行过滤一致：只有同时指定symbol和开始、结束日期时才按日期范围过滤
+        both = symbol and start_date and end_date
+        if not ZoneMap.may_contain(path, "days", TimeFilter.to_date_key(start_date) if both else None,
+                                   TimeFilter.to_date_key(end_date) if both else None, symbol or None):
+            return None
+
+        # 每个文件使用自己表头中的列索引
+        path_bob_index = self.column_index(path, "bob", bob_index)
+        path_symbol_index = self.column_index(path, "symbol", symbol_index)
+        if path_bob_index < 0 or (symbol and path_symbol_index < 0):
+            logger.warning(f"文件缺少bob或symbol列，已跳过: {path}")
+            return []
+
+        # 优先使用列式缓存做向量化过滤
+        table = ColumnarCache.load(path)
+        if table is not None:
+            selected = self.select_day_lines(table, symbol, path_symbol_index, start_date, end_date, path_bob_index)
+            if selected is not None:
+                return selected
+
+        return self.filter_day_lines(self.read_all_lines(path), symbol, start_date, end_date,
+                                     path_bob_index, path_symbol_index)
+
+    def filter_day_lines(self, lines: Sequence[str], symbol: str, start_date: Optional[date], end_date: Optional[date],
+                         bob_index: int, symbol_index: int) -> List[str]:
+        """
+        逐行过滤日线数据，同时指定symbol和开始、结束日期时保留与日期范围有交集的数据
+        """
+        start_key = TimeFilter.to_date_key(start_date)
+        end_key = TimeFilter.to_date_key(end_date)
+        result_lines = []
+        for line in lines:
+            if not line.strip():
+                continue
+
+            single = line.split(',')
+            if len(single) <= bob_index + 1:
+                continue
 
-    def get_min_data(self, paths: List[Path], start_time: str, end_time: str, bob_index: int) -> DataBack:
+            # 时间校验
+            try:
+                start_date_local_time = TimeFilter.date_key(single[bob_index])
+                end_date_local_time = TimeFilter.date_key(single[bob_index + 1])
+                if start_date_local_time is None or end_date_local_time is None:
+                    raise ValueError(f"无法解析日期: {single[bob_index]}, {single[bob_index + 1]}")
+
+                if start_date and end_date and symbol:
+                    if (not start_date_local_time > end_key and
+                            not end_date_local_time < start_key and
+                            single[symbol_index] == symbol):
+                        result_lines.append(line)
+                elif symbol:
+                    if single[symbol_index] == symbol:
+                        result_lines.append(line)
+                else:
+                    result_lines.append(line)
+            except Exception as e:
+                logger.error(f"处理行时出错: {str(e)}")
+        return result_lines
+
+    def get_min_data(self, paths: List[Path], start_time: str, end_time: str, bob_index: int,
+                     file_index: int = 0, offset: int = 0, count: int = 1000, max_bytes: int = 0) -> DataPage:
         """
         获取分钟数据
 
@@ -189,14 +244,14 @@ class VvtrData:
             start_time: 开始时间(yyyy-MM-dd HH:mm:ss)
             end_time: 结束时间(yyyy-MM-dd HH:mm:ss)
             bob_index: 时间字段索引
+            file_index: 本页开始的文件序号
+            offset: 本页开始的字节偏移，为0时从文件开头定位
+            count: 本页最多返回的条数
+            max_bytes: 本页数据最多的字节数，为0时不限制
 
         Returns:
-            DataBack: 包含过滤后的数据和剩余文件路径
+            DataPage: 包含过滤后的数据和下一页开始的位置
         """
-        processed_path_index = 0
-        result_lines = []
-        total_line = 0
-
         # 解析日期时间
         start_datetime = None
         end_datetime = None
@@ -208,50 +263,27 @@ class VvtrData:
         except Exception as e:
             logger.error(f"日期时间解析失败，将使用字符串比较: {str(e)}")
 
-        for i, path in enumerate(paths):
-            processed_path_index = i
-            data = CsvMerger.parse_csv_without_header_as_string(path)
-            data_lines = CsvMerger.count_lines(data)
-            total_line += data_lines
-
-            if total_line > 1000 and i > 0:
-                break
-
-            lines = data.split('\n')
-            for line in lines:
-                if not line.strip():
-                    continue
-
-                single = line.split(',')
-                if len(single) <= bob_index + 1:
-                    continue
+        # 只有同时指定开始和结束时间时才按时间范围跳过文件
+        both = start_datetime is not None and end_datetime is not None
+        pruned = []
+        skip = self.zone_skip(pruned, "bob", TimeFilter.to_time_key(start_datetime) if both else None,
+                              TimeFilter.to_time_key(end_datetime) if both else None)
+        scan = partial(self.scan_min_file, bob_index=bob_index, start_datetime=start_datetime,
+                       end_datetime=end_datetime)
+        prefetch = partial(self.scan_min_rows, bob_index=bob_index, start_datetime=start_datetime,
+                           end_datetime=end_datetime)
+        rows = self.scan_rows_parallel(paths[file_index:], offset, scan, prefetch, skip, pruned, count)
+        result_lines, position = self.take_page(paths[file_index:], rows, count, max_bytes)
 
-                # 时间校验
-                try:
-                    start_data_time = single[bob_index].split('+')[0]
-                    end_data_time = single[bob_index + 1].split('+')[0]
-
-                    start_date_local_time = datetime.strptime(start_data_time, "%Y-%m-%d %H:%M:%S")
-                    end_date_local_time = datetime.strptime(end_data_time, "%Y-%m-%d %H:%M:%S")
-
-                    if start_datetime and end_datetime:
-                        if (not start_date_local_time > end_datetime and
-                                not end_date_local_time < start_datetime):
-                            result_lines.append(line)
-                    else:
-                        result_lines.append(line)
-                except Exception as e:
-                    logger.error(f"处理行时出错: {str(e)}")
-
-        # 剩余的路径
-        remaining_paths = paths[processed_path_index + 1:]
         result_str = '\n'.join(result_lines)
         if result_str and not result_str.endswith('\n'):
             result_str += '\n'
 
-        return DataBack(result_str, remaining_paths)
+        self.log_pruned(len(pruned), len(paths) - file_index)
+        return self.to_page(result_str, file_index, position, len(pruned))
 
-    def get_min500_data(self, paths: List[Path], start_time: str, end_time: str, bob_index: int) -> DataBack:
+    def get_min500_data(self, paths: List[Path], start_time: str, end_time: str, bob_index: int,
+                        file_index: int = 0, offset: int = 0, max_bytes: int = 0) -> DataPage:
         """
         获取分钟数据，限制500条
 
@@ -260,186 +292,669 @@ class VvtrData:
             start_time: 开始时间(yyyy-MM-dd HH:mm:ss)
             end_time: 结束时间(yyyy-MM-dd HH:mm:ss)
             bob_index: 时间字段索引
+            file_index: 本页开始的文件序号
+            offset: 本页开始的字节偏移，为0时从文件开头定位
+            max_bytes: 本页数据最多的字节数，为0时不限制
 
         Returns:
-            DataBack: 包含过滤后的数据和剩余文件路径
+            DataPage: 包含过滤后的数据和下一页开始的位置
         """
-        # 与get_min_data类似，但限制500条
-        processed_path_index = 0
-        result_lines = []
-        total_line = 0
+        return self.get_min_data(paths, start_time, end_time, bob_index, file_index, offset, 500, max_bytes)
+
+    def get_tick_data(self, paths: List[Path], start_time: str, end_time: str,
+                      create_time_index: int, file_index: int, offset: int, count: int) -> DataPage:
+        """
+        获取Tick数据
+
+        Args:
+            paths: 文件路径列表
+            start_time: 开始时间(yyyy-MM-dd HH:mm:ss)
+            end_time: 结束时间(yyyy-MM-dd HH:mm:ss)
+            create_time_index: 创建时间在CSV中的索引
+            file_index: 本页开始的文件序号
+            offset: 本页开始的字节偏移，为0时从文件开头定位
+            count: 需要读取的条数
+
+        Returns:
+            DataPage: 包含数据和下一页开始的位置
+        """
+        if count > 180 or count <= 0:
+            count = 180
 
         # 解析日期时间
         start_datetime = None
         end_datetime = None
+
         try:
             if start_time:
                 start_datetime = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
             if end_time:
                 end_datetime = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
         except Exception as e:
-            logger.error(f"日期时间解析失败，将使用字符串比较: {str(e)}")
+            logger.error(f"日期时间解析失败: {str(e)}")
+        start_key = TimeFilter.to_time_key(start_datetime)
+        end_key = TimeFilter.to_time_key(end_datetime)
+
+        # 每个文件只解析一次表头，不一致的警告也只记录一次
+        time_indexes: Dict[Path, int] = {}
+
+        def time_index(path: Path) -> int:
+            index = time_indexes.get(path)
+            if index is None:
+                index = time_indexes[path] = self.column_index(path, "created_at", create_time_index)
+            return index
+
+        def seek(path: Path) -> int:
+            # 二分定位到第一条不早于开始时间的数据
+            path_time_index = time_index(path)
+            if path_time_index < 0:
+                return TimeSeek.header_end(path)
+            return TimeSeek.seek(path, path_time_index, start_key)
+
+        def stop(path: Path, line: str) -> bool:
+            # 数据按时间排序，遇到晚于结束时间的数据即可结束当前文件
+            record_time = TimeSeek.parse_time(line.encode('utf-8'), time_index(path))
+            return record_time is not None and record_time > end_key
+
+        def accept(path: Path, line: str) -> bool:
+            # 只切分出创建时间字段，其余字段原样返回
+            created_at_field = CsvFields.field(line, time_index(path))
+
+            # 确保创建时间索引在范围内
+            if created_at_field is None:
+                logger.warning("警告: 创建时间索引超出范围")
+                return False
+
+            # 提取日期时间并做时间筛选
+            record_time = self.extract_time_key(created_at_field)
+            return self.should_include_record(record_time, start_key, end_key)
+
+        pruned = []
+        result_lines, position = self.read_page(
+            paths[file_index:], offset, count, accept,
+            seek=seek if start_datetime and create_time_index >= 0 else None,
+            stop=stop if end_datetime and create_time_index >= 0 else None,
+            skip=self.zone_skip(pruned, "created_at", start_key, end_key))
+
+        # 在数据前加上表头
+        if result_lines:
+            header_line = self.read_header(paths[file_index])
+            if header_line:
+                result_lines.insert(0, header_line)
+
+        self.log_pruned(len(pruned), len(paths) - file_index)
+        return self.to_page('\n'.join(result_lines), file_index, position, len(pruned))
+
+    def get_data_count(self, paths: List[Path], data_type: str, symbol: Optional[str] = None,
+                       start_time: Optional[str] = None, end_time: Optional[str] = None) -> int:
+        """
+        统计数据条数，过滤条件与对应的查询接口一致
 
-        for i, path in enumerate(paths):
-            processed_path_index = i
-            data = CsvMerger.parse_csv_without_header_as_string(path)
-            data_lines = CsvMerger.count_lines(data)
-            total_line += data_lines
+        行数来自附属文件中的统计，分钟和tick文件有时间范围时二分定位后只统计该片段的换行符，
+        不需要读取和解析数据。
 
-            if total_line > 500 and i > 0:  # 这里限制为500
-                break
+        Args:
+            paths: 文件路径列表
+            data_type: 数据类型,eg:1d,1m,15m,tick
+            symbol: 种类代码(1d使用)
+            start_time: 开始时间(1d为yyyy-MM-dd,其他为yyyy-MM-dd HH:mm:ss)
+            end_time: 结束时间(1d为yyyy-MM-dd,其他为yyyy-MM-dd HH:mm:ss)
 
-            lines = data.split('\n')
-            for line in lines:
-                if not line.strip():
-                    continue
+        Returns:
+            数据条数
+        """
+        total = 0
+        pruned = 0
+        count = partial(self.count_file, data_type=data_type, symbol=symbol, start_time=start_time,
+                        end_time=end_time)
+        for rows in ScanExecutor.map(count, paths):
+            if rows is None:
+                pruned += 1
+            else:
+                total += rows
+        self.log_pruned(pruned, len(paths))
+        return total
 
-                single = line.split(',')
-                if len(single) <= bob_index + 1:
-                    continue
+    def count_file(self, path: Path, data_type: str, symbol: Optional[str], start_time: Optional[str],
+                   end_time: Optional[str]) -> Optional[int]:
+        """
+        统计单个文件的数据条数(由 ScanExecutor 并行调用)
 
-                # 时间校验
-                try:
-                    start_data_time = single[bob_index].split('+')[0]
-                    end_data_time = single[bob_index + 1].split('+')[0]
+        Returns:
+            数据条数，根据 zone map 跳过时返回None，文件无法读取时返回0
+        """
+        try:
+            # 只使用已有的 zone map，不为统计读取整个文件
+            if not self.count_may_match(path, data_type, symbol, start_time, end_time):
+                return None
+            if data_type == "1d":
+                return self.count_day_rows(path, symbol, start_time, end_time)
+            if data_type in ("1m", "15m"):
+                return self.count_min_rows(path, start_time, end_time)
+            if data_type == "tick":
+                return self.count_tick_rows(path, start_time, end_time)
+        except Exception as e:
+            logger.error(f"统计数据条数失败: {path} - {str(e)}")
+        return 0
 
-                    start_date_local_time = datetime.strptime(start_data_time, "%Y-%m-%d %H:%M:%S")
-                    end_date_local_time = datetime.strptime(end_data_time, "%Y-%m-%d %H:%M:%S")
+    def count_may_match(self, path: Path, data_type: str, symbol: Optional[str], start_time: Optional[str],
+                        end_time: Optional[str]) -> bool:
+        """
+        根据已有的 zone map 判断文件中是否可能有需要统计的数据，判断条件与对应的统计方法一致
+        """
+        if data_type == "1d":
+            start_key = TimeFilter.date_key(start_time) if start_time else None
+            end_key = TimeFilter.date_key(end_time) if end_time else None
+            both = symbol and start_key and end_key
+            # 日线统计不计入日期无法解析的行，没有symbol时也可以按是否有可解析的行跳过
+            return ZoneMap.may_contain(path, "days", start_key if both else None, end_key if both else None,
+                                       symbol or None, build=False)
+
+        # 分钟和tick按二分定位的位置统计，没有可解析时间的行时位置之间的行也会计入，不能跳过
+        start_key = TimeFilter.time_key(start_time) if start_time else None
+        end_key = TimeFilter.time_key(end_time) if end_time else None
+        zone = ZoneMap.load(path, build=False)
+        if data_type in ("1m", "15m") and start_key and end_key and zone and zone.get("bob"):
+            return ZoneMap.may_contain(path, "bob", start_key, end_key, build=False)
+        if data_type == "tick" and (start_key or end_key) and zone and zone.get("created_at"):
+            return ZoneMap.may_contain(path, "created_at", start_key, end_key, build=False)
+        return True
+
+    def count_day_rows(self, path: Path, symbol: Optional[str], start_time: Optional[str],
+                       end_time: Optional[str]) -> int:
+        """
+        统计日线文件中的条数，开始和结束日期都指定时统计与日期范围有交集的数据
+        """
+        symbols = FileStats.load(path, by_symbol=True)["symbols"]
+        if symbol:
+            entries = symbols.get(symbol, [])
+        else:
+            entries = [entry for items in symbols.values() for entry in items]
 
-                    if start_datetime and end_datetime:
-                        if (not start_date_local_time > end_datetime and
-                                not end_date_local_time < start_datetime):
-                            result_lines.append(line)
-                    else:
-                        result_lines.append(line)
-                except Exception as e:
-                    logger.error(f"处理行时出错: {str(e)}")
+        start_key = TimeFilter.date_key(start_time) if start_time else None
+        end_key = TimeFilter.date_key(end_time) if end_time else None
+        if symbol and start_key and end_key:
+            return sum(count for bob_date, eob_date, count in entries
+                       if not bob_date > end_key and not eob_date < start_key)
+        return sum(count for _, _, count in entries)
 
-        # 剩余的路径
-        remaining_paths = paths[processed_path_index + 1:]
-        result_str = '\n'.join(result_lines)
-        if result_str and not result_str.endswith('\n'):
-            result_str += '\n'
+    def count_min_rows(self, path: Path, start_time: Optional[str], end_time: Optional[str]) -> int:
+        """
+        统计分钟文件中的条数，开始和结束时间都指定时统计与时间范围有交集的数据
+        """
+        start_key = TimeFilter.time_key(start_time) if start_time else None
+        end_key = TimeFilter.time_key(end_time) if end_time else None
+        bob_index = CsvSchema.index(path, "bob")
+        if not (start_key and end_key) or bob_index < 0:
+            return FileStats.load(path)["rows"]
+
+        # 第一条eob不早于开始时间的数据到第一条bob晚于结束时间的数据之间
+        start = TimeSeek.seek(path, bob_index + 1, start_key)
+        end = TimeSeek.seek(path, bob_index, end_key, after=True)
+        return FileStats.count_lines(path, start, end)
+
+    def count_tick_rows(self, path: Path, start_time: Optional[str], end_time: Optional[str]) -> int:
+        """
+        统计tick文件中创建时间在时间范围内的条数
+        """
+        start_key = TimeFilter.time_key(start_time) if start_time else None
+        end_key = TimeFilter.time_key(end_time) if end_time else None
+        create_time_index = CsvSchema.index(path, "created_at")
+        if not (start_key or end_key) or create_time_index < 0:
+            return FileStats.load(path)["rows"]
 
-        return DataBack(result_str, remaining_paths)
+        start = TimeSeek.seek(path, create_time_index, start_key) if start_key else TimeSeek.header_end(path)
+        end = TimeSeek.seek(path, create_time_index, end_key, after=True) if end_key else DataFile.size(path)
+        return FileStats.count_lines(path, start, end)
 
-    def get_tick_data(self, paths: List[Path], start_time: str, end_time: str,
-                      create_time_index: int, next_index: int, count: int) -> DataLabel:
+    def column_index(self, path: Path, name: str, expected: int) -> int:
         """
-        获取Tick数据
+        获取文件自己表头中的列索引，与第一个文件的索引不同时记录警告
+
+        Args:
+            path: 文件路径
+            name: 列名
+            expected: 第一个文件中该列的索引
+
+        Returns:
+            列索引，文件无法读取时返回 expected，没有该列时返回-1
+        """
+        try:
+            index = CsvSchema.index(path, name)
+        except (OSError, UnicodeDecodeError):
+            return expected
+        if index != expected:
+            logger.warning(f"文件表头与第一个文件不一致，{name} 列使用该文件的索引 {index}: {path}")
+        return index
+
+    def read_page(self, paths: List[Path], offset: int, count: int,
+                  accept: Callable[[Path, str], bool],
+                  seek: Optional[Callable[[Path], int]] = None,
+                  stop: Optional[Callable[[Path, str], bool]] = None,
+                  max_bytes: int = 0,
+                  skip: Optional[Callable[[Path], bool]] = None) -> Tuple[List[str], Optional[Tuple[int, int]]]:
+        """
+        从第一个文件的 offset 处开始读取一页数据
 
         Args:
             paths: 文件路径列表
-            start_time: 开始时间(yyyy-MM-dd HH:mm:ss)
-            end_time: 结束时间(yyyy-MM-dd HH:mm:ss)
-            create_time_index: 创建时间在CSV中的索引
-            next_index: 上一次的读取位置
-            count: 需要读取的条数
+            offset: 第一个文件中开始读取的字节偏移，为0时从文件开头(或 seek 定位的位置)开始
+            count: 本页最多返回的条数
+            accept: 行过滤函数，参数为(文件路径, 数据行)
+            seek: 从头读取文件时用于定位起始字节偏移的函数，为None时从第一行开始
+            stop: 判断是否结束当前文件的函数，参数为(文件路径, 数据行)，为None时读到文件末尾
+            max_bytes: 本页数据最多的字节数，为0时不限制
+            skip: 判断是否跳过整个文件的函数，为None时不跳过
 
         Returns:
-            DataLabel: 包含数据、下一次的读取位置和剩余文件路径
+            (数据行列表, 下一页开始的(文件序号, 字节偏移))，读完所有文件时位置为None
         """
-        if count > 180:
-            count = 180
+        rows = self.scan_rows(paths, offset,
+                              lambda path, start: self.scan_file(path, start, accept, seek, stop), skip)
+        return self.take_page(paths, rows, count, max_bytes)
 
+    def scan_rows(self, paths: List[Path], offset: int,
+                  scan: Callable[[Path, int], Iterator[Tuple[int, int, str]]],
+                  skip: Optional[Callable[[Path], bool]] = None) -> Iterator[Tuple[int, int, int, str]]:
+        """
+        按文件顺序流式产生匹配的数据行，只在取用时读取
+
+        Args:
+            paths: 文件路径列表
+            offset: 第一个文件中开始读取的字节偏移
+            scan: 单个文件的扫描函数，参数为(文件路径, 开始的字节偏移)，产生(行起始偏移, 行结束偏移, 数据行)
+            skip: 判断是否跳过整个文件的函数(不打开文件)，为None时不跳过
+
+        Returns:
+            (文件序号, 行起始偏移, 行结束偏移, 数据行)
+        """
+        for i, path in enumerate(paths):
+            try:
+                if skip is not None and skip(path):
+                    continue
+                for start, end, line in scan(path, offset if i == 0 else 0):
+                    yield i, start, end, line
+            except Exception as e:
+                logger.error(f"读取文件失败: {str(e)}")
+
+    def scan_rows_parallel(self, paths: List[Path], offset: int,
+                           scan: Callable[[Path, int], Iterator[Tuple[int, int, str]]],
+                           prefetch: Callable[..., Optional[List[Tuple[int, int, str]]]],
+                           skip: Callable[[Path], bool], pruned: List[Path],
+                           count: int) -> Iterator[Tuple[int, int, int, str]]:
+        """
+        与 scan_rows 相同，但由 ScanExecutor 预读后面的文件，结果仍按文件顺序产生
+
+        当前文件流式读取，只在取用时读取；后面的文件交给 ScanExecutor 预读，每个文件最多取回
+        本页还需要的条数，内存占用不随文件大小增长。预读的文件数从0开始，每读完一个文件翻倍，
+        一页只需要前几个文件时不会读取后面的文件。
+
+        Args:
+            paths: 文件路径列表
+            offset: 第一个文件中开始读取的字节偏移
+            scan: 单个文件的扫描函数，参数为(文件路径, 开始的字节偏移)，产生(行起始偏移, 行结束偏移, 数据行)
+            prefetch: 预读函数，参数为((文件路径, 开始的字节偏移), limit=最多返回的行数)，
+                      返回该文件匹配的行，根据 zone map 跳过时返回None
+            skip: 判断是否跳过整个文件的函数(不打开文件)，跳过的文件由它记录到 pruned 中
+            pruned: 记录跳过的文件
+            count: 本页最多返回的条数，也是预读时每个文件取回的行数上限
+
+        Returns:
+            (文件序号, 行起始偏移, 行结束偏移, 数据行)
+        """
+        # 预读中的文件，按顺序对应当前文件之后的文件：(Future, 取回的行数上限)
+        pending = deque()
+        window = 0
+        taken = 0
+        try:
+            for i, path in enumerate(paths):
+                future, limit = pending.popleft() if pending else (None, 0)
+                while (ScanExecutor.WORKERS > 1 and len(pending) < window
+                       and i + 1 + len(pending) < len(paths)):
+                    limit_next = max(1, count - taken)
+                    item = (paths[i + 1 + len(pending)], 0)
+                    pending.append((ScanExecutor.submit(partial(prefetch, limit=limit_next), item), limit_next))
+                window = min(window * 2 or 1, ScanExecutor.IN_FLIGHT)
+
+                try:
+                    resume = offset if i == 0 else 0
+                    if future is not None:
+                        rows = future.result()
+                        if rows is None:
+                            pruned.append(path)
+                            continue
+                        for start, end, line in rows:
+                            taken += 1
+                            yield i, start, end, line
+                        if not rows or len(rows) < limit:
+                            continue
+                        # 预读达到行数上限，剩下的行流式读取
+                        resume = rows[-1][1]
+                    elif skip(path):
+                        continue
+
+                    for start, end, line in scan(path, resume):
+                        taken += 1
+                        yield i, start, end, line
+                except Exception as e:
+                    logger.error(f"读取文件失败: {str(e)}")
+        finally:
+            # 调用方提前结束时取消还没开始的预读
+            for future, _ in pending:
+                future.cancel()
+
+    def take_page(self, paths: List[Path], rows: Iterator[Tuple[int, int, int, str]], count: int,
+                  max_bytes: int = 0) -> Tuple[List[str], Optional[Tuple[int, int]]]:
+        """
+        从行流中取出一页数据，达到条数或字节数上限时立即停止，之后的行不会被读取
+
+        遇到表头与第一个文件不同的文件时也结束本页，保证一页数据的列顺序一致。
+
+        Args:
+            paths: 文件路径列表
+            rows: scan_rows 产生的行流
+            count: 本页最多返回的条数
+            max_bytes: 本页数据最多的字节数(按UTF-8编码加换行符计算)，为0时不限制，至少返回一条
+
+        Returns:
+            (数据行列表, 下一页开始的(文件序号, 字节偏移))，读完所有文件时位置为None
+        """
         result_lines = []
-        total_line = 0
+        size = 0
+        header = CsvSchema.header(paths[0]) if paths else None
+        current = 0
+
+        for i, start, end, line in rows:
+            if i != current:
+                current = i
+                if result_lines and CsvSchema.header(paths[i]) != header:
+                    # 表头不同的文件从下一页开始
+                    logger.warning(f"文件表头与第一个文件不一致，从下一页开始读取: {paths[i]}")
+                    return result_lines, (i, 0)
+
+            line_size = len(line.encode('utf-8')) + 1
+            if max_bytes > 0 and result_lines and size + line_size > max_bytes:
+                # 放不下的行留到下一页
+                return result_lines, (i, start)
+
+            result_lines.append(line)
+            size += line_size
+            if len(result_lines) >= count:
+                # 下一页从当前文件的下一行继续
+                return result_lines, (i, end)
+
+        return result_lines, None
+
+    def to_page(self, data: str, file_index: int, position: Optional[Tuple[int, int]],
+                pruned: int = 0) -> DataPage:
+        """
+        把 take_page 返回的相对位置转为整个文件列表中的位置
+        """
+        if position is None:
+            return DataPage(data, None, 0, pruned)
+        return DataPage(data, file_index + position[0], position[1], pruned)
 
-        # 解析日期时间
-        start_datetime = None
-        end_datetime = None
-        index = 0
-        current_line = 0
+    def zone_skip(self, pruned: List[Path], column: str, start_key: Optional[str],
+                  end_key: Optional[str]) -> Callable[[Path], bool]:
+        """
+        生成根据 zone map 跳过文件的函数，跳过的文件记录到 pruned 中
 
+        Args:
+            pruned: 记录跳过的文件
+            column: zone map 中的时间范围,eg:bob,created_at
+            start_key: 开始时间的比较键，为None时不限制
+            end_key: 结束时间的比较键，为None时不限制
+
+        Returns:
+            参数为文件路径，一定没有匹配数据时返回True
+        """
+        def skip(path: Path) -> bool:
+            if ZoneMap.may_contain(path, column, start_key, end_key):
+                return False
+            pruned.append(path)
+            return True
+
+        return skip
+
+    def log_pruned(self, pruned: int, total: int) -> None:
+        """记录本次查询根据 zone map 跳过的文件数"""
+        if pruned:
+            logger.info(f"根据zone map跳过了 {pruned}/{total} 个文件")
+
+    def scan_file(self, path: Path, offset: int, accept: Callable[[Path, str], bool],
+                  seek: Optional[Callable[[Path], int]] = None,
+                  stop: Optional[Callable[[Path, str], bool]] = None) -> Iterator[Tuple[int, int, str]]:
+        """
+        逐行扫描单个文件，产生通过过滤的数据行
+
+        Args:
+            path: 文件路径
+            offset: 开始的字节偏移，为0时由 seek 定位(seek 为None时从第一行开始)
+            accept: 行过滤函数
+            seek: 定位起始字节偏移的函数
+            stop: 判断是否结束当前文件的函数
+
+        Returns:
+            (行起始偏移, 行结束偏移, 数据行)
+        """
+        for start, end, line in self.open_rows(path, offset, seek):
+            if line and stop is not None and stop(path, line):
+                return
+            if line and accept(path, line):
+                yield start, end, line
+
+    def scan_min_rows(self, item: Tuple[Path, int], bob_index: int, start_datetime: Optional[datetime],
+                      end_datetime: Optional[datetime], limit: int = 0) -> Optional[List[Tuple[int, int, str]]]:
+        """
+        读取单个分钟文件中匹配的行(由 ScanExecutor 并行调用)
+
+        Args:
+            item: (文件路径, 开始的字节偏移)
+            bob_index: 第一个文件中的时间字段索引
+            start_datetime: 开始时间
+            end_datetime: 结束时间
+            limit: 最多返回的行数，为0时返回所有匹配的行
+
+        Returns:
+            (行起始偏移, 行结束偏移, 数据行)列表，根据 zone map 跳过时返回None
+        """
+        path, offset = item
+        # 只有同时指定开始和结束时间时才按时间范围过滤
+        both = start_datetime is not None and end_datetime is not None
+        if not ZoneMap.may_contain(path, "bob", TimeFilter.to_time_key(start_datetime) if both else None,
+                                   TimeFilter.to_time_key(end_datetime) if both else None):
+            return None
         try:
-            if start_time:
-                start_datetime = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
-            if end_time:
-                end_datetime = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
+            rows = self.scan_min_file(path, offset, bob_index, start_datetime, end_datetime)
+            return list(islice(rows, limit) if limit > 0 else rows)
         except Exception as e:
-            logger.error(f"日期时间解析失败: {str(e)}")
+            logger.error(f"读取文件失败: {str(e)}")
+            return []
 
-        processed_path_index = 0
-        for i, path in enumerate(paths):
-            processed_path_index = i
-            current_line = CsvMerger.count_lines(CsvMerger.parse_csv_without_header_as_string(paths[i]))
+    def scan_min_file(self, path: Path, offset: int, bob_index: int, start_datetime: Optional[datetime],
+                      end_datetime: Optional[datetime]) -> Iterator[Tuple[int, int, str]]:
+        """
+        扫描单个分钟文件，产生与时间范围有交集的数据行
 
-            try:
-                with open(path, 'r', encoding='utf-8') as file:
-                    # 获取并跳过标题行
-                    header_line = file.readline()
-                    if header_line:
-                        result_lines.append(header_line.rstrip())
-
-                    # 读取和处理数据行
-                    for line in file:
-                        line = line.rstrip()
-                        if not line:
-                            continue
+        开始和结束时间都指定时，定位到第一条结束时间(eob)不早于开始时间的数据，
+        读到第一条开始时间(bob)晚于结束时间的数据为止；否则读取整个文件。
+        有列式缓存时用向量化过滤得到行号，再分批取回原始行。
 
-                        fields = self.parse_csv_line(line)
-                        total_line += 1
+        Args:
+            path: 文件路径
+            offset: 开始的字节偏移，为0时从文件开头定位
+            bob_index: 第一个文件中的时间字段索引
+            start_datetime: 开始时间
+            end_datetime: 结束时间
 
-                        # 确保创建时间索引在范围内
-                        if len(fields) <= create_time_index or create_time_index < 0:
-                            logger.warning("警告: 创建时间索引超出范围")
-                            continue
+        Returns:
+            (行起始偏移, 行结束偏移, 数据行)
+        """
+        # 每个文件使用自己表头中的列索引
+        path_bob_index = self.column_index(path, "bob", bob_index)
+        if path_bob_index < 0:
+            logger.warning(f"文件缺少bob列，已跳过: {path}")
+            return
+
+        table = ColumnarCache.load(path)
+        selected = self.select_min_rows(table, path_bob_index, start_datetime, end_datetime) if table else None
+        if selected is not None:
+            selected = selected[table.offsets[selected] >= offset]
+            for begin in range(0, len(selected), self.FETCH_ROWS):
+                chunk = selected[begin:begin + self.FETCH_ROWS]
+                for row, line in zip(chunk, table.lines(chunk)):
+                    yield int(table.offsets[row]), int(table.offsets[row + 1]), line
+            return
+
+        start_key = TimeFilter.to_time_key(start_datetime)
+        end_key = TimeFilter.to_time_key(end_datetime)
+        both = start_datetime is not None and end_datetime is not None
+
+        def seek(file_path: Path) -> int:
+            return TimeSeek.seek(file_path, path_bob_index + 1, start_key)
+
+        def stop(file_path: Path, line: str) -> bool:
+            return self.line_time_key(line, path_bob_index) > end_key
+
+        def accept(file_path: Path, line: str) -> bool:
+            single = line.split(',')
+            if len(single) <= path_bob_index + 1:
+                return False
+
+            # 时间校验
+            start_date_local_time = TimeFilter.time_key(single[path_bob_index])
+            end_date_local_time = TimeFilter.time_key(single[path_bob_index + 1])
+            if start_date_local_time is None or end_date_local_time is None:
+                logger.error(f"处理行时出错: 无法解析时间: {single[path_bob_index]}, {single[path_bob_index + 1]}")
+                return False
+            if both:
+                return not start_date_local_time > end_key and not end_date_local_time < start_key
+            return True
+
+        yield from self.scan_file(path, offset, accept, seek if both else None, stop if both else None)
+
+    def open_rows(self, path: Path, offset: int,
+                  seek: Optional[Callable[[Path], int]]) -> Iterator[Tuple[int, int, str]]:
+        """
+        从指定字节偏移开始逐行读取文件，文件内容在缓存中时直接从内存读取
+
+        Args:
+            path: 文件路径
+            offset: 开始的字节偏移，为0时由 seek 定位(seek 为None时从第一行开始)；
+                    不在行首时(如文件已被修改)从下一行开始
+            seek: 定位起始字节偏移的函数
 
-                        # 提取日期时间
-                        created_at_field = fields[create_time_index]
-                        record_time = self.extract_date_time(created_at_field)
+        Returns:
+            (行起始偏移, 行结束偏移, 去掉换行符的数据行)
+        """
+        if offset <= 0 and seek is not None:
+            offset = seek(path)
+
+        partition = PartitionCache.rows(path)
+        if partition is not None:
+            offsets = partition.offsets
+            for row in range(partition.row_at_offset(offset), len(partition.lines)):
+                yield offsets[row], offsets[row + 1], partition.lines[row]
+            return
+
+        with DataFile.open(path) as file:
+            header_end = len(file.readline())
+            if offset > header_end:
+                file.seek(offset - 1)
+                if file.read(1) != b'\n':
+                    file.readline()
+                offset = file.tell()
+            else:
+                offset = header_end
+            for raw in file:
+                yield offset, offset + len(raw), raw.decode('utf-8').rstrip('\r\n')
+                offset += len(raw)
 
-                        # 时间筛选
-                        if self.should_include_record(record_time, start_datetime, end_datetime):
-                            result_lines.append(line)
+    def read_all_lines(self, path: Path) -> Sequence[str]:
+        """
+        读取文件的所有数据行(不含表头)，优先使用缓存中的内容
 
-                        if total_line - next_index > count and i > 0:
-                            break
-            except Exception as e:
-                logger.error(f"读取文件失败: {str(e)}")
+        Args:
+            path: 文件路径
 
-        # 每一行数据
-        all_lines = result_lines
-        # 实际限制
-        actual_limit = min(count, len(all_lines))
+        Returns:
+            数据行，来自缓存时为共享的元组，调用方不能修改
+        """
+        partition = PartitionCache.rows(path, full=True)
+        if partition is not None:
+            return partition.lines
+        return CsvMerger.parse_csv_without_header_as_string(path).split('\n')
 
-        # 提取结果
-        if next_index < len(all_lines):
-            result_data = all_lines[next_index:next_index + actual_limit]
-            result_str = '\n'.join(result_data)
-        else:
-            result_str = ""
+    def line_time_key(self, line: str, time_index: int) -> str:
+        """
+        取出一行中时间字段的比较键，无法解析时返回空字符串(排在所有时间之前)
+        """
+        field = CsvFields.field(line, time_index)
+        if field is None:
+            return ""
+        return TimeFilter.time_key(field.strip().strip('"')) or ""
+
+    def read_header(self, path: Path) -> str:
+        """读取文件的表头行"""
+        header = CsvSchema.header(path)
+        if header is None:
+            logger.error(f"读取文件失败: {path}")
+            return ""
+        return header
+
+    def select_day_lines(self, table: ColumnarTable, symbol: str, symbol_index: int,
+                         start_date: Optional[date], end_date: Optional[date],
+                         bob_index: int) -> Optional[List[str]]:
+        """
+        在列式数据上按symbol和日期过滤日线数据，过滤条件与逐行过滤一致
 
-        # 计算下一次索引
-        if count < len(all_lines):
-            index = next_index + actual_limit + current_line - len(all_lines)
-            if index < 0:
-                lines = CsvMerger.count_lines(CsvMerger.parse_csv_without_header_as_string(paths[0]))
-                index = lines + index
+        Returns:
+            匹配的数据行，缺少需要的列时返回None
+        """
+        if table.kinds.get(bob_index) != "time" or table.kinds.get(bob_index + 1) != "time":
+            return None
+        bob = table.column(bob_index)
+        eob = table.column(bob_index + 1)
+
+        mask = (bob != ColumnarCache.NAT) & (eob != ColumnarCache.NAT)
+        if symbol:
+            if table.kinds.get(symbol_index) != "symbol":
+                return None
+            mask &= table.column(symbol_index) == table.symbol_code(symbol)
+            if start_date and end_date:
+                mask &= (bob // 86400 <= self.to_day_number(end_date)) & \
+                        (eob // 86400 >= self.to_day_number(start_date))
+
+        return table.lines_where(mask)
+
+    def select_min_rows(self, table: ColumnarTable, bob_index: int, start_datetime: Optional[datetime],
+                        end_datetime: Optional[datetime]) -> Optional["np.ndarray"]:
+        """
+        在列式数据上按时间过滤分钟数据，过滤条件与逐行过滤一致
+
+        Returns:
+            匹配的数据行号(升序)，缺少需要的列时返回None
+        """
+        if table.kinds.get(bob_index) != "time" or table.kinds.get(bob_index + 1) != "time":
+            return None
+        bob = table.column(bob_index)
+        eob = table.column(bob_index + 1)
+
+        mask = (bob != ColumnarCache.NAT) & (eob != ColumnarCache.NAT)
+        if start_datetime and end_datetime:
+            mask &= (bob <= calendar.timegm(end_datetime.timetuple())) & \
+                    (eob >= calendar.timegm(start_datetime.timetuple()))
 
-        # 剩余的路径
-        remaining_paths = paths[processed_path_index:]
+        return table.rows_where(mask)
 
-        return DataLabel(result_str, index, remaining_paths)
+    @staticmethod
+    def to_day_number(day: date) -> int:
+        """日期转为距1970-01-01的天数"""
+        return calendar.timegm(day.timetuple()) // 86400
 
     def parse_csv_line(self, line: str) -> List[str]:
         """解析CSV行，正确处理引号内的内容"""
-        fields = []
-        in_quotes = False
-        field = ""
-
-        for i in range(len(line)):
-            c = line[i]
-            if c == '"':
-                in_quotes = not in_quotes
-            elif c == ',' and not in_quotes:
-                fields.append(field)
-                field = ""
-            else:
-                field += c
-
-        fields.append(field)  # 添加最后一个字段
-        return fields
+        return CsvFields.parse_line(line)
 
     def extract_date_time(self, created_at_field: str) -> Optional[datetime]:
         """从字段中提取日期时间"""
@@ -458,10 +973,21 @@ class VvtrData:
             logger.error(f"提取日期时间失败: {str(e)}")
             return None
 
-    def should_include_record(self, record_time: Optional[datetime],
-                              start_time: Optional[datetime],
-                              end_time: Optional[datetime]) -> bool:
-        """检查记录是否在指定的时间范围内"""
+    def extract_time_key(self, created_at_field: str) -> Optional[str]:
+        """从字段中提取时间比较键(yyyy-MM-dd HH:mm:ss)，与 extract_date_time 的解析规则一致"""
+        date_str = created_at_field
+        if "created_at" in date_str:
+            date_str = date_str[date_str.index(":") + 1:].strip()
+
+        record_time = TimeFilter.time_key(date_str)
+        if record_time is None:
+            logger.error(f"提取日期时间失败: {created_at_field}")
+        return record_time
+
+    def should_include_record(self, record_time: Optional[Union[datetime, str]],
+                              start_time: Optional[Union[datetime, str]],
+                              end_time: Optional[Union[datetime, str]]) -> bool:
+        """检查记录是否在指定的时间范围内，参数可以都是时间或者都是时间比较键"""
         if record_time is None:
             return True  # 如果无法解析时间，则包含该记录
         if start_time is None and end_time is None:
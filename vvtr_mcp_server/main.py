@@ -1,16 +1,30 @@
+import asyncio
 import functools
 import typing
+from datetime import datetime
 import os
 from pathlib import Path
 from typing import List, Optional
 import logging
 
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
 
-from vvtr_mcp_server.cal_data.vvtr_data import VvtrData
+from vvtr_mcp_server.cal_data.bar_analytics import BarAnalytics
+from vvtr_mcp_server.cal_data.bar_resampler import BarResampler
+from vvtr_mcp_server.cal_data.bar_series import BarSeries
+from vvtr_mcp_server.cal_data.cross_section import CrossSection
+from vvtr_mcp_server.cal_data.history_planner import HistoryPlanner
+from vvtr_mcp_server.cal_data.vvtr_data import DataPage, VvtrData
+from vvtr_mcp_server.main_station.history_kline_stream import HistoryKlineStream
 from vvtr_mcp_server.main_station.main_station_data import MainStationData
+from vvtr_mcp_server.main_station.symbol_universe import SymbolUniverse
+from vvtr_mcp_server.util.csv_catalog import CsvCatalog
 from vvtr_mcp_server.util.csv_merger import CsvMerger
-from vvtr_mcp_server.util.folder_size import FolderSize
+from vvtr_mcp_server.util.csv_schema import CsvSchema
+from vvtr_mcp_server.util.data_file import DataFile
+from vvtr_mcp_server.util.cursor_token import CursorToken
+from vvtr_mcp_server.util.time_filter import TimeFilter
+from vvtr_mcp_server.util.tool_runner import ToolRunner
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -26,10 +40,14 @@ vvtr_data = VvtrData()
 
 BASE_URL = "https://rest.vvtr.com/v1"
 
+# 合成K线一次最多返回的条数
+RESAMPLE_LIMIT = 1000
+
 
 
 @mcp.tool()
-async def get_financial_products_data_path(type: str, name: str, symbol: str, startTime: str, endTime: str) -> List[
+@ToolRunner.offload("local")
+def get_financial_products_data_path(type: str, name: str, symbol: str, startTime: str, endTime: str) -> List[
     str]:
     """获取所需金融产品历史数据的资源路径
 
@@ -60,58 +78,54 @@ async def get_financial_products_data_path(type: str, name: str, symbol: str, st
     #     return [str(path) for path in paths]
     # else:
     #     raise Exception('配置中请输入有效的apikey')
-    # 获取根目录路径
-    root_dir = Path(CsvMerger.ROOT) / type / name
-
     # 设置默认值
     if not startTime:
         startTime = "00000000"
     if not endTime:
         endTime = "99999999"
 
-    # 根据数据类型使用不同查找逻辑
+    # 根据数据类型使用不同查找逻辑，通过目录索引查询
     if name == "1d":
-        paths = CsvMerger.find_all_csv_files_with_date_range(root_dir, startTime, endTime)
+        paths = CsvCatalog.find_csv_files(type, name, startTime, endTime)
+        # 根据已有的zone map去掉一定不包含该symbol的日线文件
+        paths = CsvMerger.prune_by_symbol(paths, symbol)
     else:
-        paths = CsvMerger.find_all_csv_files_with_date_range_and_symbol(root_dir, startTime, endTime, symbol)
+        paths = CsvCatalog.find_csv_files(type, name, startTime, endTime, symbol)
 
     # 转换为字符串列表返回
     return [str(path) for path in paths]
 
 @mcp.tool()
-async def get_financial_products_data_count(pathStrs: List[str], type: str, symbol: Optional[str] = None) -> int:
-    """根据获取的金融产品资源路径查询数据条数(除了1d,其他的均为估计值)
+@ToolRunner.offload("local")
+def get_financial_products_data_count(pathStrs: List[str], type: str, symbol: Optional[str] = None,
+                                            startTime: Optional[str] = None, endTime: Optional[str] = None) -> int:
+    """根据获取的金融产品资源路径查询数据条数,可以按时间范围统计,用于规划分片查询
 
     Args:
         pathStrs: 要查询的资源路径,eg:[D:/data/fund/1m/202009/20200904/20200904.csv]
         type: 要查询的数据类型,eg:1d,1m,15m,tick
         symbol: 仅仅1d需要,种类代码
+        startTime: 统计的开始时间(1d为yyyy-MM-dd,其他为yyyy-MM-dd HH:mm:ss),可为空
+        endTime: 统计的结束时间(1d为yyyy-MM-dd,其他为yyyy-MM-dd HH:mm:ss),可为空
     """
     # 转换路径字符串为Path对象
     paths = [Path(path) for path in pathStrs]
-    # 获取文件总大小
-    size = FolderSize.get_file_size(paths)
-    # 根据不同类型返回估计的数据条数
-    if type == "1d":
-        data = CsvMerger.parse_multiple_csv_files_without_header(paths)
-        filter_data = CsvMerger.filter_data(data, symbol)
-        return CsvMerger.count_lines(filter_data)
-    elif type in ["1m", "15m"]:
-        return size // 120
-    elif type == "tick":
-        return size // 232
-    else:
-        return 0
+    # 根据附属文件中的行数统计精确的数据条数
+    return vvtr_data.get_data_count(paths, type, symbol, startTime or None, endTime or None)
 
 
 @mcp.tool()
-async def get_financial_products_min_data(pathStrs: List[str], startTime: str, endTime: str) -> dict:
-    """根据获取的分钟(1m/15m)类型金融产品资源路径查询数据,分片查询,受到上下文限制,一般需要多次请求,一次性查询不超过 1000 条,超过 1000 条分多次查询,会返回剩下需要查询的文件,返回文件为空即查完
+@ToolRunner.offload("local")
+def get_financial_products_min_data(pathStrs: List[str], startTime: str, endTime: str, cursorToken: str = "",
+                                          maxBytes: int = 0) -> dict:
+    """根据获取的分钟(1m/15m)类型金融产品资源路径查询数据,分片查询,受到上下文限制,一般需要多次请求,一次性查询不超过 1000 条,超过 1000 条分多次查询,has_next为true时用相同的参数和返回的next_cursor_token继续查询
 
     Args:
-        pathStrs: 要查询的资源路径,eg:[D:/data/fund/1m/202009/20200904/20200904.csv]
+        pathStrs: 要查询的资源路径,eg:[D:/data/fund/1m/202009/20200904/20200904.csv],继续查询时保持不变
         startTime: 查询的开始时间(yyyy-MM-dd HH:mm:ss),如果为空字符串则查询全部数据
         endTime: 查询的结束时间(yyyy-MM-dd HH:mm:ss),如果为空字符串则查询全部数据
+        cursorToken: 上一次返回的next_cursor_token,第一次则为空字符串
+        maxBytes: 一次返回的数据最多的字节数,不填则只限制条数
     """
     # 转换路径字符串为Path对象
     paths = [Path(path) for path in pathStrs]
@@ -120,25 +134,28 @@ async def get_financial_products_min_data(pathStrs: List[str], startTime: str, e
         startTime = None
     if not endTime:
         endTime = None
+    # 解析游标
+    query_hash = CursorToken.filter_hash("min", pathStrs, startTime, endTime)
+    file_index, offset = CursorToken.decode(cursorToken, query_hash)
     # 获取时间字段索引
-    bob_index = CsvMerger.get_bob_index(paths[0])
+    bob_index = CsvMerger.get_bob_index(paths[file_index]) if file_index < len(paths) else -1
     # 获取数据
-    result = vvtr_data.get_min_data(paths, startTime, endTime, bob_index)
+    result = vvtr_data.get_min_data(paths, startTime, endTime, bob_index, file_index, offset, 1000, maxBytes)
     # 转换为字典返回
-    return {
-        "data": result.data,
-        # "remaining_paths": [str(path) for path in result.remaining_paths]
-        "remaining_paths": API_KEY
-    }
+    return page_response(result, query_hash)
 
 @mcp.tool()
-async def get_financial_products_min_500_data(pathStrs: List[str], startTime: str, endTime: str) -> dict:
-    """根据获取的分钟(1m/15m)类型金融产品资源路径查询数据,分片查询,受到上下文限制,若get-financial-products-min-data被截断可尝试此方法,一般需要多次请求,一次性查询不超过 500 条,超过 500 条分多次查询,会返回剩下需要查询的文件,返回文件为空即查完
+@ToolRunner.offload("local")
+def get_financial_products_min_500_data(pathStrs: List[str], startTime: str, endTime: str,
+                                              cursorToken: str = "", maxBytes: int = 0) -> dict:
+    """根据获取的分钟(1m/15m)类型金融产品资源路径查询数据,分片查询,受到上下文限制,若get-financial-products-min-data被截断可尝试此方法,一般需要多次请求,一次性查询不超过 500 条,超过 500 条分多次查询,has_next为true时用相同的参数和返回的next_cursor_token继续查询
 
     Args:
-        pathStrs: 要查询的资源路径,eg:[D:/data/fund/1m/202009/20200904/20200904.csv]
+        pathStrs: 要查询的资源路径,eg:[D:/data/fund/1m/202009/20200904/20200904.csv],继续查询时保持不变
         startTime: 查询的开始时间(yyyy-MM-dd HH:mm:ss),如果为空字符串则查询全部数据
         endTime: 查询的结束时间(yyyy-MM-dd HH:mm:ss),如果为空字符串则查询全部数据
+        cursorToken: 上一次返回的next_cursor_token,第一次则为空字符串
+        maxBytes: 一次返回的数据最多的字节数,不填则只限制条数
     """
     # 转换路径字符串为Path对象
     paths = [Path(path) for path in pathStrs]
@@ -147,66 +164,264 @@ async def get_financial_products_min_500_data(pathStrs: List[str], startTime: st
         startTime = None
     if not endTime:
         endTime = None
+    # 解析游标
+    query_hash = CursorToken.filter_hash("min", pathStrs, startTime, endTime)
+    file_index, offset = CursorToken.decode(cursorToken, query_hash)
     # 获取时间字段索引
-    bob_index = CsvMerger.get_bob_index(paths[0])
+    bob_index = CsvMerger.get_bob_index(paths[file_index]) if file_index < len(paths) else -1
     # 获取数据
-    result = vvtr_data.get_min500_data(paths, startTime, endTime, bob_index)
+    result = vvtr_data.get_min500_data(paths, startTime, endTime, bob_index, file_index, offset, maxBytes)
     # 转换为字典返回
-    return {
-        "data": result.data,
-        "remaining_paths": [str(path) for path in result.remaining_paths]
-    }
+    return page_response(result, query_hash)
 
 
 @mcp.tool()
-async def get_financial_products_day_data(pathStrs: List[str], symbol: str, startTime: str = None,
-                                          endTime: str = None) -> dict:
-    """根据获取的日线(1d)类型金融产品资源路径查询数据,分片查询，一次性查询不超过1000条,超过1000条分多次查询,会返回剩下需要查询的文件,返回文件为空即查完
+@ToolRunner.offload("local")
+def get_financial_products_day_data(pathStrs: List[str], symbol: str, startTime: str = None,
+                                          endTime: str = None, cursorToken: str = "") -> dict:
+    """根据获取的日线(1d)类型金融产品资源路径查询数据,分片查询，一次性查询不超过1000条,超过1000条分多次查询,has_next为true时用相同的参数和返回的next_cursor_token继续查询
 
     Args:
-        pathStrs: 要查询的资源路径,eg:[D:/data/fund/1d/202009/20200904/20200904.csv]
+        pathStrs: 要查询的资源路径,eg:[D:/data/fund/1d/202009/20200904/20200904.csv],继续查询时保持不变
         symbol: 种类代码
         startTime: 查询的开始时间(yyyy-MM-dd),如果为空字符串则查询全部数据
         endTime: 查询的结束时间(yyyy-MM-dd),如果为空字符串则查询全部数据
+        cursorToken: 上一次返回的next_cursor_token,第一次则为空字符串
     """
     # 转换路径字符串为Path对象
     paths = [Path(path) for path in pathStrs]
+    # 解析游标
+    query_hash = CursorToken.filter_hash("day", pathStrs, symbol, startTime or None, endTime or None)
+    file_index, offset = CursorToken.decode(cursorToken, query_hash)
     # 获取索引
     bob_index = CsvMerger.get_bob_index(paths[0])
     symbol_index = CsvMerger.get_symbol_index(paths[0])
     # 获取数据
-    result = vvtr_data.get_day_data_with_paths(paths, symbol, symbol_index, startTime, endTime, bob_index)
+    result = vvtr_data.get_day_data_with_paths(paths, symbol, symbol_index, startTime, endTime, bob_index,
+                                               file_index, offset)
+    # 转换为字典返回
+    return page_response(result, query_hash)
+
+
+@mcp.tool()
+@ToolRunner.offload("local", limit=ToolRunner.HEAVY_LIMIT)
+def get_financial_products_resample_data(pathStrs: List[str], interval: str, symbol: str = "",
+                                               startTime: str = "", endTime: str = "") -> dict:
+    """根据获取的分钟(1m/15m)或日线(1d)类型金融产品资源路径,在服务端把K线合成为更大的周期(如5m,30m,1h,1d,1w)后返回,不需要分页拉取原始K线自行计算,一次最多返回1000条,truncated为true时请缩小时间范围或使用更大的周期
+
+    Args:
+        pathStrs: 要合成的资源路径,eg:[D:/data/fund/1m/202009/20200904/600000.csv]
+        interval: 目标周期,数字加单位m/h/d/w,eg:5m,30m,1h,1d,1w,必须是原始K线周期的整数倍
+        symbol: 种类代码,日线文件包含多个symbol时需要填写,为空字符串则合成所有symbol
+        startTime: 开始时间(yyyy-MM-dd或yyyy-MM-dd HH:mm:ss),可为空字符串
+        endTime: 结束时间(yyyy-MM-dd或yyyy-MM-dd HH:mm:ss),可为空字符串
+    """
+    # 转换路径字符串为Path对象
+    paths = [Path(path) for path in pathStrs]
+    # 读取原始K线并合成
+    series = BarSeries.load(paths, symbol or None, startTime or None, endTime or None)
+    bars = BarResampler.resample(series, interval)
+    data, count = BarResampler.to_csv(series, bars, interval, RESAMPLE_LIMIT)
     # 转换为字典返回
     return {
-        "data": result.data,
-        "remaining_paths": [str(path) for path in result.remaining_paths]
+        "data": data,
+        "count": count,
+        "truncated": count < len(bars["symbol"])
+    }
+
+
+@mcp.tool()
+@ToolRunner.offload("local", limit=ToolRunner.HEAVY_LIMIT)
+def get_financial_products_returns(pathStrs: List[str], symbols: str = "", startTime: str = "",
+                                        endTime: str = "") -> dict:
+    """根据本地K线计算各symbol的区间收益率(最后收盘价/第一根开盘价-1),只返回统计结果
+
+    Args:
+        pathStrs: 要统计的资源路径(1m/15m/1d),eg:[D:/data/fund/1m/202009/20200904/600000.csv]
+        symbols: 种类代码,多个代码用逗号分隔,为空字符串则统计所有symbol
+        startTime: 开始时间(yyyy-MM-dd或yyyy-MM-dd HH:mm:ss),可为空字符串
+        endTime: 结束时间(yyyy-MM-dd或yyyy-MM-dd HH:mm:ss),可为空字符串
+    """
+    return analytics_response(pathStrs, symbols, startTime, endTime, "returns")
+
+
+@mcp.tool()
+@ToolRunner.offload("local", limit=ToolRunner.HEAVY_LIMIT)
+def get_financial_products_vwap(pathStrs: List[str], symbols: str = "", startTime: str = "",
+                                     endTime: str = "") -> dict:
+    """根据本地K线计算各symbol的成交量加权均价(VWAP),只返回统计结果
+
+    Args:
+        pathStrs: 要统计的资源路径(1m/15m/1d),eg:[D:/data/fund/1m/202009/20200904/600000.csv]
+        symbols: 种类代码,多个代码用逗号分隔,为空字符串则统计所有symbol
+        startTime: 开始时间(yyyy-MM-dd或yyyy-MM-dd HH:mm:ss),可为空字符串
+        endTime: 结束时间(yyyy-MM-dd或yyyy-MM-dd HH:mm:ss),可为空字符串
+    """
+    return analytics_response(pathStrs, symbols, startTime, endTime, "vwap")
+
+
+@mcp.tool()
+@ToolRunner.offload("local", limit=ToolRunner.HEAVY_LIMIT)
+def get_financial_products_volatility(pathStrs: List[str], symbols: str = "", startTime: str = "",
+                                           endTime: str = "") -> dict:
+    """根据本地K线计算各symbol的已实现波动率(收盘价对数收益率的标准差)及年化波动率,只返回统计结果
+
+    Args:
+        pathStrs: 要统计的资源路径(1m/15m/1d),eg:[D:/data/fund/1m/202009/20200904/600000.csv]
+        symbols: 种类代码,多个代码用逗号分隔,为空字符串则统计所有symbol
+        startTime: 开始时间(yyyy-MM-dd或yyyy-MM-dd HH:mm:ss),可为空字符串
+        endTime: 结束时间(yyyy-MM-dd或yyyy-MM-dd HH:mm:ss),可为空字符串
+    """
+    return analytics_response(pathStrs, symbols, startTime, endTime, "volatility")
+
+
+@mcp.tool()
+@ToolRunner.offload("local", limit=ToolRunner.HEAVY_LIMIT)
+def get_financial_products_max_drawdown(pathStrs: List[str], symbols: str = "", startTime: str = "",
+                                             endTime: str = "") -> dict:
+    """根据本地K线计算各symbol收盘价的最大回撤及高点、低点时间,只返回统计结果
+
+    Args:
+        pathStrs: 要统计的资源路径(1m/15m/1d),eg:[D:/data/fund/1m/202009/20200904/600000.csv]
+        symbols: 种类代码,多个代码用逗号分隔,为空字符串则统计所有symbol
+        startTime: 开始时间(yyyy-MM-dd或yyyy-MM-dd HH:mm:ss),可为空字符串
+        endTime: 结束时间(yyyy-MM-dd或yyyy-MM-dd HH:mm:ss),可为空字符串
+    """
+    return analytics_response(pathStrs, symbols, startTime, endTime, "drawdown")
+
+
+@mcp.tool()
+@ToolRunner.offload("local", limit=ToolRunner.HEAVY_LIMIT)
+def get_financial_products_average_volume(pathStrs: List[str], symbols: str = "", startTime: str = "",
+                                               endTime: str = "") -> dict:
+    """根据本地K线计算各symbol每根K线的平均成交量和总成交量,只返回统计结果
+
+    Args:
+        pathStrs: 要统计的资源路径(1m/15m/1d),eg:[D:/data/fund/1m/202009/20200904/600000.csv]
+        symbols: 种类代码,多个代码用逗号分隔,为空字符串则统计所有symbol
+        startTime: 开始时间(yyyy-MM-dd或yyyy-MM-dd HH:mm:ss),可为空字符串
+        endTime: 结束时间(yyyy-MM-dd或yyyy-MM-dd HH:mm:ss),可为空字符串
+    """
+    return analytics_response(pathStrs, symbols, startTime, endTime, "volume")
+
+
+def analytics_response(pathStrs: List[str], symbols: str, startTime: str, endTime: str, metric: str) -> dict:
+    """
+    读取本地K线并按symbol计算统计指标，多个文件并行读取
+
+    Args:
+        pathStrs: 资源路径
+        symbols: 逗号分隔的种类代码，为空则统计所有symbol
+        startTime: 开始时间
+        endTime: 结束时间
+        metric: 指标名称
+    """
+    # 转换路径字符串为Path对象
+    paths = [Path(path) for path in pathStrs]
+    names = [name.strip() for name in (symbols or "").split(",") if name.strip()]
+    series = BarSeries.load(paths, names or None, startTime or None, endTime or None)
+    return {
+        "metric": metric,
+        "results": BarAnalytics.compute(series, metric)
     }
 
 
 @mcp.tool()
-async def get_financial_products_tick_data(pathStrs: List[str], startTime: str, endTime: str, nextIndex: int,
+@ToolRunner.offload("local")
+def get_financial_products_snapshot(type: str, name: str, time: str, symbols: str = "", columns: str = "",
+                                          asOf: bool = True) -> dict:
+    """横截面查询:获取某个时间点所有(或指定)symbol的一行数据,eg:2024-05-06 10:30 所有A股的1m K线,每个文件只定位一次,不需要逐个分页查询
+
+    Args:
+        type: 查询的金融产品种类,eg:,"11" -> A股,"14" -> 期货,"12" -> 基金,"16" -> 指数,"21" -> 美股,"22" -> 美股期权,"31" -> 加密币
+        name: 查询的数据类型,eg:15m,1m,1d,tick
+        time: 目标时间,1d为yyyy-MM-dd,其他为yyyy-MM-dd HH:mm:ss(K线按bob匹配,tick按created_at匹配)
+        symbols: 种类代码,多个代码用逗号分隔,为空字符串则返回所有symbol
+        columns: 只返回的列名,多个列名用逗号分隔,为空字符串则返回所有列
+        asOf: 为true时返回不晚于目标时间的最近一条数据,为false时只返回时间恰好等于目标时间的数据
+    """
+    wanted = [symbol.strip() for symbol in symbols.split(",") if symbol.strip()]
+    selected = [column.strip() for column in columns.split(",") if column.strip()]
+
+    if name == "1d":
+        day = TimeFilter.date_key(time.strip())
+        if day is None:
+            raise ValueError(f"时间格式错误，应为yyyy-MM-dd: {time}")
+        date = day.replace("-", "")
+        # asOf 时使用不晚于该日期的最近一个日线文件
+        paths = CsvCatalog.find_csv_files(type, name, "00000000" if asOf else date, date)[-1:]
+        lines = CrossSection.day_rows(paths[0], None if asOf else day, wanted) if paths else []
+        rows = [(paths[0], line) for line in lines]
+        pruned = 0
+    else:
+        target = TimeFilter.time_key(time.strip())
+        if target is None:
+            raise ValueError(f"时间格式错误，应为yyyy-MM-dd HH:mm:ss: {time}")
+        date = target[:10].replace("-", "")
+        paths = CsvCatalog.find_csv_files(type, name, date, date)
+        if wanted:
+            paths = [path for path in paths if DataFile.stem(path) in wanted]
+        rows, pruned = CrossSection.snapshot(paths, "created_at" if name == "tick" else "bob", target, asOf)
+
+    # 表头与第一个文件不同的数据行不能放在同一个表格中
+    header = CsvSchema.header(rows[0][0]) if rows else ""
+    lines = []
+    for path, line in rows:
+        if CsvSchema.header(path) == header:
+            lines.append(line)
+        else:
+            logger.warning(f"文件表头与第一个文件不一致，已跳过: {path}")
+    data, count = CrossSection.to_table(header, lines, selected) if header else ("", 0)
+    # 转换为字典返回
+    return {
+        "data": data,
+        "count": count,
+        "files": len(paths),
+        "pruned_files": pruned
+    }
+
+
+@mcp.tool()
+@ToolRunner.offload("local")
+def get_financial_products_tick_data(pathStrs: List[str], startTime: str, endTime: str, cursorToken: str = "",
                                            count: int = 0) -> dict:
-    """根据获取的每一笔成交数据(tick)类型金融产品资源路径查询数据,分片查询，一次性查询不超过180条,超过180条分多次查询,会返回当前文件及剩下需要查询的文件,和当前文件的索引,返回文件为空即查完
+    """根据获取的每一笔成交数据(tick)类型金融产品资源路径查询数据,分片查询，一次性查询不超过180条,超过180条分多次查询,has_next为true时用相同的参数和返回的next_cursor_token继续查询
 
     Args:
-        pathStrs: 要查询的资源路径,eg:[D:/data/fund/tick/202009/20200904/20200904.csv]
+        pathStrs: 要查询的资源路径,eg:[D:/data/fund/tick/202009/20200904/20200904.csv],继续查询时保持不变
         startTime: 查询的开始时间(yyyy-MM-dd HH:mm:ss),如果为空字符串则查询全部数据
         endTime: 查询的结束时间(yyyy-MM-dd HH:mm:ss),如果为空字符串则查询全部数据
-        nextIndex: 上一次剩余数据,第一次则为0
-        count: 要获取的条数
+        cursorToken: 上一次返回的next_cursor_token,第一次则为空字符串
+        count: 要获取的条数,不填或超过180时按180条
     """
 
     # 转换路径字符串为Path对象
     paths = [Path(path) for path in pathStrs]
+    # 解析游标
+    query_hash = CursorToken.filter_hash("tick", pathStrs, startTime, endTime)
+    file_index, offset = CursorToken.decode(cursorToken, query_hash)
     # 获取创建时间索引
-    create_time_index = CsvMerger.get_create_time_index(paths[0])
+    create_time_index = CsvMerger.get_create_time_index(paths[file_index]) if file_index < len(paths) else -1
     # 获取数据
-    result = vvtr_data.get_tick_data(paths, startTime, endTime, create_time_index, nextIndex, count)
+    result = vvtr_data.get_tick_data(paths, startTime, endTime, create_time_index, file_index, offset, count)
     # 转换为字典返回
+    return page_response(result, query_hash)
+
+
+def page_response(result: DataPage, query_hash: int) -> dict:
+    """
+    把分页查询结果转为工具的返回值，下一页的位置编码为游标
+
+    Args:
+        result: 分页查询结果
+        query_hash: 查询条件的哈希
+    """
     return {
         "data": result.data,
-        "next_index": result.next_index,
-        "remaining_paths": [str(path) for path in result.remaining_paths]
+        "has_next": result.has_next,
+        "next_cursor_token": CursorToken.encode(result.file_index, result.offset, query_hash)
+        if result.has_next else "",
+        "pruned_files": result.pruned
     }
 
 @mcp.tool()
@@ -216,8 +431,7 @@ async def get_symbol_count(type: str) -> int:
     Args:
         type: 要查询的资源路径,eg:"11" -> A股, "14" -> 期货, "12" -> 基金, "16" -> 指数, "21" -> 美股, "22" -> 美股期权, "31" -> 加密币
     """
-    data = MainStationData.get_symbol(type, API_KEY)
-    return MainStationData.count_lines_in_string(data)
+    return await SymbolUniverse.count(type, API_KEY)
 
 
 @mcp.tool()
@@ -229,9 +443,7 @@ async def get_online_symbol(type: str, start: int, end: int):
         start: 查询的起始条数
         end: 查询的结束条数
     """
-    data = MainStationData.get_symbol(type, API_KEY)
-    res = MainStationData.cut_data(data, start, end)
-    return res
+    return await SymbolUniverse.cut(type, API_KEY, start, end)
 
 @mcp.tool()
 async def get_online_history_kline(symbols: str, interval: str, type: str,
@@ -257,7 +469,72 @@ async def get_online_history_kline(symbols: str, interval: str, type: str,
                 - has_next: 布尔值，表示是否还有更多数据未返回
                 - next_cursor_token: 字符串，下一页的游标标记，如果没有更多数据则为空字符串''
             """
-    return MainStationData.get_history_kline(symbols, interval, type, API_KEY, from_date, to_date, adjust, limit, cursor_token)
+    return await MainStationData.get_history_kline(symbols, interval, type, API_KEY, from_date, to_date, adjust, limit, cursor_token)
+
+
+@mcp.tool()
+async def get_online_history_kline_all(symbols: str, interval: str, type: str, from_date: str, to_date: str,
+                                       ctx: Context, adjust: bool = False, cursor_token: str = "",
+                                       maxRows: int = 0, maxBytes: int = 0) -> dict:
+    """在线获取历史K线数据，服务端自动翻页直到取完或达到上限,批量获取多个symbol或长时间范围时使用,has_next为true时用相同的参数和返回的next_cursor_token继续查询
+
+    Args:
+        symbols: 证券代码,多个代码用逗号分隔,填"*"则提交分类下的全部symbol
+        interval: 周期(如1m, 5m, 1d等)
+        type: 产品类型,eg:"11" -> A股, "14" -> 期货, "12" -> 基金, "16" -> 指数, "21" -> 美股, "22" -> 美股期权, "31" -> 加密币
+        from_date: 开始时间，若查询24H内K线时间格式用 yyyy-mm-dd HH:mm:ss
+        to_date: 结束时间，与from格式保持一致
+        adjust: 是否复权
+        cursor_token: 上一次返回的next_cursor_token,第一次则为空字符串
+        maxRows: 一次最多返回的行数,不填则使用服务端的默认上限
+        maxBytes: 一次返回的数据最多的字节数,不填则只限制行数
+    """
+    async def progress(rows: int, pages: int) -> None:
+        await ctx.report_progress(rows, maxRows or HistoryKlineStream.MAX_ROWS)
+
+    return await HistoryKlineStream.collect(symbols, interval, type, API_KEY, from_date, to_date, adjust,
+                                            cursor_token=cursor_token, max_rows=maxRows, max_bytes=maxBytes,
+                                            progress=progress)
+
+
+@mcp.tool()
+async def get_financial_products_history(type: str, interval: str, symbol: str, startTime: str, endTime: str,
+                                         maxRows: int = 0, cursorToken: str = "") -> dict:
+    """查询单个symbol的历史K线,优先使用本地数据,本地缺失的日期自动在线获取,不需要自己选择本地或在线工具,has_next为true时把startTime设为返回的next_start_time、cursorToken设为返回的next_cursor_token继续查询
+
+    Args:
+        type: 产品类型,eg:"11" -> A股, "14" -> 期货, "12" -> 基金, "16" -> 指数, "21" -> 美股, "22" -> 美股期权, "31" -> 加密币
+        interval: K线周期,eg:1m,15m,1d
+        symbol: 种类代码
+        startTime: 查询的开始时间(yyyy-MM-dd HH:mm:ss 或 yyyy-MM-dd)
+        endTime: 查询的结束时间(yyyy-MM-dd HH:mm:ss 或 yyyy-MM-dd,只有日期时包含当天)
+        maxRows: 一次最多返回的行数,不填则使用服务端的默认上限
+        cursorToken: 上一次返回的next_cursor_token,第一次则为空字符串
+    """
+    start = parse_query_time(startTime, False)
+    end = parse_query_time(endTime, True)
+    if start > end:
+        raise ValueError("开始时间不能晚于结束时间")
+    return await HistoryPlanner.query(type, interval, symbol, start, end, API_KEY, maxRows, cursorToken)
+
+
+def parse_query_time(value: str, end_of_day: bool) -> datetime:
+    """
+    解析查询时间，只有日期时取当天的开始或结束时间
+
+    Raises:
+        ValueError: 时间格式错误
+    """
+    value = value.strip()
+    try:
+        return datetime.strptime(value, TimeFilter.TIME_FORMAT)
+    except ValueError:
+        pass
+    try:
+        day = datetime.strptime(value, TimeFilter.DATE_FORMAT)
+    except ValueError:
+        raise ValueError(f"时间格式错误: {value}，应为 yyyy-MM-dd HH:mm:ss 或 yyyy-MM-dd")
+    return day.replace(hour=23, minute=59, second=59) if end_of_day else day
 
 @mcp.tool()
 async def get_online_current_kline(type: str, symbols: str = None) -> str | None:
@@ -272,7 +549,7 @@ async def get_online_current_kline(type: str, symbols: str = None) -> str | None
     Returns:
         返回CSV格式的最新分钟K线数据或None(如果请求失败)
     """
-    return MainStationData.get_current_kline(type, API_KEY, symbols)
+    return await MainStationData.get_current_kline(type, API_KEY, symbols)
 
 @mcp.tool()
 async def get_online_latest_tick(type: str, symbols: str = None) -> str | None:
@@ -288,7 +565,16 @@ async def get_online_latest_tick(type: str, symbols: str = None) -> str | None:
         返回CSV格式的最新tick数据或None(如果请求失败)
     """
 
-    return MainStationData.get_latest_tick(type, API_KEY, symbols)
+    return await MainStationData.get_latest_tick(type, API_KEY, symbols)
+
+
+async def check_api_key(api_key: str) -> bool:
+    """验证 API_KEY，验证后关闭本次使用的连接(服务运行在另一个事件循环中)"""
+    try:
+        return await MainStationData.http_get(api_key)
+    finally:
+        await MainStationData.close()
+
 
 def run_server():
     try:
@@ -300,7 +586,7 @@ def run_server():
         print(f"DATA_PATH: {os.environ.get('DATA_PATH')}", file=sys.stderr)
 
         # 验证 API_KEY 是否合法
-        if not MainStationData.http_get(API_KEY):
+        if not asyncio.run(check_api_key(API_KEY)):
             print("错误：未提供 API_KEY", file=sys.stderr)
             sys.exit(1)
 
@@ -1,7 +1,9 @@
 """工具函数模块"""
 
 # 导入工具类
+from .history_kline_stream import HistoryKlineStream
 from .main_station_data import MainStationData
+from .symbol_universe import SymbolUniverse
 
 # 暴露为包接口
-__all__ = ["MainStationData"]
\ No newline at end of file
+__all__ = ["HistoryKlineStream", "MainStationData", "SymbolUniverse"]
\ No newline at end of file
@@ -0,0 +1,165 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from vvtr_mcp_server.main_station.main_station_data import MainStationData
+from vvtr_mcp_server.util.tool_runner import ToolRunner
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class HistoryKlineStream:
+    """
+    自动翻页的历史K线查询。
+
+    按 nextCursorToken 连续请求 /kline/history，收到一页后立即请求下一页，
+    同时在线程池中把当前页转为CSV，网络等待和格式转换重叠进行。
+    行数和字节数上限是硬上限：每页请求的条数按剩余的行数和字节数(按已转换行的平均长度估算)缩小，
+    估算偏小导致某一页放不下时整页不返回，next_cursor_token 指向这一页，继续查询时不会重复或遗漏；
+    第一页就放不下时按能放下的行数重新请求(至少返回一条)。达到时间上限后不再请求下一页。每获取一页调用一次进度回调。
+    """
+    # 一次查询最多返回的行数，按适合放入上下文的大小设置
+    MAX_ROWS = int(os.environ.get("HISTORY_MAX_ROWS", "5000"))
+    # 一次查询最多的秒数，超过后不再请求下一页
+    TIME_BUDGET = float(os.environ.get("HISTORY_TIME_BUDGET", "120"))
+    # 还没有转换过的行时按这个字节数估算每行的长度
+    LINE_BYTES = 100
+
+    @staticmethod
+    async def collect(symbols: str, interval: str, type: str, apikey: str, from_date: str, to_date: str,
+                      adjust: bool = False, limit: int = 2000, cursor_token: str = None,
+                      max_rows: int = 0, max_bytes: int = 0,
+                      progress: Optional[Callable[[int, int], Awaitable[None]]] = None) -> dict:
+        """
+        连续请求历史K线直到没有下一页或达到上限
+
+        Args:
+            symbols/interval/type/apikey/from_date/to_date/adjust/limit/cursor_token: 同 MainStationData.get_history_kline
+            max_rows: 最多返回的行数，为0时使用 MAX_ROWS
+            max_bytes: 最多返回的字节数(数据行按UTF-8编码加换行符计算，不含表头)，为0时不限制
+            progress: 进度回调，参数为(已获取的行数, 已获取的页数)
+        Returns:
+            字典：data(带表头的CSV数据，没有数据时为空字符串)、rows(行数)、pages(页数)、
+            has_next(是否还有数据未返回)、next_cursor_token(继续查询的游标)、error(请求失败时的说明)
+        """
+        max_rows = max_rows or HistoryKlineStream.MAX_ROWS
+        deadline = time.monotonic() + HistoryKlineStream.TIME_BUDGET
+        params = MainStationData.history_kline_params(symbols, interval, type, apikey, from_date, to_date,
+                                                      adjust, limit)
+
+        def request(cursor: str, rows_left: int, bytes_left: Optional[int] = None,
+                    line_bytes: int = 0) -> Tuple[asyncio.Task, str]:
+            # 每页的条数不超过剩余的行数和估算的剩余字节数能放下的行数，行长按估算值多留1/8；
+            # bytes_left 为None时只按行数限制
+            page_limit = min(limit, rows_left)
+            if max_bytes > 0 and bytes_left is not None:
+                page_limit = min(page_limit, max(1, bytes_left // (line_bytes + line_bytes // 8 + 1)))
+            page_params = dict(params, limit=page_limit) if page_limit != limit else dict(params)
+            if cursor:
+                page_params['cursorToken'] = cursor
+            return asyncio.create_task(MainStationData.get_history_page(page_params)), cursor
+
+        lines = []
+        size = 0
+        pages = 0
+        token = cursor_token or ''
+        error = ''
+        has_next = True
+        refetched = False
+
+        task, page_token = request(token, max_rows, max_bytes, HistoryKlineStream.LINE_BYTES)
+        try:
+            while task is not None:
+                page = await task
+                task = None
+                if page is None:
+                    # 保留已获取的数据，游标仍指向失败的那一页
+                    error = "请求历史K线失败，可以用 next_cursor_token 继续查询"
+                    token = page_token
+                    break
+
+                next_token = page["next_cursor_token"] if page["has_next"] and page["next_cursor_token"] else ''
+                rows = len(lines) + len(page["records"])
+                line_bytes = size // len(lines) if lines else HistoryKlineStream.LINE_BYTES
+                estimate = size + len(page["records"]) * line_bytes
+                if (next_token and rows < max_rows and (max_bytes <= 0 or estimate < max_bytes)
+                        and time.monotonic() < deadline):
+                    # 先发出下一页的请求，再转换当前页
+                    task, next_page_token = request(next_token, max_rows - rows, max_bytes - estimate, line_bytes)
+
+                page_lines = await ToolRunner.run("local", MainStationData.history_kline_lines, page["records"],
+                                                  timeout=0)
+                fit = HistoryKlineStream._fit(page_lines, max_rows - len(lines),
+                                              max_bytes - size if max_bytes > 0 else None)
+                if fit < len(page_lines):
+                    if task is not None:
+                        task.cancel()
+                        task = None
+                    if lines:
+                        # 这一页放不下：整页不返回，继续查询时从这一页开始
+                        has_next = True
+                        token = page_token
+                        break
+                    # 至少返回一条，单独一行超过字节上限时也返回
+                    fit = max(1, fit)
+                    if fit < len(page_lines) and not refetched:
+                        # 第一页放不下：按能放下的行数重新请求这一页，返回的游标仍然准确
+                        refetched = True
+                        task, page_token = request(page_token, fit)
+                        continue
+                    if fit < len(page_lines):
+                        # 接口没有按条数返回时只能截断，继续查询会重复返回这一页的数据
+                        logger.warning(f"历史K线返回的条数超过请求的条数，已截断为 {fit} 行")
+                        page_lines = page_lines[:fit]
+
+                pages += 1
+                lines.extend(page_lines)
+                size += sum(len(line.encode('utf-8')) + 1 for line in page_lines)
+                has_next = bool(next_token)
+                token = next_token
+                if task is not None:
+                    page_token = next_page_token
+                elif (next_token and len(lines) < max_rows and (max_bytes <= 0 or size < max_bytes)
+                      and time.monotonic() < deadline):
+                    # 转换前按估算的字节数没有预先请求，转换后还有空间时再请求下一页
+                    task, page_token = request(next_token, max_rows - len(lines), max_bytes - size,
+                                               size // len(lines))
+                if progress is not None:
+                    try:
+                        await progress(len(lines), pages)
+                    except Exception as e:
+                        # 进度通知失败不影响查询结果
+                        logger.debug(f"发送进度失败: {str(e)}")
+        finally:
+            if task is not None:
+                task.cancel()
+
+        if error:
+            logger.warning(f"{error}: 已获取 {len(lines)} 行")
+        return {
+            "data": "\n".join([MainStationData.HISTORY_HEADER] + lines) if lines else "",
+            "rows": len(lines),
+            "pages": pages,
+            "has_next": has_next if not error else True,
+            "next_cursor_token": token,
+            "error": error,
+        }
+
+    @staticmethod
+    def _fit(lines: List[str], rows_left: int, bytes_left: Optional[int]) -> int:
+        """
+        计算前多少行不超过剩余的行数和字节数(bytes_left 为None时不限制字节数)
+        """
+        count = min(len(lines), max(0, rows_left))
+        if bytes_left is None:
+            return count
+        size = 0
+        for i in range(count):
+            size += len(lines[i].encode('utf-8')) + 1
+            if size > bytes_left:
+                return i
+        return count
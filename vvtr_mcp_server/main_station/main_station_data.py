@@ -1,59 +1,153 @@
-import requests  # 确保添加导入语句
+import os
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401  HTTP/2需要安装 httpx[http2]
+except ImportError:
+    h2 = None
+
+from vvtr_mcp_server.util.kline_writer import KlineWriter
+from vvtr_mcp_server.util.tool_runner import ToolRunner
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+# httpx 每个请求都会输出INFO日志，其中的URL包含apiKey
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
 
 class MainStationData:
+    """
+    主站接口的查询。
+
+    所有请求共用一个异步HTTP客户端：连接池保持长连接，后续请求不再重新建立TCP/TLS连接；
+    同时进行的请求数有上限，超过时排队等待；每个接口有各自的超时时间。
+    客户端属于创建它的事件循环，在其他事件循环中使用时重新创建。
+    """
     # 将ROOT_PATH改为类变量
     ROOT_PATH = 'https://api.vvtr.com/v1'
+    # 请求的超时秒数，避免远程服务无响应时一直等待
+    TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "30"))
+    # 最新行情接口的超时秒数
+    REALTIME_TIMEOUT = float(os.environ.get("HTTP_REALTIME_TIMEOUT", "10"))
+    # 建立连接的超时秒数
+    CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+    # 同时进行的请求数上限，也是连接池的连接数上限
+    CONCURRENCY = int(os.environ.get("HTTP_CONCURRENCY", "16"))
+    # 空闲连接保持的秒数
+    KEEPALIVE = float(os.environ.get("HTTP_KEEPALIVE", "60"))
+    # 设置为1则使用HTTP/2(需要安装 httpx[http2])
+    HTTP2 = os.environ.get("HTTP2", "0") == "1"
+    # 各接口的超时秒数
+    TIMEOUTS = {
+        '/userPermissions/getUserByApiKey': 10.0,
+        '/symbols': TIMEOUT,
+        '/kline/history': TIMEOUT,
+        '/kline/current': REALTIME_TIMEOUT,
+        '/briefs': REALTIME_TIMEOUT,
+    }
+    # 历史K线的CSV表头
+    HISTORY_HEADER = "id,symbol,interval,open,high,close,low,amount,volume,position,bob,eob,type,sequence"
+
+    _client: Optional[httpx.AsyncClient] = None
+    _semaphore: Optional[asyncio.Semaphore] = None
+    _loop: Optional[asyncio.AbstractEventLoop] = None
 
     @staticmethod
-    def http_get(apiKey):
-        params = {'apiKey': apiKey}
-        try:
-            req = requests.get(MainStationData.ROOT_PATH + '/userPermissions/getUserByApiKey',
-                               params=params,
-                               timeout=10)
-
-            if req.status_code == 200:
-                # 直接解析JSON并提取data字段
-                response_dict = req.json()
-                data = response_dict["data"]
-                if data is None:
-                    return False
-                else:
-                    return True
-            else:
-                print(f"请求失败，状态码: {req.status_code}")
-                return False
+    def client() -> httpx.AsyncClient:
+        """获取当前事件循环的共享客户端，第一次使用时创建"""
+        loop = asyncio.get_running_loop()
+        if MainStationData._client is None or MainStationData._loop is not loop or MainStationData._client.is_closed:
+            http2 = MainStationData.HTTP2 and h2 is not None
+            if MainStationData.HTTP2 and not http2:
+                logger.warning("未安装h2，使用HTTP/1.1: pip install httpx[http2]")
+            MainStationData._client = httpx.AsyncClient(
+                base_url=MainStationData.ROOT_PATH,
+                http2=http2,
+                timeout=httpx.Timeout(MainStationData.TIMEOUT, connect=MainStationData.CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=MainStationData.CONCURRENCY,
+                                    max_keepalive_connections=MainStationData.CONCURRENCY,
+                                    keepalive_expiry=MainStationData.KEEPALIVE))
+            MainStationData._semaphore = asyncio.Semaphore(MainStationData.CONCURRENCY)
+            MainStationData._loop = loop
+        return MainStationData._client
 
-        except Exception as e:
-            print(f"发生错误: {e}")
+    @staticmethod
+    async def close() -> None:
+        """关闭共享客户端及其连接"""
+        client = MainStationData._client
+        MainStationData._client = None
+        MainStationData._semaphore = None
+        MainStationData._loop = None
+        if client is not None and not client.is_closed:
+            await client.aclose()
 
     @staticmethod
-    def get_symbol(type: str, apikey: str) -> str | None:
-        params = {'type': type, 'apiKey': apikey}
+    async def request(path: str, params: dict) -> Optional[dict]:
+        """
+        GET请求主站接口
+
+        Args:
+            path: 接口路径,eg:/kline/history
+            params: 查询参数
+        Returns:
+            响应的JSON，状态码不是200或请求失败时返回None
+        """
+        client = MainStationData.client()
+        timeout = httpx.Timeout(MainStationData.TIMEOUTS.get(path, MainStationData.TIMEOUT),
+                                connect=MainStationData.CONNECT_TIMEOUT)
         try:
-            req = requests.get(MainStationData.ROOT_PATH + '/symbols',
-                               params=params)
-
-            if req.status_code == 200:
-                # 直接解析JSON并提取data字段
-                response_dict = req.json()
-                data = response_dict["data"]
-
-                # 将JSON数据转换为CSV格式
-                csv_lines = []
-                for item in data:
-                    csv_line = f"{item['symbol']},{item['exchange']},{item['name']},{item['delistedDate']},{item['listedDate']},{item['type']}"
-                    csv_lines.append(csv_line)
-
-                # 如果需要返回所有行拼接的字符串
-                return "\n".join(csv_lines)
-            else:
-                print(f"请求失败，状态码: {req.status_code}")
+            async with MainStationData._semaphore:
+                req = await client.get(path, params=params, timeout=timeout)
+            if req.status_code != 200:
+                logger.error(f"请求失败，状态码: {req.status_code} - {path}")
                 return None
+            return req.json()
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error(f"请求发生错误: {path} - {e!r}")
+            return None
+
+    @staticmethod
+    async def http_get(apiKey) -> bool:
+        """验证apiKey是否有效"""
+        response_dict = await MainStationData.request('/userPermissions/getUserByApiKey', {'apiKey': apiKey})
+        # 直接解析JSON并提取data字段
+        return response_dict is not None and response_dict.get("data") is not None
+
+    @staticmethod
+    async def get_symbol(type: str, apikey: str) -> str | None:
+        lines = await MainStationData.get_symbol_lines(type, apikey)
+        # 如果需要返回所有行拼接的字符串
+        return None if lines is None else "\n".join(lines)
+
+    @staticmethod
+    async def get_symbol_lines(type: str, apikey: str) -> list[str] | None:
+        """
+        获取品种下活跃的symbol，每个symbol一行CSV(symbol,exchange,name,delistedDate,listedDate,type)
+
+        Returns:
+            CSV行列表或None(如果请求失败)
+        """
+        params = {'type': type, 'apiKey': apikey}
+        response_dict = await MainStationData.request('/symbols', params)
+        if response_dict is None:
+            return None
 
+        try:
+            data = response_dict["data"]
+
+            # 将JSON数据转换为CSV格式
+            csv_lines = []
+            for item in data:
+                csv_line = f"{item['symbol']},{item['exchange']},{item['name']},{item['delistedDate']},{item['listedDate']},{item['type']}"
+                csv_lines.append(csv_line)
+            return csv_lines
         except Exception as e:
-            print(f"发生错误: {e}")
+            logger.error(f"发生错误: {e}")
             return None
 
     @staticmethod
@@ -62,7 +156,7 @@ class MainStationData:
             return 0
         lines = data_string.strip().split('\n')
         count = len(lines)
-        print(f"数据中共有 {count} 条记录")
+        logger.info(f"数据中共有 {count} 条记录")
         return count
 
     @staticmethod
@@ -100,7 +194,7 @@ class MainStationData:
         return '\n'.join(selected_lines)
 
     @staticmethod
-    def get_history_kline(symbols: str, interval: str, type: str, apikey: str,
+    async def get_history_kline(symbols: str, interval: str, type: str, apikey: str,
                           from_date: str, to_date: str, adjust: bool = False,
                           limit: int = 2000, cursor_token: str = None) -> tuple[str | None, bool, str]:
         """
@@ -124,6 +218,30 @@ class MainStationData:
             - has_next: 布尔值，表示是否还有更多数据未返回
             - next_cursor_token: 字符串，下一页的游标标记，如果没有更多数据则为空字符串''
         """
+        params = MainStationData.history_kline_params(symbols, interval, type, apikey, from_date, to_date,
+                                                      adjust, limit, cursor_token)
+        page = await MainStationData.get_history_page(params)
+        if page is None:
+            return None, False, ''
+
+        try:
+            # 如果没有数据，返回None
+            if not page["records"]:
+                return None, page["has_next"], page["next_cursor_token"]
+
+            # 创建CSV格式的数据，添加表头和数据行
+            csv_lines = [MainStationData.HISTORY_HEADER] + MainStationData.history_kline_lines(page["records"])
+
+            # 返回所有行拼接的字符串、hasNext状态和nextCursorToken
+            return "\n".join(csv_lines), page["has_next"], page["next_cursor_token"]
+        except Exception as e:
+            logger.error(f"发生错误: {e}")
+            return None, False, ''
+
+    @staticmethod
+    def history_kline_params(symbols: str, interval: str, type: str, apikey: str, from_date: str, to_date: str,
+                             adjust: bool = False, limit: int = 2000, cursor_token: str = None) -> dict:
+        """历史K线接口的查询参数，参数含义同 get_history_kline"""
         params = {
             'symbols': symbols,
             'interval': interval,
@@ -140,55 +258,71 @@ class MainStationData:
             params['limit'] = limit
         if cursor_token:
             params['cursorToken'] = cursor_token
+        return params
+
+    @staticmethod
+    async def get_history_page(params: dict) -> dict | None:
+        """
+        请求一页历史K线
+
+        Args:
+            params: 查询参数，见 history_kline_params
+        Returns:
+            字典：records(记录列表)、has_next(是否还有下一页)、next_cursor_token(下一页的游标，没有则为'')，
+            请求失败或接口返回错误时返回None
+        """
+        response_dict = await MainStationData.request('/kline/history', params)
+        if response_dict is None:
+            return None
 
         try:
-            req = requests.get(MainStationData.ROOT_PATH + '/kline/history', params=params)
-
-            if req.status_code == 200:
-                response_dict = req.json()
-
-                if response_dict["code"] != 200:
-                    print(f"API返回错误: {response_dict['msg']}")
-                    return None, False, ''
-
-                # 获取记录列表
-                records = response_dict["data"]["records"]
-
-                # 获取分页状态
-                has_next = response_dict["data"]["hasNext"]
-                next_cursor_token = response_dict["data"].get("nextCursorToken", '')
-                if next_cursor_token is None:  # 处理None值转为空字符串
-                    next_cursor_token = ''
-
-                # 如果没有数据，返回None
-                if not records:
-                    return None, has_next, next_cursor_token
-
-                # 创建CSV格式的数据
-                # 添加表头
-                header = "id,symbol,interval,open,high,close,low,amount,volume,position,bob,eob,type,sequence"
-                csv_lines = [header]
-
-                # 添加数据行
-                for item in records:
-                    csv_line = (f"{item['id']},{item['symbol']},{item['interval']},"
-                                f"{item['open']},{item['high']},{item['close']},{item['low']},"
-                                f"{item['amount']},{item['volume']},{item['position']},"
-                                f"{item['bob']},{item['eob']},{item['type']},{item['sequence']}")
-                    csv_lines.append(csv_line)
-
-                # 返回所有行拼接的字符串、hasNext状态和nextCursorToken
-                return "\n".join(csv_lines), has_next, next_cursor_token
-            else:
-                print(f"请求失败，状态码: {req.status_code}")
-                return None, False, ''
+            if response_dict["code"] != 200:
+                logger.error(f"API返回错误: {response_dict['msg']}")
+                return None
 
+            # 获取记录列表和分页状态
+            next_cursor_token = response_dict["data"].get("nextCursorToken", '')
+            page = {
+                "records": response_dict["data"]["records"] or [],
+                "has_next": response_dict["data"]["hasNext"],
+                # 处理None值转为空字符串
+                "next_cursor_token": next_cursor_token or '',
+            }
         except Exception as e:
-            print(f"发生错误: {e}")
-            return None, False, ''
+            logger.error(f"发生错误: {e}")
+            return None
+
+        # 复权数据与本地数据不同，不写入本地
+        if page["records"] and not params.get('adjust') and KlineWriter.accepts(params['type'], params['interval']):
+            MainStationData.write_through(params['type'], params['interval'], page["records"])
+        return page
+
+    @staticmethod
+    def write_through(type: str, interval: str, records: list) -> None:
+        """在线程池中把历史K线写入本地数据目录，不等待写入完成"""
+        def write():
+            try:
+                lines = MainStationData.history_kline_lines(records)
+                KlineWriter.write(type, interval, MainStationData.HISTORY_HEADER, lines)
+            except Exception as e:
+                logger.error(f"写入本地K线失败: {type}/{interval} - {str(e)}")
+
+        ToolRunner.executor("local").submit(write)
 
     @staticmethod
-    def get_current_kline(type: str, apikey: str, symbols: str = None) -> str | None:
+    def history_kline_lines(records: list) -> list[str]:
+        """历史K线记录转为CSV数据行(不含表头)，列见 HISTORY_HEADER"""
+        csv_lines = []
+        for item in records:
+            csv_line = (f"{item['id']},{item['symbol']},{item['interval']},"
+                        f"{item['open']},{item['high']},{item['close']},{item['low']},"
+                        f"{item['amount']},{item['volume']},{item['position']},"
+                        f"{item['bob']},{item['eob']},{item['type']},{item['sequence']}")
+            csv_lines.append(csv_line)
+        return csv_lines
+
+    @staticmethod
+    async def get_current_kline(type: str, apikey: str, symbols: str = None) -> str | None:
         """
         获取最新分钟K线数据
 
@@ -209,52 +343,47 @@ class MainStationData:
         if symbols:
             params['symbols'] = symbols
 
+        response_dict = await MainStationData.request('/kline/current', params)
+        if response_dict is None:
+            return None
+
         try:
-            req = requests.get(MainStationData.ROOT_PATH + '/kline/current', params=params)
-
-            if req.status_code == 200:
-                response_dict = req.json()
-
-                if response_dict["code"] != 200:
-                    print(f"API返回错误: {response_dict['msg']}")
-                    return None
-
-                # 获取记录列表
-                records = response_dict["data"]
-
-                # 如果没有数据，返回None
-                if not records:
-                    return None
-
-                # 创建CSV格式的数据
-                # 添加表头
-                header = "symbol,frequency,open,high,close,low,amount,volume,position,bob,eob,type"
-                csv_lines = [header]
-
-                # 添加数据行
-                for item in records:
-                    frequency = item.get('frequency', '')
-                    if frequency is None:  # 处理None值
-                        frequency = ''
-
-                    csv_line = (f"{item['symbol']},{frequency},{item['open']},"
-                                f"{item['high']},{item['close']},{item['low']},"
-                                f"{item['amount']},{item['volume']},{item['position']},"
-                                f"{item['bob']},{item['eob']},{item['type']}")
-                    csv_lines.append(csv_line)
-
-                # 返回所有行拼接的字符串
-                return "\n".join(csv_lines)
-            else:
-                print(f"请求失败，状态码: {req.status_code}")
+            if response_dict["code"] != 200:
+                logger.error(f"API返回错误: {response_dict['msg']}")
                 return None
 
+            # 获取记录列表
+            records = response_dict["data"]
+
+            # 如果没有数据，返回None
+            if not records:
+                return None
+
+            # 创建CSV格式的数据
+            # 添加表头
+            header = "symbol,frequency,open,high,close,low,amount,volume,position,bob,eob,type"
+            csv_lines = [header]
+
+            # 添加数据行
+            for item in records:
+                frequency = item.get('frequency', '')
+                if frequency is None:  # 处理None值
+                    frequency = ''
+
+                csv_line = (f"{item['symbol']},{frequency},{item['open']},"
+                            f"{item['high']},{item['close']},{item['low']},"
+                            f"{item['amount']},{item['volume']},{item['position']},"
+                            f"{item['bob']},{item['eob']},{item['type']}")
+                csv_lines.append(csv_line)
+
+            # 返回所有行拼接的字符串
+            return "\n".join(csv_lines)
         except Exception as e:
-            print(f"发生错误: {e}")
+            logger.error(f"发生错误: {e}")
             return None
 
     @staticmethod
-    def get_latest_tick(type: str, apikey: str, symbols: str = None) -> str | None:
+    async def get_latest_tick(type: str, apikey: str, symbols: str = None) -> str | None:
         """
         获取最新tick数据
 
@@ -275,80 +404,75 @@ class MainStationData:
         if symbols:
             params['symbols'] = symbols
 
+        response_dict = await MainStationData.request('/briefs', params)
+        if response_dict is None:
+            return None
+
         try:
-            req = requests.get(MainStationData.ROOT_PATH + '/briefs', params=params)
-
-            if req.status_code == 200:
-                response_dict = req.json()
-
-                if response_dict["code"] != 200:
-                    print(f"API返回错误: {response_dict['msg']}")
-                    return None
-
-                # 获取记录列表
-                records = response_dict["data"]
-
-                # 如果没有数据，返回None
-                if not records:
-                    return None
-
-                # 创建主CSV表头
-                main_header = "symbol,open,high,low,price,cumVolume,cumAmount,cumPosition,tradeType,lastVolume,lastAmount,createdAt"
-
-                # 创建quotes表头 (最多10档)
-                quotes_headers = []
-                for i in range(10):  # 最多10档
-                    quotes_headers.append(f"bidP{i + 1},bidV{i + 1},askP{i + 1},askV{i + 1}")
-
-                # 合并所有表头
-                header = main_header + "," + ",".join(quotes_headers) + ",iopv"
-                csv_lines = [header]
-
-                # 添加数据行
-                for item in records:
-                    # 处理主要字段
-                    main_values = (f"{item.get('symbol', '')},"
-                                   f"{item.get('open', 0)},"
-                                   f"{item.get('high', 0)},"
-                                   f"{item.get('low', 0)},"
-                                   f"{item.get('price', 0)},"
-                                   f"{item.get('cumVolume', 0)},"
-                                   f"{item.get('cumAmount', 0)},"
-                                   f"{item.get('cumPosition', 0)},"
-                                   f"{item.get('tradeType', 0)},"
-                                   f"{item.get('lastVolume', 0)},"
-                                   f"{item.get('lastAmount', 0)},"
-                                   f"{item.get('createdAt', '')}")
-
-                    # 处理quotes字段
-                    quotes = item.get('quotes', [])
-                    quotes_values = []
-
-                    # 填充所有可能的档位
-                    for i in range(10):
-                        if i < len(quotes):
-                            quote = quotes[i]
-                            quotes_values.append(
-                                f"{quote.get('bidP', 0)},{quote.get('bidV', 0)},{quote.get('askP', 0)},{quote.get('askV', 0)}")
-                        else:
-                            quotes_values.append("0,0,0,0")  # 缺失的档位填充0
-
-                    # 处理iopv字段（基金特有）
-                    iopv = item.get('iopv', 0)
-
-                    # 合并所有字段
-                    csv_line = main_values + "," + ",".join(quotes_values) + f",{iopv}"
-                    csv_lines.append(csv_line)
-
-                # 返回所有行拼接的字符串
-                return "\n".join(csv_lines)
-            else:
-                print(f"请求失败，状态码: {req.status_code}")
+            if response_dict["code"] != 200:
+                logger.error(f"API返回错误: {response_dict['msg']}")
+                return None
+
+            # 获取记录列表
+            records = response_dict["data"]
+
+            # 如果没有数据，返回None
+            if not records:
                 return None
 
+            # 创建主CSV表头
+            main_header = "symbol,open,high,low,price,cumVolume,cumAmount,cumPosition,tradeType,lastVolume,lastAmount,createdAt"
+
+            # 创建quotes表头 (最多10档)
+            quotes_headers = []
+            for i in range(10):  # 最多10档
+                quotes_headers.append(f"bidP{i + 1},bidV{i + 1},askP{i + 1},askV{i + 1}")
+
+            # 合并所有表头
+            header = main_header + "," + ",".join(quotes_headers) + ",iopv"
+            csv_lines = [header]
+
+            # 添加数据行
+            for item in records:
+                # 处理主要字段
+                main_values = (f"{item.get('symbol', '')},"
+                               f"{item.get('open', 0)},"
+                               f"{item.get('high', 0)},"
+                               f"{item.get('low', 0)},"
+                               f"{item.get('price', 0)},"
+                               f"{item.get('cumVolume', 0)},"
+                               f"{item.get('cumAmount', 0)},"
+                               f"{item.get('cumPosition', 0)},"
+                               f"{item.get('tradeType', 0)},"
+                               f"{item.get('lastVolume', 0)},"
+                               f"{item.get('lastAmount', 0)},"
+                               f"{item.get('createdAt', '')}")
+
+                # 处理quotes字段
+                quotes = item.get('quotes', [])
+                quotes_values = []
+
+                # 填充所有可能的档位
+                for i in range(10):
+                    if i < len(quotes):
+                        quote = quotes[i]
+                        quotes_values.append(
+                            f"{quote.get('bidP', 0)},{quote.get('bidV', 0)},{quote.get('askP', 0)},{quote.get('askV', 0)}")
+                    else:
+                        quotes_values.append("0,0,0,0")  # 缺失的档位填充0
+
+                # 处理iopv字段（基金特有）
+                iopv = item.get('iopv', 0)
+
+                # 合并所有字段
+                csv_line = main_values + "," + ",".join(quotes_values) + f",{iopv}"
+                csv_lines.append(csv_line)
+
+            # 返回所有行拼接的字符串
+            return "\n".join(csv_lines)
         except Exception as e:
-            print(f"发生错误: {e}")
+            logger.error(f"发生错误: {e}")
             return None
 
 if __name__ == "__main__":
-    print(MainStationData.get_history_kline('600000', '1m', '11', '7cb46b2c-d8c8-46e8-9233-536346110b31', '2025-04-01', '2025-04-03', limit=1))
+    print(asyncio.run(MainStationData.get_history_kline('600000', '1m', '11', '7cb46b2c-d8c8-46e8-9233-536346110b31', '2025-04-01', '2025-04-03', limit=1)))
@@ -0,0 +1,157 @@
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from vvtr_mcp_server.main_station.main_station_data import MainStationData
+from vvtr_mcp_server.util.sidecar import Sidecar
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class SymbolUniverse:
+    """
+    各品种当日活跃symbol列表的缓存。
+
+    symbol列表每日盘前更新，按品种缓存下载结果，到下一个更新时间(REFRESH_TIME)或超过 TTL 后重新下载；
+    缓存按行拆分为列表，统计数量和按范围截取不需要重新拆分字符串。
+    缓存同时保存到 <INDEX_PATH>/symbols/<type>.json，服务重启后未过期的缓存可以直接使用。
+    同一品种同时只下载一次，下载失败时继续使用已过期的缓存。
+    """
+    # 每日更新symbol列表的时间(本地时间 HH:MM)，缓存在这个时间之后失效
+    REFRESH_TIME = os.environ.get("SYMBOL_REFRESH_TIME", "08:30")
+    # 缓存的最长秒数，设置为0则不缓存
+    TTL = float(os.environ.get("SYMBOL_TTL", "86400"))
+    # 缓存文件目录
+    ROOT = os.path.join(Sidecar.ROOT, "symbols")
+
+    _entries: Dict[str, dict] = {}
+    _locks: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    async def lines(type: str, apikey: str) -> Optional[List[str]]:
+        """
+        获取品种的symbol列表，每行一个symbol的CSV数据
+
+        Args:
+            type: 产品类型
+            apikey: 您的apiKey
+        Returns:
+            symbol行列表，下载失败且没有缓存时返回None
+        """
+        if SymbolUniverse.TTL <= 0:
+            return await MainStationData.get_symbol_lines(type, apikey)
+
+        now = time.time()
+        entry = SymbolUniverse._entries.get(type)
+        if entry is not None and entry["expires_at"] > now:
+            return entry["lines"]
+
+        lock = SymbolUniverse._locks.setdefault(type, asyncio.Lock())
+        async with lock:
+            # 等待期间其他请求可能已经下载完成
+            entry = SymbolUniverse._entries.get(type) or SymbolUniverse._load(type)
+            now = time.time()
+            if entry is not None and entry["expires_at"] > now:
+                SymbolUniverse._entries[type] = entry
+                return entry["lines"]
+
+            lines = await MainStationData.get_symbol_lines(type, apikey)
+            if lines is None:
+                if entry is not None:
+                    logger.warning(f"symbol列表下载失败，使用过期的缓存: {type}")
+                    return entry["lines"]
+                return None
+
+            entry = {"fetched_at": now, "expires_at": SymbolUniverse.expires_at(now), "lines": lines}
+            SymbolUniverse._entries[type] = entry
+            SymbolUniverse._save(type, entry)
+            return lines
+
+    @staticmethod
+    async def count(type: str, apikey: str) -> int:
+        """品种的symbol数量"""
+        lines = await SymbolUniverse.lines(type, apikey)
+        return len(lines) if lines else 0
+
+    @staticmethod
+    async def cut(type: str, apikey: str, start: int, end: int) -> str:
+        """
+        截取品种的symbol列表，与 MainStationData.cut_data 的结果相同
+
+        Args:
+            type: 产品类型
+            apikey: 您的apiKey
+            start: 开始索引（包含）
+            end: 结束索引（不包含）
+        Returns:
+            截取的数据字符串，每行以 \\n 分隔
+        """
+        lines = await SymbolUniverse.lines(type, apikey)
+        if not lines:
+            return ""
+        return '\n'.join(lines[max(start, 0):end]) if end > 0 else ""
+
+    @staticmethod
+    def expires_at(fetched_at: float) -> float:
+        """缓存的失效时间：下载后的下一个更新时间，且不超过 TTL"""
+        fetched = datetime.fromtimestamp(fetched_at)
+        try:
+            hour, minute = (int(part) for part in SymbolUniverse.REFRESH_TIME.split(':'))
+            refresh = fetched.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        except ValueError:
+            logger.warning(f"SYMBOL_REFRESH_TIME 格式错误: {SymbolUniverse.REFRESH_TIME}")
+            return fetched_at + SymbolUniverse.TTL
+        if refresh <= fetched:
+            refresh += timedelta(days=1)
+        return min(refresh.timestamp(), fetched_at + SymbolUniverse.TTL)
+
+    @staticmethod
+    def clear() -> None:
+        """清空内存中的缓存"""
+        SymbolUniverse._entries.clear()
+
+    @staticmethod
+    def _path(type: str) -> Optional[Path]:
+        """缓存文件路径，type 含有路径字符时不保存"""
+        if not re.fullmatch(r"[\w-]+", type):
+            return None
+        return Path(SymbolUniverse.ROOT) / f"{type}.json"
+
+    @staticmethod
+    def _load(type: str) -> Optional[dict]:
+        """读取缓存文件，不存在或无法解析时返回None"""
+        path = SymbolUniverse._path(type)
+        if path is None:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if not isinstance(entry.get("lines"), list) or not isinstance(entry.get("expires_at"), (int, float)):
+                return None
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _save(type: str, entry: dict) -> None:
+        """保存缓存文件，先写临时文件再替换，写入失败只记录日志"""
+        path = SymbolUniverse._path(type)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"保存symbol列表缓存失败: {path} - {str(e)}")
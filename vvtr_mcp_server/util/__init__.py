@@ -1,8 +1,24 @@
 """工具函数模块"""
 
 # 导入工具类
+from .columnar_cache import ColumnarCache
+from .csv_fields import CsvFields
 from .csv_merger import CsvMerger
+from .csv_catalog import CsvCatalog
+from .csv_schema import CsvSchema
+from .cursor_token import CursorToken
+from .data_file import DataFile
+from .file_stats import FileStats
 from .folder_size import FolderSize
+from .kline_writer import KlineWriter
+from .partition_cache import Partition, PartitionCache
+from .scan_executor import ScanExecutor
+from .sidecar import Sidecar
+from .symbol_store import SymbolStore
+from .time_filter import TimeFilter
+from .time_seek import TimeSeek
+from .tool_runner import ToolRunner
+from .zone_map import ZoneMap
 
 # 暴露为包接口
-__all__ = ["CsvMerger", "FolderSize"]
\ No newline at end of file
+__all__ = ["ColumnarCache", "CsvFields", "CsvMerger", "CsvCatalog", "CsvSchema", "CursorToken", "DataFile", "FileStats", "FolderSize", "KlineWriter", "Partition", "PartitionCache", "ScanExecutor", "Sidecar", "SymbolStore", "TimeFilter", "TimeSeek", "ToolRunner", "ZoneMap"]
\ No newline at end of file
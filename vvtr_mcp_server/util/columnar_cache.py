@@ -0,0 +1,307 @@
+import os
+import sys
+import json
+import mmap
+import calendar
+import logging
+import threading
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖，未安装时不使用列式缓存
+    np = None
+
+from vvtr_mcp_server.util.data_file import DataFile
+from vvtr_mcp_server.util.partition_cache import PartitionCache
+from vvtr_mcp_server.util.sidecar import Sidecar
+from vvtr_mcp_server.util.time_filter import TimeFilter
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class ColumnarTable:
+    """
+    单个CSV文件的列式数据，各列为内存映射的NumPy数组
+    """
+
+    def __init__(self, path: Path, directory: Path, meta: dict):
+        self.path = path
+        self.header: List[str] = meta["header"]
+        self.rows: int = meta["rows"]
+        self.symbols: List[str] = meta.get("symbols", [])
+        self.kinds: Dict[int, str] = {int(i): kind for i, kind in meta["kinds"].items()}
+        self.offsets = np.load(directory / "offsets.npy", mmap_mode='r')
+        self._directory = directory
+        self._columns: Dict[int, "np.ndarray"] = {}
+
+    def column(self, index: int) -> Optional["np.ndarray"]:
+        """
+        获取指定列的数组，时间列为 int64 秒数，数值列为 float64，symbol列为 int32 编码；
+        该列没有生成数组时返回None
+        """
+        if index not in self.kinds:
+            return None
+        if index not in self._columns:
+            self._columns[index] = np.load(self._directory / f"{index}.npy", mmap_mode='r')
+        return self._columns[index]
+
+    def symbol_code(self, symbol: str) -> int:
+        """
+        获取symbol的编码，不存在时返回-1
+        """
+        try:
+            return self.symbols.index(symbol)
+        except ValueError:
+            return -1
+
+    def lines_where(self, mask: "np.ndarray") -> List[str]:
+        """
+        取出布尔掩码为True的数据行
+        """
+        return self.lines(self.rows_where(mask))
+
+    @staticmethod
+    def rows_where(mask: "np.ndarray") -> "np.ndarray":
+        """
+        获取布尔掩码为True的行号(升序)
+        """
+        return np.flatnonzero(mask)
+
+    def lines(self, rows: "np.ndarray") -> List[str]:
+        """
+        按行号从原始文件中取出数据行(去掉换行符)
+
+        Args:
+            rows: 升序的行号数组
+        Returns:
+            数据行列表
+        """
+        if len(rows) == 0:
+            return []
+
+        if DataFile.is_compressed(self.path):
+            # 压缩文件不能内存映射，按解压后的偏移读取
+            with DataFile.open(self.path) as f:
+                def read(start: int, end: int) -> bytes:
+                    f.seek(start)
+                    return f.read(end - start)
+                return self._slice(rows, read)
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return self._slice(rows, lambda start, end: mm[start:end])
+
+    def _slice(self, rows: "np.ndarray", read) -> List[str]:
+        """
+        用 read(开始偏移, 结束偏移) 读取并解码数据行
+        """
+        first = int(rows[0])
+        last = int(rows[-1])
+        # 连续的行直接整段解码
+        if last - first + 1 == len(rows):
+            chunk = read(int(self.offsets[first]), int(self.offsets[last + 1])).decode('utf-8')
+            return [line.rstrip('\r') for line in chunk.rstrip('\n').split('\n')]
+
+        return [read(int(self.offsets[row]), int(self.offsets[row + 1])).decode('utf-8').rstrip('\r\n')
+                for row in rows]
+
+
+class ColumnarCache:
+    """
+    CSV文件的列式缓存(需要安装numpy)。
+
+    每个文件生成一组 .npy 数组：时间列(bob/eob/created_at)转为 int64 秒数，
+    数值列转为 float64，symbol列做字典编码，另外记录每行的字节偏移用于取回原始行。
+    缓存只由 warm(后台任务或命令行)生成，查询时只使用已生成且未失效的缓存，读取时内存映射，
+    时间过滤和切片用向量化运算完成，不再逐行解析文本；没有缓存的文件仍按 TimeSeek 定位后逐行读取。
+    """
+    # 设置为1则启用列式缓存(默认不启用)
+    ENABLED = os.environ.get("COLUMNAR_CACHE", "0") == "1"
+    # 附属目录后缀
+    SUFFIX = ".cols"
+    # 转为时间戳的列
+    TIME_COLUMNS = ("bob", "eob", "created_at")
+    # 做字典编码的列
+    SYMBOL_COLUMNS = ("symbol",)
+    # 无法解析的时间
+    NAT = -(2 ** 63)
+
+    _lock = threading.Lock()
+
+    @staticmethod
+    def available() -> bool:
+        """是否可以使用列式缓存"""
+        return np is not None and ColumnarCache.ENABLED
+
+    @staticmethod
+    def load(path: Path, build: bool = False) -> Optional[ColumnarTable]:
+        """
+        获取文件的列式数据
+
+        Args:
+            path: CSV文件路径
+            build: 缓存不存在或已失效时是否生成，查询时为False
+        Returns:
+            列式数据，不可用(未安装numpy、没有已生成的缓存、文件含引号字段等)时返回None
+        """
+        if not ColumnarCache.available():
+            return None
+
+        try:
+            # 打开后的列式数据放入进程内缓存，翻页时不再重复读取元数据
+            return PartitionCache.get(path, "columnar", partial(ColumnarCache._open, build=build))
+        except Exception as e:
+            logger.warning(f"列式缓存不可用: {path} - {str(e)}")
+            return None
+
+    @staticmethod
+    def _open(path: Path, stat: os.stat_result, build: bool = False) -> Tuple[Optional[ColumnarTable], int]:
+        """
+        打开文件的列式数据，缓存不存在或已失效时按 build 决定是否生成
+
+        Returns:
+            (列式数据, 估计占用的内存字节数)，按映射的数组大小加上元数据估算
+        """
+        directory = Sidecar.path_for(path, ColumnarCache.SUFFIX)
+        meta = ColumnarCache._load_meta(directory, stat)
+        if meta is None:
+            if not build:
+                return None, 0
+            with ColumnarCache._lock:
+                meta = ColumnarCache._load_meta(directory, stat)
+                if meta is None:
+                    meta = ColumnarCache.build(path, directory, stat)
+        if meta is None or not meta.get("supported", True):
+            return None, 0
+        table = ColumnarTable(path, directory, meta)
+        return table, table.rows * 8 * (len(table.kinds) + 1) + 64 * (len(table.header) + len(table.symbols))
+
+    @staticmethod
+    def build(path: Path, directory: Path, stat: os.stat_result) -> Optional[dict]:
+        """
+        解析CSV文件并写入列式缓存
+
+        Args:
+            path: CSV文件路径
+            directory: 缓存目录
+            stat: 解析前文件的stat结果
+        Returns:
+            缓存元数据，写入失败时返回None
+        """
+        with DataFile.open(path) as f:
+            data = f.read()
+
+        header_end = data.find(b'\n') + 1 if b'\n' in data else len(data)
+        header = [field.strip() for field in data[:header_end].decode('utf-8').strip().split(',')]
+        meta = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "header": header}
+
+        # 带引号的字段不能简单按逗号切分，交给文本方式处理
+        if b'"' in data:
+            meta.update(supported=False, rows=0, kinds={})
+            ColumnarCache._save(directory, meta, {})
+            return meta
+
+        offsets = [header_end]
+        lines = []
+        for raw in data[header_end:].splitlines(keepends=True):
+            lines.append(raw.decode('utf-8').rstrip('\r\n').split(','))
+            offsets.append(offsets[-1] + len(raw))
+
+        kinds = {}
+        arrays = {"offsets": np.array(offsets, dtype=np.int64)}
+        for i, name in enumerate(header):
+            values = [fields[i] if len(fields) > i else "" for fields in lines]
+            lower = name.lower()
+            if lower in ColumnarCache.TIME_COLUMNS:
+                kinds[i] = "time"
+                arrays[str(i)] = np.array([ColumnarCache.to_epoch(value) for value in values], dtype=np.int64)
+            elif lower in ColumnarCache.SYMBOL_COLUMNS:
+                kinds[i] = "symbol"
+                symbols = sorted(set(values))
+                codes = {symbol: code for code, symbol in enumerate(symbols)}
+                meta["symbols"] = symbols
+                arrays[str(i)] = np.array([codes[value] for value in values], dtype=np.int32)
+            else:
+                try:
+                    arrays[str(i)] = np.array([float(value) for value in values], dtype=np.float64)
+                    kinds[i] = "float"
+                except ValueError:
+                    continue
+
+        meta.update(supported=True, rows=len(lines), kinds=kinds)
+        ColumnarCache._save(directory, meta, arrays)
+        return meta
+
+    @staticmethod
+    def to_epoch(value: str) -> int:
+        """
+        把 yyyy-MM-dd HH:mm:ss(+0800) 或 yyyy-MM-dd 转为秒数(按本地时间，不处理时区)，无法解析时返回 NAT
+
+        Args:
+            value: 时间字符串
+        Returns:
+            秒数
+        """
+        value = value.strip()
+        key = TimeFilter.time_key(value)
+        if key is None:
+            day = TimeFilter.date_key(value)
+            if day is None:
+                return ColumnarCache.NAT
+            key = day + " 00:00:00"
+        return calendar.timegm((int(key[0:4]), int(key[5:7]), int(key[8:10]),
+                                int(key[11:13]), int(key[14:16]), int(key[17:19])))
+
+    @staticmethod
+    def warm(paths: List[Path]) -> int:
+        """
+        预先生成多个文件的列式缓存，可在后台任务中调用
+
+        Args:
+            paths: CSV文件路径列表
+        Returns:
+            可用的缓存数量
+        """
+        return sum(1 for path in paths if ColumnarCache.load(path, build=True) is not None)
+
+    @staticmethod
+    def _load_meta(directory: Path, stat: os.stat_result) -> Optional[dict]:
+        """
+        读取缓存元数据，文件已变化时返回None
+        """
+        try:
+            with open(directory / "meta.json", 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("size") != stat.st_size or meta.get("mtime_ns") != stat.st_mtime_ns:
+            return None
+        return meta
+
+    @staticmethod
+    def _save(directory: Path, meta: dict, arrays: dict) -> None:
+        """
+        写入缓存，先写数组，最后原子地写入元数据
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        for name, array in arrays.items():
+            tmp = directory / f"{name}.{os.getpid()}.{threading.get_ident()}.tmp.npy"
+            np.save(tmp, array)
+            os.replace(tmp, directory / f"{name}.npy")
+
+        tmp = directory / f"meta.json.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, directory / "meta.json")
+
+
+# 后台预热：COLUMNAR_CACHE=1 python -m vvtr_mcp_server.util.columnar_cache [目录]
+if __name__ == "__main__":
+    from vvtr_mcp_server.util.csv_merger import CsvMerger
+
+    root = Path(sys.argv[1] if len(sys.argv) > 1 else CsvMerger.ROOT)
+    count = ColumnarCache.warm(CsvMerger.find_all_csv_files(root))
+    print(f"已生成 {count} 个文件的列式缓存")
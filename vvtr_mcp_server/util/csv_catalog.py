@@ -0,0 +1,206 @@
+import os
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from vvtr_mcp_server.util.csv_merger import CsvMerger
+from vvtr_mcp_server.util.data_file import DataFile
+from vvtr_mcp_server.util.sidecar import Sidecar
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class CsvCatalog:
+    """
+    API_DATA_PATH 目录树的持久化目录索引(SQLite)。
+
+    按 (type, interval, date, symbol) 记录每个 CSV 文件的路径、大小和修改时间，
+    并记录每个目录的修改时间。刷新时只 stat 目录，目录修改时间未变化的目录不会重新列举，
+    因此路径查询变成一次索引范围查询，不再需要对整棵树做 rglob。
+    """
+    # 目录索引文件路径，设置为空字符串则禁用目录索引
+    DB_PATH = os.environ.get("CATALOG_PATH", os.path.join(Sidecar.ROOT, "catalog.db"))
+    # 索引内容的版本，记录规则变化(如开始记录压缩文件)后旧索引整体重建
+    VERSION = 1
+
+    _lock = threading.Lock()
+
+    @staticmethod
+    def find_csv_files(type: str, interval: str, start_date: str, end_date: str,
+                       symbol: Optional[str] = None) -> List[Path]:
+        """
+        根据日期范围(和产品代码)查找CSV文件，目录索引不可用时回退到目录扫描。
+
+        Args:
+            type: 金融产品种类
+            interval: 数据类型,eg:1d,1m,15m,tick
+            start_date: 过滤的开始日期（包含），格式为 "yyyyMMdd"
+            end_date: 过滤的结束日期（包含），格式为 "yyyyMMdd"
+            symbol: 过滤产品代码，为空则不按产品代码过滤
+        Returns:
+            按日期排序的CSV文件的Path对象列表
+        """
+        root_dir = Path(CsvMerger.ROOT) / type / interval
+        if CsvCatalog.DB_PATH:
+            try:
+                return CsvCatalog.query(type, interval, start_date, end_date, symbol)
+            except (sqlite3.Error, OSError) as e:
+                logger.error(f"目录索引不可用，回退到目录扫描: {str(e)}")
+
+        if symbol is None:
+            return CsvMerger.find_all_csv_files_with_date_range(root_dir, start_date, end_date)
+        return CsvMerger.find_all_csv_files_with_date_range_and_symbol(root_dir, start_date, end_date, symbol)
+
+    @staticmethod
+    def query(type: str, interval: str, start_date: str, end_date: str,
+              symbol: Optional[str] = None) -> List[Path]:
+        """
+        增量刷新目录索引后按日期范围查询
+
+        Args:
+            type: 金融产品种类
+            interval: 数据类型
+            start_date: 开始日期（包含），格式为 "yyyyMMdd"
+            end_date: 结束日期（包含），格式为 "yyyyMMdd"
+            symbol: 产品代码，为空则不过滤
+        Returns:
+            按日期排序的CSV文件的Path对象列表
+        """
+        root_dir = Path(CsvMerger.ROOT) / type / interval
+        conn = CsvCatalog._connect()
+        try:
+            CsvCatalog.refresh(conn, type, interval, root_dir)
+
+            sql = "SELECT dir, name FROM files WHERE type = ? AND interval = ?"
+            params = [type, interval]
+            # 与目录扫描保持一致：根目录下的文件总是返回
+            if not (start_date == "00000000" and end_date == "99999999"):
+                sql += " AND (date = '' OR date BETWEEN ? AND ?)"
+                params.extend([start_date, end_date])
+            if symbol:
+                sql += " AND symbol = ?"
+                params.append(symbol)
+            sql += " ORDER BY date, dir, name"
+
+            return [root_dir / rel / name if rel else root_dir / name
+                    for rel, name in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    @staticmethod
+    def refresh(conn: sqlite3.Connection, type: str, interval: str, root_dir: Path) -> None:
+        """
+        增量刷新某个 type/interval 目录的索引。
+
+        逐层 stat 目录，修改时间与索引一致的目录直接沿用已记录的子目录和文件，
+        只有新增或变化的目录才会被重新列举。
+
+        Args:
+            conn: SQLite连接
+            type: 金融产品种类
+            interval: 数据类型
+            root_dir: type/interval 对应的根目录
+        """
+        with CsvCatalog._lock, conn:
+            known: Dict[str, int] = dict(conn.execute(
+                "SELECT dir, mtime_ns FROM dirs WHERE type = ? AND interval = ?", (type, interval)))
+
+            # 根据已记录的目录还原目录树
+            children: Dict[str, List[str]] = {}
+            for rel in known:
+                if rel:
+                    children.setdefault(os.path.dirname(rel), []).append(rel)
+
+            seen = set()
+            stack = [""]
+            while stack:
+                rel = stack.pop()
+                abs_dir = os.path.join(root_dir, rel) if rel else str(root_dir)
+                try:
+                    mtime_ns = os.stat(abs_dir).st_mtime_ns
+                except OSError:
+                    continue
+                seen.add(rel)
+
+                # 目录未变化，子目录和文件也不会变化
+                if known.get(rel) == mtime_ns:
+                    stack.extend(children.get(rel, []))
+                    continue
+
+                subdirs, files = CsvCatalog._scan_dir(abs_dir, rel)
+                conn.execute("DELETE FROM files WHERE type = ? AND interval = ? AND dir = ?",
+                             (type, interval, rel))
+                conn.executemany(
+                    "INSERT INTO files (type, interval, dir, name, date, symbol, size, mtime_ns) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(type, interval, rel) + row for row in files])
+                conn.execute("INSERT OR REPLACE INTO dirs (type, interval, dir, mtime_ns) VALUES (?, ?, ?, ?)",
+                             (type, interval, rel, mtime_ns))
+                stack.extend(subdirs)
+
+            # 删除已经不存在的目录
+            for rel in set(known) - seen:
+                conn.execute("DELETE FROM dirs WHERE type = ? AND interval = ? AND dir = ?",
+                             (type, interval, rel))
+                conn.execute("DELETE FROM files WHERE type = ? AND interval = ? AND dir = ?",
+                             (type, interval, rel))
+
+    @staticmethod
+    def _scan_dir(abs_dir: str, rel: str) -> tuple[List[str], List[tuple]]:
+        """
+        列举单个目录，返回子目录和CSV文件记录
+        """
+        subdirs = []
+        files = []
+        # 根目录下的文件日期记为空字符串，日期目录下的文件使用目录名
+        dir_name = os.path.basename(rel)
+        if not rel:
+            date = ""
+        elif len(dir_name) == 8:
+            date = dir_name
+        else:
+            date = None
+
+        with os.scandir(abs_dir) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        subdirs.append(os.path.join(rel, entry.name) if rel else entry.name)
+                    elif date is not None and DataFile.is_data_file(entry.name) and entry.is_file():
+                        st = entry.stat()
+                        files.append((entry.name, date, DataFile.base_name(entry.name), st.st_size, st.st_mtime_ns))
+                except OSError:
+                    continue
+        # 同名的未压缩文件和压缩文件只记录一个
+        names = set(DataFile.unique(sorted(row[0] for row in files)))
+        return subdirs, [row for row in files if row[0] in names]
+
+    @staticmethod
+    def _connect() -> sqlite3.Connection:
+        """
+        打开目录索引数据库，必要时创建表结构
+        """
+        os.makedirs(os.path.dirname(CsvCatalog.DB_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(CsvCatalog.DB_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS dirs ("
+                     "type TEXT, interval TEXT, dir TEXT, mtime_ns INTEGER, "
+                     "PRIMARY KEY (type, interval, dir))")
+        conn.execute("CREATE TABLE IF NOT EXISTS files ("
+                     "type TEXT, interval TEXT, dir TEXT, name TEXT, date TEXT, symbol TEXT, "
+                     "size INTEGER, mtime_ns INTEGER, "
+                     "PRIMARY KEY (type, interval, dir, name))")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_files_date_symbol "
+                     "ON files (type, interval, date, symbol)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_files_symbol_date "
+                     "ON files (type, interval, symbol, date)")
+        if conn.execute("PRAGMA user_version").fetchone()[0] < CsvCatalog.VERSION:
+            with conn:
+                conn.execute("DELETE FROM dirs")
+                conn.execute("DELETE FROM files")
+            conn.execute(f"PRAGMA user_version = {CsvCatalog.VERSION}")
+        return conn
@@ -0,0 +1,45 @@
+import csv
+from typing import List, Optional
+
+
+class CsvFields:
+    """
+    CSV行的字段切分。
+
+    不含引号的行直接用 str.split 切分(C实现)，需要某一列时只切到该列为止，
+    其余字段原样保留；含引号的行交给标准库 csv 模块处理引号。
+    """
+
+    @staticmethod
+    def parse_line(line: str) -> List[str]:
+        """
+        解析CSV行，正确处理引号内的内容
+
+        Args:
+            line: 一行数据(不含换行符)
+        Returns:
+            字段列表
+        """
+        if '"' not in line:
+            return line.split(',')
+        return next(csv.reader([line]), [""])
+
+    @staticmethod
+    def field(line: str, index: int) -> Optional[str]:
+        """
+        只取出一行中的第 index 列
+
+        Args:
+            line: 一行数据(不含换行符)
+            index: 列索引
+        Returns:
+            该列的值，列不存在时返回None
+        """
+        if index < 0:
+            return None
+        if '"' not in line:
+            fields = line.split(',', index + 1)
+        else:
+            fields = CsvFields.parse_line(line)
+        return fields[index] if len(fields) > index else None
+
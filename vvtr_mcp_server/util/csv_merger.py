@@ -1,7 +1,11 @@
 import os
 import csv
+import logging
 from pathlib import Path
-from typing import List
+from typing import List, Optional
+
+from vvtr_mcp_server.util.csv_schema import CsvSchema
+from vvtr_mcp_server.util.data_file import DataFile
 
 
 class CsvMerger:
@@ -32,7 +36,7 @@ class CsvMerger:
         自动跳过每个文件的第一行
         """
         result = []
-        for path in Path(root_dir).rglob("*.csv"):
+        for path in CsvMerger.find_all_csv_files(Path(root_dir)):
             result.extend(CsvMerger.parse_file_as_stream(path))
         return "\n".join(result)
 
@@ -45,7 +49,7 @@ class CsvMerger:
         """
         try:
             result = []
-            with open(csv_path, 'r', encoding='utf-8') as f:
+            with DataFile.open_text(csv_path) as f:
                 csv_reader = csv.reader(f)
                 next(csv_reader)  # 跳过表头
                 for record in csv_reader:
@@ -58,12 +62,15 @@ class CsvMerger:
     @staticmethod
     def find_all_csv_files(root_dir: Path) -> List[Path]:
         """
-        在目录中查找所有CSV文件
+        在目录中查找所有CSV文件(含 .csv.gz / .csv.zst 压缩文件)
         """
-        return list(root_dir.rglob("*.csv"))
+        paths = [path for path in root_dir.rglob("*.csv*") if DataFile.is_data_file(path.name)]
+        kept = set(DataFile.unique(str(path) for path in paths))
+        return [path for path in paths if str(path) in kept]
 
     @staticmethod
-    def find_all_csv_files_with_date_range(root_dir: Path, start_date: str, end_date: str) -> List[Path]:
+    def find_all_csv_files_with_date_range(root_dir: Path, start_date: str, end_date: str,
+                                           symbol: Optional[str] = None) -> List[Path]:
         """
         根据指定的日期范围在目录中查找所有CSV文件。
 
@@ -71,43 +78,31 @@ class CsvMerger:
             root_dir: 要搜索的根目录
             start_date: 过滤的开始日期（包含），格式为 "yyyyMMdd"
             end_date: 过滤的结束日期（包含），格式为 "yyyyMMdd"
+            symbol: 日线使用，根据已有的 zone map 去掉一定不包含该产品代码的文件，为空则不过滤
         Returns:
             表示过滤后的CSV文件的Path对象列表
         """
-        return_all = start_date == "00000000" and end_date == "99999999"
-        result = []
+        return CsvMerger.prune_by_symbol(CsvMerger.find_csv_files_in_range(root_dir, start_date, end_date), symbol)
 
-        for path in root_dir.rglob("*.csv"):
-            try:
-                # 获取文件所在的目录
-                parent = path.parent
-
-                # 如果父目录为空，无法过滤
-                if parent is None:
-                    continue
-
-                # 获取父目录的名称（这应该是日期格式，例如 20200101）
-                date_str = parent.name
-
-                if root_dir.name == date_str:
-                    result.append(path)
-                    continue
-
-                # 确保日期格式正确
-                if len(date_str) != 8:
-                    continue
-
-                if return_all:
-                    result.append(path)
-                    continue
+    @staticmethod
+    def prune_by_symbol(paths: List[Path], symbol: Optional[str]) -> List[Path]:
+        """
+        根据已有的 zone map 去掉一定不包含该产品代码的文件(每个文件包含多个symbol的日线文件使用)，
+        没有 zone map 的文件保留，不为此读取文件
 
-                # 使用字符串比较判断日期是否在范围内
-                if start_date <= date_str <= end_date:
-                    result.append(path)
-            except Exception:
-                continue
+        Args:
+            paths: CSV文件路径列表
+            symbol: 产品代码，为空则不过滤
+        Returns:
+            保留的CSV文件路径列表
+        """
+        # zone_map 依赖本模块，在这里导入避免循环导入
+        from vvtr_mcp_server.util.zone_map import ZoneMap
 
-        return result
+        kept, pruned = ZoneMap.prune(paths, symbol)
+        if pruned:
+            logging.getLogger(__name__).info(f"根据zone map跳过了 {pruned}/{len(paths)} 个文件: symbol={symbol}")
+        return kept
 
     @staticmethod
     def find_all_csv_files_with_date_range_and_symbol(root_dir: Path, start_date: str, end_date: str, symbol: str) -> \
@@ -123,48 +118,77 @@ class CsvMerger:
         Returns:
             表示过滤后的CSV文件的Path对象列表
         """
-        return_all = start_date == "00000000" and end_date == "99999999"
-        result = []
-
-        for path in root_dir.rglob("*.csv"):
-            try:
-                # 获取文件名（不含扩展名）
-                file_name = path.name
-                file = file_name[:file_name.rfind('.')]
+        return CsvMerger.find_csv_files_in_range(root_dir, start_date, end_date, symbol)
 
-                if not symbol:
-                    pass  # 如果symbol为空，不根据symbol过滤
-                elif file != symbol:
-                    continue  # 如果文件名不匹配symbol，跳过
-
-                # 获取文件所在的目录
-                parent = path.parent
-
-                # 如果父目录为空，无法过滤
-                if parent is None:
-                    continue
+    @staticmethod
+    def find_csv_files_in_range(root_dir: Path, start_date: str, end_date: str,
+                                symbol: Optional[str] = None) -> List[Path]:
+        """
+        按 root/type/interval/yyyyMM/yyyyMMdd/<symbol>.csv 的目录结构做剪枝遍历。
 
-                # 获取父目录的名称（这应该是日期格式，例如 20200101）
-                date_str = parent.name
+        月份目录(6位)和日期目录(8位)不在 [start_date, end_date] 内时整体跳过，
+        只用 os.scandir 返回的目录项类型判断文件和目录，不对每个文件做 stat；
+        指定 symbol 时直接定位日期目录下的 <symbol>.csv，不再列举整个日期目录。
 
-                if root_dir.name == date_str:
-                    result.append(path)
-                    continue
-
-                # 确保日期格式正确
-                if len(date_str) != 8:
-                    continue
+        Args:
+            root_dir: 要搜索的根目录
+            start_date: 过滤的开始日期（包含），格式为 "yyyyMMdd"
+            end_date: 过滤的结束日期（包含），格式为 "yyyyMMdd"
+            symbol: 过滤产品代码，为空则不按产品代码过滤
+        Returns:
+            按日期排序的CSV文件的Path对象列表
+        """
+        return_all = start_date == "00000000" and end_date == "99999999"
+        start_month = start_date[:6]
+        end_month = end_date[:6]
+        file_names = DataFile.names(symbol) if symbol else None
+        result = []
 
-                if return_all:
-                    result.append(path)
+        def walk(directory: str, is_root: bool):
+            try:
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError:
+                return
+
+            for entry in entries:
+                name = entry.name
+                try:
+                    if entry.is_dir():
+                        # 日期目录：不在范围内直接跳过，在范围内只取CSV文件
+                        if len(name) == 8:
+                            if return_all or start_date <= name <= end_date:
+                                collect(entry.path)
+                        # 月份目录：整月不在范围内直接跳过
+                        elif len(name) == 6 and name.isdigit():
+                            if return_all or start_month <= name <= end_month:
+                                walk(entry.path, False)
+                        else:
+                            walk(entry.path, False)
+                    elif is_root and DataFile.is_data_file(name) and entry.is_file():
+                        # 根目录下的文件总是返回
+                        if not file_names or name in file_names:
+                            result.append(Path(entry.path))
+                except OSError:
                     continue
 
-                # 使用字符串比较判断日期是否在范围内
-                if start_date <= date_str <= end_date:
-                    result.append(path)
-            except Exception:
-                continue
+        def collect(day_dir: str):
+            if file_names:
+                # 同名的未压缩文件和压缩文件只取一个
+                for file_name in file_names:
+                    path = os.path.join(day_dir, file_name)
+                    if os.path.isfile(path):
+                        result.append(Path(path))
+                        return
+                return
+            try:
+                with os.scandir(day_dir) as it:
+                    names = sorted(e.name for e in it if DataFile.is_data_file(e.name) and e.is_file())
+            except OSError:
+                return
+            result.extend(Path(day_dir) / name for name in DataFile.unique(names))
 
+        walk(str(root_dir), True)
         return result
 
     @staticmethod
@@ -179,7 +203,7 @@ class CsvMerger:
         """
         result = []
         try:
-            with open(path, 'r') as f:
+            with DataFile.open_text(path, encoding=None) as f:
                 lines = f.readlines()
 
                 # 跳过第一行（表头）
@@ -298,13 +322,8 @@ class CsvMerger:
         获取bob列的索引
         """
         try:
-            with open(path, 'r') as f:
-                line = f.readline().strip()
-                str_fields = line.split(",")
-                for i, field in enumerate(str_fields):
-                    if field.strip().lower() == "bob":
-                        return i
-                return -1
+            # 表头按文件修改时间缓存，同一文件只解析一次
+            return CsvSchema.index(path, "bob")
         except Exception as e:
             print(f"读取CSV文件时出错: {str(e)}")
             return -1
@@ -315,13 +334,8 @@ class CsvMerger:
         获取symbol列的索引
         """
         try:
-            with open(path, 'r') as f:
-                line = f.readline().strip()
-                str_fields = line.split(",")
-                for i, field in enumerate(str_fields):
-                    if field.strip().lower() == "symbol":
-                        return i
-                return -1
+            # 表头按文件修改时间缓存，同一文件只解析一次
+            return CsvSchema.index(path, "symbol")
         except Exception as e:
             print(f"读取CSV文件时出错: {str(e)}")
             return -1
@@ -332,13 +346,8 @@ class CsvMerger:
         获取created_at列的索引
         """
         try:
-            with open(path, 'r') as f:
-                line = f.readline().strip()
-                str_fields = line.split(",")
-                for i, field in enumerate(str_fields):
-                    if field.strip().lower() == "created_at":
-                        return i
-                return -1
+            # 表头按文件修改时间缓存，同一文件只解析一次
+            return CsvSchema.index(path, "created_at")
         except Exception as e:
             print(f"读取CSV文件时出错: {str(e)}")
             return -1
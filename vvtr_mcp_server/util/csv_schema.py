@@ -0,0 +1,79 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from vvtr_mcp_server.util.data_file import DataFile
+
+
+class CsvSchema:
+    """
+    CSV文件表头的缓存。
+
+    按 (文件路径, 大小, 修改时间) 缓存表头解析出的 列名 -> 索引 映射，
+    同一个文件的多次列索引查询只读取并解析一次表头，文件变化后自动重新读取。
+    """
+    # 进程内缓存的表头数量
+    MAX_CACHED = 4096
+
+    _cache: "OrderedDict[str, dict]" = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def load(path: Union[str, Path]) -> dict:
+        """
+        获取文件的表头信息
+
+        Args:
+            path: CSV文件路径
+        Returns:
+            字典：header(表头行), columns(小写列名 -> 索引，同名列取第一个)
+        Raises:
+            OSError: 文件无法读取
+        """
+        stat = os.stat(path)
+        key = str(path)
+
+        with CsvSchema._lock:
+            schema = CsvSchema._cache.get(key)
+            if schema and schema["size"] == stat.st_size and schema["mtime_ns"] == stat.st_mtime_ns:
+                CsvSchema._cache.move_to_end(key)
+                return schema
+
+        with DataFile.open_text(path) as f:
+            header = f.readline().strip()
+        columns: Dict[str, int] = {}
+        for i, field in enumerate(header.split(",")):
+            columns.setdefault(field.strip().lower(), i)
+        schema = {"header": header, "columns": columns, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+        with CsvSchema._lock:
+            CsvSchema._cache[key] = schema
+            CsvSchema._cache.move_to_end(key)
+            while len(CsvSchema._cache) > CsvSchema.MAX_CACHED:
+                CsvSchema._cache.popitem(last=False)
+        return schema
+
+    @staticmethod
+    def index(path: Union[str, Path], name: str) -> int:
+        """
+        获取列的索引
+
+        Args:
+            path: CSV文件路径
+            name: 列名(不区分大小写)
+        Returns:
+            列索引，不存在时返回-1
+        """
+        return CsvSchema.load(path)["columns"].get(name.lower(), -1)
+
+    @staticmethod
+    def header(path: Union[str, Path]) -> Optional[str]:
+        """
+        获取文件的表头行，文件无法读取时返回None
+        """
+        try:
+            return CsvSchema.load(path)["header"]
+        except (OSError, UnicodeDecodeError):
+            return None
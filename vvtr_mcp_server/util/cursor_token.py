@@ -0,0 +1,79 @@
+import zlib
+import base64
+import struct
+from typing import Tuple
+
+
+class CursorToken:
+    """
+    本地数据分页的游标。
+
+    游标中编码 (版本, 文件序号, 字节偏移, 查询条件哈希)：文件序号是下一页开始的文件在
+    pathStrs 中的位置，字节偏移是该文件中下一页第一行的位置，继续查询时直接定位，不需要重新扫描；
+    查询条件哈希用于拒绝与本次查询条件(路径列表、时间范围等)不一致的游标。
+    """
+    VERSION = 1
+    # 版本(1字节), 文件序号(4字节), 字节偏移(8字节), 查询条件哈希(4字节)
+    _FORMAT = ">BIQI"
+
+    @staticmethod
+    def filter_hash(*parts) -> int:
+        """
+        计算查询条件的哈希
+
+        Args:
+            parts: 查询条件，列表会按元素展开
+        Returns:
+            32位哈希值
+        """
+        values = []
+        for part in parts:
+            if isinstance(part, (list, tuple)):
+                values.append(str(len(part)))
+                values.extend(str(item) for item in part)
+            else:
+                values.append("" if part is None else str(part))
+        return zlib.crc32("\x1f".join(values).encode("utf-8"))
+
+    @staticmethod
+    def encode(file_index: int, offset: int, filter_hash: int) -> str:
+        """
+        生成游标
+
+        Args:
+            file_index: 下一页开始的文件序号
+            offset: 下一页开始的字节偏移
+            filter_hash: 查询条件的哈希
+        Returns:
+            URL安全的base64字符串
+        """
+        raw = struct.pack(CursorToken._FORMAT, CursorToken.VERSION, file_index, offset, filter_hash)
+        return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+    @staticmethod
+    def decode(token: str, filter_hash: int) -> Tuple[int, int]:
+        """
+        解析游标
+
+        Args:
+            token: 上一次返回的游标，为空时表示第一页
+            filter_hash: 本次查询条件的哈希
+        Returns:
+            (文件序号, 字节偏移)
+        Raises:
+            ValueError: 游标格式错误或与本次查询条件不一致
+        """
+        if not token:
+            return 0, 0
+
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            version, file_index, offset, token_hash = struct.unpack(CursorToken._FORMAT, raw)
+        except (ValueError, struct.error):
+            raise ValueError("cursorToken格式错误")
+
+        if version != CursorToken.VERSION:
+            raise ValueError("cursorToken版本不支持")
+        if token_hash != filter_hash:
+            raise ValueError("cursorToken与本次查询条件不一致，请使用相同的pathStrs和时间范围")
+        return file_index, offset
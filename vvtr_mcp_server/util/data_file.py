@@ -0,0 +1,326 @@
+import io
+import os
+import sys
+import zlib
+import bisect
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import BinaryIO, Iterable, List, Optional, TextIO, Union
+
+try:
+    import zstandard
+except ImportError:  # zstandard为可选依赖，未安装时不能读取 .csv.zst 文件
+    zstandard = None
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class DataFile:
+    """
+    数据文件的读取，支持未压缩的 .csv 和压缩的 .csv.gz / .csv.zst。
+
+    压缩文件按解压后的内容读取，偏移、大小都是解压后的字节数，与未压缩文件的读取结果相同。
+    由多个独立帧组成的压缩文件(多成员gzip、多帧zstd)第一次读取时记录每一帧的起始位置(帧索引)，
+    定位时直接从目标位置所在的帧开始解压，跳过前面的帧；只有一帧的文件定位时需要从头解压。
+    同一目录下同名的未压缩文件和压缩文件同时存在时只使用一个，优先级按 SUFFIXES 的顺序。
+    """
+    # 数据文件后缀，按优先级排列
+    SUFFIXES = (".csv", ".csv.gz", ".csv.zst")
+    # 帧索引附属文件后缀
+    FRAME_SUFFIX = ".frames.json"
+    # 压缩时每一帧的未压缩字节数(按整行切分)
+    FRAME_BYTES = 1024 * 1024
+    # 每次从压缩文件读取的字节数
+    CHUNK = 64 * 1024
+    # 进程内缓存的帧索引数量
+    MAX_CACHED = 4096
+
+    _cache: "OrderedDict[str, dict]" = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def is_data_file(name: str) -> bool:
+        """文件名是否为数据文件"""
+        return name.endswith(DataFile.SUFFIXES)
+
+    @staticmethod
+    def base_name(name: str) -> str:
+        """去掉数据文件后缀的文件名,eg:600000.csv.gz -> 600000"""
+        for suffix in DataFile.SUFFIXES:
+            if name.endswith(suffix):
+                return name[:-len(suffix)]
+        return name.rsplit('.', 1)[0] if '.' in name else name
+
+    @staticmethod
+    def stem(path: Union[str, Path]) -> str:
+        """去掉数据文件后缀的文件名，与未压缩文件的 Path.stem 相同"""
+        return DataFile.base_name(Path(path).name)
+
+    @staticmethod
+    def is_compressed(path: Union[str, Path]) -> bool:
+        """是否为压缩文件"""
+        return str(path).endswith((".gz", ".zst"))
+
+    @staticmethod
+    def names(base: str) -> List[str]:
+        """同一数据的各种文件名，按优先级排列"""
+        return [base + suffix for suffix in DataFile.SUFFIXES]
+
+    @staticmethod
+    def unique(names: Iterable[str]) -> List[str]:
+        """
+        去掉同名数据的重复文件(如同时存在 600000.csv 和 600000.csv.gz)，保留优先级最高的一个
+
+        Args:
+            names: 已排序的数据文件名
+        Returns:
+            保持原有顺序的文件名列表
+        """
+        names = list(names)
+        best = {}
+        for name in names:
+            base = DataFile.base_name(name)
+            rank = DataFile._rank(name)
+            if base not in best or rank < DataFile._rank(best[base]):
+                best[base] = name
+        return [name for name in names if best[DataFile.base_name(name)] == name]
+
+    @staticmethod
+    def open(path: Union[str, Path]) -> BinaryIO:
+        """
+        以二进制方式打开数据文件，压缩文件返回可以按解压后偏移定位的读取对象
+
+        Raises:
+            OSError: 文件无法读取
+            RuntimeError: 读取 .csv.zst 文件但未安装zstandard
+        """
+        if not DataFile.is_compressed(path):
+            return open(path, 'rb')
+        index = DataFile.frames(path)
+        return io.BufferedReader(FrameReader(path, DataFile._codec(path), index), buffer_size=DataFile.CHUNK)
+
+    @staticmethod
+    def open_text(path: Union[str, Path], encoding: Optional[str] = 'utf-8') -> TextIO:
+        """以文本方式打开数据文件"""
+        if not DataFile.is_compressed(path):
+            return open(path, 'r', encoding=encoding)
+        return io.TextIOWrapper(DataFile.open(path), encoding=encoding)
+
+    @staticmethod
+    def size(path: Union[str, Path]) -> int:
+        """数据文件解压后的字节数"""
+        if not DataFile.is_compressed(path):
+            return os.path.getsize(path)
+        return DataFile.frames(path)["length"]
+
+    @staticmethod
+    def frames(path: Union[str, Path]) -> dict:
+        """
+        获取压缩文件的帧索引，必要时顺序解压一遍生成
+
+        Returns:
+            字典：frames([解压后偏移, 压缩文件中的偏移]列表), length(解压后的字节数)
+        """
+        # 附属文件依赖 CsvMerger，在这里导入以免循环导入
+        from vvtr_mcp_server.util.sidecar import Sidecar
+
+        stat = os.stat(path)
+        key = str(path)
+        with DataFile._lock:
+            index = DataFile._cache.get(key)
+            if index and index["size"] == stat.st_size and index["mtime_ns"] == stat.st_mtime_ns:
+                DataFile._cache.move_to_end(key)
+                return index
+
+        index = Sidecar.load(path, DataFile.FRAME_SUFFIX, stat)
+        if index is None:
+            index = DataFile._build_frames(path)
+            Sidecar.save(path, DataFile.FRAME_SUFFIX, stat, index)
+            if len(index["frames"]) == 1 and index["length"] > DataFile.FRAME_BYTES * 4:
+                logger.info(f"压缩文件只有一帧，定位时需要从头解压: {path}")
+        index = dict(index, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+        with DataFile._lock:
+            DataFile._cache[key] = index
+            DataFile._cache.move_to_end(key)
+            while len(DataFile._cache) > DataFile.MAX_CACHED:
+                DataFile._cache.popitem(last=False)
+        return index
+
+    @staticmethod
+    def compress(source: Union[str, Path], target: Union[str, Path], frame_bytes: int = 0) -> int:
+        """
+        把未压缩的数据文件压缩为按整行切分的多帧文件，格式由 target 的后缀决定
+
+        Args:
+            source: 未压缩的CSV文件路径
+            target: 压缩文件路径,eg:600000.csv.gz
+            frame_bytes: 每一帧的未压缩字节数，为0时使用 FRAME_BYTES
+        Returns:
+            帧数
+        """
+        frame_bytes = frame_bytes or DataFile.FRAME_BYTES
+        codec = DataFile._codec(target)
+        count = 0
+        tmp = Path(f"{target}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(source, 'rb') as src, open(tmp, 'wb') as dst:
+            while True:
+                frame = src.read(frame_bytes)
+                if not frame:
+                    break
+                if not frame.endswith(b'\n'):
+                    frame += src.readline()
+                dst.write(DataFile._compress_frame(codec, frame))
+                count += 1
+        os.replace(tmp, target)
+        return count
+
+    @staticmethod
+    def _rank(name: str) -> int:
+        """文件后缀的优先级，越小越优先"""
+        return next((rank for rank, suffix in enumerate(DataFile.SUFFIXES) if name.endswith(suffix)),
+                    len(DataFile.SUFFIXES))
+
+    @staticmethod
+    def _codec(path: Union[str, Path]) -> str:
+        """压缩格式：gz 或 zst"""
+        if str(path).endswith(".zst"):
+            if zstandard is None:
+                raise RuntimeError("读取.zst文件需要安装zstandard: pip install vvtr-mcp-server[zstd]")
+            return "zst"
+        return "gz"
+
+    @staticmethod
+    def _decompressor(codec: str):
+        """一帧的解压对象，帧结束后 eof 为True，多读的数据在 unused_data 中"""
+        if codec == "zst":
+            return zstandard.ZstdDecompressor().decompressobj()
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    @staticmethod
+    def _compress_frame(codec: str, data: bytes) -> bytes:
+        """压缩为独立的一帧"""
+        if codec == "zst":
+            return zstandard.ZstdCompressor(write_content_size=True).compress(data)
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+
+    @staticmethod
+    def _build_frames(path: Union[str, Path]) -> dict:
+        """顺序解压整个文件，记录每一帧开始处的解压后偏移和压缩文件中的偏移"""
+        codec = DataFile._codec(path)
+        frames = [[0, 0]]
+        length = 0
+        consumed = 0
+        decompressor = DataFile._decompressor(codec)
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(DataFile.CHUNK)
+                if not chunk:
+                    break
+                consumed += len(chunk)
+                while chunk:
+                    length += len(decompressor.decompress(chunk))
+                    if not decompressor.eof:
+                        break
+                    chunk = decompressor.unused_data
+                    frames.append([length, consumed - len(chunk)])
+                    decompressor = DataFile._decompressor(codec)
+        # 最后一帧结束处不是新的帧
+        while len(frames) > 1 and frames[-1][1] >= consumed:
+            frames.pop()
+        return {"frames": frames, "length": length}
+
+
+class FrameReader(io.RawIOBase):
+    """
+    按帧解压的读取对象，位置为解压后的字节偏移；由 DataFile.open 包装为 BufferedReader 使用
+    """
+
+    def __init__(self, path: Union[str, Path], codec: str, index: dict):
+        self._file = open(path, 'rb')
+        self._codec = codec
+        self._frames = index["frames"]
+        self._starts = [frame[0] for frame in self._frames]
+        self._length = index["length"]
+        self._pending = bytearray()
+        self._decompressor = None
+        self._position = 0
+        self._start_frame(0)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self) -> None:
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._length
+        target = max(0, min(offset, self._length))
+
+        # 目标在当前位置之前或隔着整帧时，从目标所在的帧开始解压
+        frame = bisect.bisect_right(self._starts, target) - 1
+        if target < self._position or self._starts[frame] > self._position:
+            self._start_frame(frame)
+        while self._position < target:
+            if not self._read(min(target - self._position, DataFile.CHUNK)):
+                break
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        data = self._read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def _start_frame(self, frame: int) -> None:
+        self._file.seek(self._frames[frame][1])
+        self._decompressor = DataFile._decompressor(self._codec)
+        self._pending.clear()
+        self._position = self._frames[frame][0]
+
+    def _read(self, size: int) -> bytes:
+        while len(self._pending) < size and self._fill():
+            pass
+        data = bytes(self._pending[:size])
+        del self._pending[:size]
+        self._position += len(data)
+        return data
+
+    def _fill(self) -> bool:
+        """解压下一块数据，文件结束时返回False"""
+        data = b''
+        if self._decompressor.eof:
+            data = self._decompressor.unused_data
+            self._decompressor = DataFile._decompressor(self._codec)
+        if not data:
+            data = self._file.read(DataFile.CHUNK)
+            if not data:
+                return False
+        self._pending += self._decompressor.decompress(data)
+        return True
+
+
+# 压缩数据文件：python -m vvtr_mcp_server.util.data_file <.csv文件或目录> [gz|zst]
+if __name__ == "__main__":
+    source_root = Path(sys.argv[1])
+    extension = ".csv." + (sys.argv[2] if len(sys.argv) > 2 else "gz")
+    sources = [source_root] if source_root.is_file() else sorted(source_root.rglob("*.csv"))
+    for csv_path in sources:
+        target_path = csv_path.with_name(csv_path.name[:-len(".csv")] + extension)
+        frame_count = DataFile.compress(csv_path, target_path)
+        print(f"{csv_path} -> {target_path}: {frame_count} 帧")
@@ -0,0 +1,233 @@
+import os
+import mmap
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from vvtr_mcp_server.util.csv_fields import CsvFields
+from vvtr_mcp_server.util.csv_schema import CsvSchema
+from vvtr_mcp_server.util.data_file import DataFile
+from vvtr_mcp_server.util.sidecar import Sidecar
+from vvtr_mcp_server.util.time_filter import TimeFilter
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class FileStats:
+    """
+    CSV文件的行数统计。
+
+    记录每个文件的数据行数，日线文件另外按 symbol 和 (bob日期, eob日期) 记录行数。
+    统计结果写入附属文件，文件只在末尾追加数据时只统计追加的部分，其他修改则重新统计；
+    行数通过内存映射整块统计换行符得到，不逐行解析；压缩文件按块解压后统计，总是重新统计。
+    """
+    # 附属文件后缀
+    SUFFIX = ".stats.json"
+    # 每次统计换行符的字节数
+    CHUNK = 16 * 1024 * 1024
+    # 用于判断文件是否只追加了数据的末尾字节数
+    TAIL = 64
+    # 进程内缓存的统计数量
+    MAX_CACHED = 4096
+
+    _cache: "OrderedDict[str, dict]" = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def load(path: Path, by_symbol: bool = False) -> dict:
+        """
+        获取文件的统计信息，必要时统计并写入附属文件
+
+        Args:
+            path: CSV文件路径
+            by_symbol: 是否需要按symbol统计(日线文件使用)
+        Returns:
+            统计字典：header_end(第一行数据的偏移), rows(数据行数),
+            symbols({symbol: [[bob日期, eob日期, 行数], ...]}，只有 by_symbol 时保证存在)
+        """
+        stat = os.stat(path)
+        key = str(path)
+
+        with FileStats._lock:
+            stats = FileStats._cache.get(key)
+        if not FileStats._matches(stats, stat, by_symbol):
+            stats = Sidecar.load(path, FileStats.SUFFIX, stat)
+        if not FileStats._matches(stats, stat, by_symbol):
+            stats = FileStats._update(path, stat, by_symbol)
+            Sidecar.save(path, FileStats.SUFFIX, stat, stats)
+            stats = dict(stats, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+        with FileStats._lock:
+            FileStats._cache[key] = stats
+            FileStats._cache.move_to_end(key)
+            while len(FileStats._cache) > FileStats.MAX_CACHED:
+                FileStats._cache.popitem(last=False)
+        return stats
+
+    @staticmethod
+    def count_lines(path: Path, start: int, end: int) -> int:
+        """
+        统计 [start, end) 范围内的行数，start 必须是某一行的起始位置，最后一行可以没有换行符
+
+        Args:
+            path: 文件路径
+            start: 开始的字节偏移
+            end: 结束的字节偏移
+        Returns:
+            行数
+        """
+        if end <= start:
+            return 0
+        if DataFile.is_compressed(path):
+            return FileStats._count_stream(path, start, end)
+
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return 0
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                end = min(end, len(mm))
+                count = 0
+                for position in range(start, end, FileStats.CHUNK):
+                    count += mm[position:min(position + FileStats.CHUNK, end)].count(b'\n')
+                if end > start and mm[end - 1:end] != b'\n':
+                    count += 1
+                return count
+
+    @staticmethod
+    def _count_stream(path: Path, start: int, end: int) -> int:
+        """
+        按块解压统计 [start, end) 范围内的行数，规则与 count_lines 相同
+        """
+        count = 0
+        last = b''
+        with DataFile.open(path) as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(FileStats.CHUNK, remaining))
+                if not chunk:
+                    break
+                count += chunk.count(b'\n')
+                last = chunk[-1:]
+                remaining -= len(chunk)
+        if last and last != b'\n':
+            count += 1
+        return count
+
+    @staticmethod
+    def _matches(stats: Optional[dict], stat: os.stat_result, by_symbol: bool) -> bool:
+        """
+        统计信息是否与文件当前状态一致
+        """
+        return (stats is not None and stats.get("size") == stat.st_size
+                and stats.get("mtime_ns") == stat.st_mtime_ns
+                and (not by_symbol or stats.get("symbols") is not None))
+
+    @staticmethod
+    def _update(path: Path, stat: os.stat_result, by_symbol: bool) -> dict:
+        """
+        统计文件，如果上次统计后文件只在末尾追加了数据，只统计追加的部分
+        """
+        previous = Sidecar.read(path, FileStats.SUFFIX)
+        if previous and not DataFile.is_compressed(path) and FileStats._appended(path, previous, stat):
+            start = previous["size"]
+            stats = dict(previous, rows=previous["rows"] + FileStats.count_lines(path, start, stat.st_size),
+                         tail=FileStats._tail(path, stat.st_size))
+            symbols = previous.get("symbols")
+            if symbols is not None:
+                FileStats._merge(symbols, FileStats._count_symbols(path, start, stat.st_size))
+            elif by_symbol:
+                stats["symbols"] = FileStats._count_symbols(path, previous["header_end"], stat.st_size)
+            return stats
+
+        # 压缩文件按解压后的偏移统计
+        size = DataFile.size(path)
+        with DataFile.open(path) as f:
+            header_end = len(f.readline())
+        stats = {
+            "header_end": header_end,
+            "rows": FileStats.count_lines(path, header_end, size),
+            "tail": FileStats._tail(path, size),
+        }
+        if by_symbol:
+            stats["symbols"] = FileStats._count_symbols(path, header_end, size)
+        return stats
+
+    @staticmethod
+    def _appended(path: Path, previous: dict, stat: os.stat_result) -> bool:
+        """
+        判断文件是否只在上次统计之后追加了数据：上次统计时以换行结尾，且原末尾的字节没有变化
+        """
+        size = previous.get("size")
+        tail = previous.get("tail")
+        if not isinstance(size, int) or tail is None or size <= 0 or stat.st_size <= size:
+            return False
+        if not tail.endswith("0a"):
+            return False
+        return FileStats._tail(path, size) == tail
+
+    @staticmethod
+    def _tail(path: Path, size: int) -> str:
+        """
+        读取文件 size 之前的末尾字节，以十六进制字符串表示
+        """
+        start = max(0, size - FileStats.TAIL)
+        with DataFile.open(path) as f:
+            f.seek(start)
+            return f.read(size - start).hex()
+
+    @staticmethod
+    def _count_symbols(path: Path, start: int, end: int) -> Dict[str, List[list]]:
+        """
+        按symbol和(bob日期, eob日期)统计 [start, end) 范围内的数据行，
+        日期无法解析的行不计入(与日线查询的过滤一致)
+        """
+        symbol_index = CsvSchema.index(path, "symbol")
+        bob_index = CsvSchema.index(path, "bob")
+        if symbol_index < 0 or bob_index < 0:
+            return {}
+
+        counts: Dict[tuple, int] = {}
+        with DataFile.open(path) as f:
+            f.seek(start)
+            remaining = end - start
+            for raw in f:
+                if remaining <= 0:
+                    break
+                remaining -= len(raw)
+                line = raw.decode('utf-8').rstrip('\r\n')
+                if not line.strip():
+                    continue
+                fields = CsvFields.parse_line(line)
+                if len(fields) <= max(bob_index + 1, symbol_index):
+                    continue
+                bob_date = TimeFilter.date_key(fields[bob_index])
+                eob_date = TimeFilter.date_key(fields[bob_index + 1])
+                if bob_date is None or eob_date is None:
+                    continue
+                key = (fields[symbol_index], bob_date, eob_date)
+                counts[key] = counts.get(key, 0) + 1
+
+        symbols: Dict[str, List[list]] = {}
+        for (symbol, bob_date, eob_date), count in sorted(counts.items()):
+            symbols.setdefault(symbol, []).append([bob_date, eob_date, count])
+        return symbols
+
+    @staticmethod
+    def _merge(symbols: Dict[str, List[list]], appended: Dict[str, List[list]]) -> None:
+        """
+        把追加部分的统计合并到已有统计中
+        """
+        for symbol, entries in appended.items():
+            existing = symbols.setdefault(symbol, [])
+            for bob_date, eob_date, count in entries:
+                for entry in existing:
+                    if entry[0] == bob_date and entry[1] == eob_date:
+                        entry[2] += count
+                        break
+                else:
+                    existing.append([bob_date, eob_date, count])
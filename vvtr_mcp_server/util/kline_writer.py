@@ -0,0 +1,169 @@
+import os
+import zlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from vvtr_mcp_server.util.csv_fields import CsvFields
+from vvtr_mcp_server.util.csv_merger import CsvMerger
+from vvtr_mcp_server.util.data_file import DataFile
+from vvtr_mcp_server.util.time_filter import TimeFilter
+from vvtr_mcp_server.util.zone_map import ZoneMap
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class KlineWriter:
+    """
+    把远程获取的K线写入本地数据目录，之后相同的查询可以直接使用本地文件。
+
+    目录结构与本地数据一致：<API_DATA_PATH>/<type>/<interval>/<yyyyMM>/<yyyyMMdd>/ 下，
+    分钟K线每个symbol一个文件(<symbol>.csv)，按 bob 排序；日线每天一个文件(<yyyyMMdd>.csv)，包含当天所有symbol。
+    与已有文件合并时按 (symbol, bob) 去重，新数据替换旧数据，id 相同的旧数据也会被替换；
+    先写临时文件再替换原文件，读取方不会看到写了一半的文件。已有文件为压缩文件时写回相同的压缩格式。
+    写入后重新生成 zone map，其他索引按文件大小和修改时间自动失效。
+    """
+    # 设置为1则写入远程获取的K线
+    ENABLED = os.environ.get("WRITE_THROUGH", "0") == "1"
+    # 写入的K线周期，与本地数据目录一致
+    INTERVALS = tuple(os.environ.get("WRITE_THROUGH_INTERVALS", "1m,15m,1d").split(','))
+    # 日线周期，按日期而不是按symbol存放
+    DAY_INTERVAL = "1d"
+
+    # 文件锁的分片数，不同文件可能共用一把锁，锁的数量不随写过的文件数增长
+    LOCK_SHARDS = 64
+
+    _locks: List[threading.Lock] = [threading.Lock() for _ in range(LOCK_SHARDS)]
+
+    @staticmethod
+    def accepts(type: str, interval: str) -> bool:
+        """是否写入该类型和周期的K线"""
+        return (KlineWriter.ENABLED and interval in KlineWriter.INTERVALS
+                and KlineWriter._safe(type) and KlineWriter._safe(interval))
+
+    @staticmethod
+    def write(type: str, interval: str, header: str, lines: List[str]) -> List[Path]:
+        """
+        把K线数据行合并到本地文件
+
+        Args:
+            type: 产品类型,eg:11
+            interval: K线周期,eg:1m
+            header: 数据行的表头，需包含 id、symbol、bob 列
+            lines: CSV数据行
+        Returns:
+            写入的文件路径列表
+        """
+        columns = [name.strip().lower() for name in header.split(',')]
+        if "symbol" not in columns or "bob" not in columns:
+            logger.warning(f"K线缺少symbol或bob列，不写入本地: {header}")
+            return []
+        symbol_index = columns.index("symbol")
+        bob_index = columns.index("bob")
+
+        # 按目标文件分组
+        groups: Dict[str, Tuple[Path, List[str]]] = {}
+        skipped = 0
+        for line in lines:
+            symbol = CsvFields.field(line, symbol_index)
+            bob = CsvFields.field(line, bob_index)
+            date = TimeFilter.date_key(bob.strip()) if bob else None
+            if not date or not symbol or not KlineWriter._safe(symbol):
+                skipped += 1
+                continue
+            day = date.replace('-', '')
+            name = day if interval == KlineWriter.DAY_INTERVAL else symbol
+            base = Path(CsvMerger.ROOT) / type / interval / day[:6] / day / name
+            groups.setdefault(str(base), (base, []))[1].append(line)
+        if skipped:
+            logger.warning(f"{skipped} 行K线缺少symbol或时间无法解析，未写入本地")
+
+        written = []
+        for base, group in groups.values():
+            try:
+                path = KlineWriter._merge(base, header, columns, group, interval == KlineWriter.DAY_INTERVAL)
+            except (OSError, RuntimeError) as e:
+                logger.error(f"写入本地K线失败: {base} - {str(e)}")
+                continue
+            if path is not None:
+                written.append(path)
+        return written
+
+    @staticmethod
+    def _merge(base: Path, header: str, columns: List[str], lines: List[str], by_symbol: bool) -> Optional[Path]:
+        """
+        把数据行合并到一个数据文件
+
+        Args:
+            base: 去掉后缀的数据文件路径
+            header: 表头行
+            columns: 小写的列名
+            lines: 新的数据行
+            by_symbol: 为True时按 (symbol, bob) 排序(日线)，否则按 bob 排序
+        Returns:
+            写入的文件路径，表头与已有文件不一致时返回None
+        """
+        id_index = columns.index("id") if "id" in columns else -1
+        symbol_index = columns.index("symbol")
+        bob_index = columns.index("bob")
+
+        def key(line: str) -> tuple:
+            bob = CsvFields.field(line, bob_index) or ""
+            return CsvFields.field(line, symbol_index), TimeFilter.time_key(bob.strip()) or bob
+
+        with KlineWriter._lock_for(base):
+            # 已有文件：同名的未压缩和压缩文件按 DataFile 的优先级取第一个
+            existing = next((base.with_name(name) for name in DataFile.names(base.name)
+                             if base.with_name(name).exists()), None)
+            rows: Dict[tuple, str] = {}
+            if existing is not None:
+                with DataFile.open_text(existing) as f:
+                    old_header = f.readline().rstrip('\r\n')
+                    if [name.strip().lower() for name in old_header.split(',')] != columns:
+                        logger.warning(f"本地文件的表头与远程数据不一致，不写入: {existing}")
+                        return None
+                    for raw in f:
+                        line = raw.rstrip('\r\n')
+                        if line.strip():
+                            rows[key(line)] = line
+
+            # id 相同的旧数据视为同一根K线
+            if id_index >= 0:
+                ids = {CsvFields.field(line, id_index) for line in lines}
+                rows = {k: line for k, line in rows.items() if CsvFields.field(line, id_index) not in ids}
+            for line in lines:
+                rows[key(line)] = line
+
+            ordered = sorted(rows.items(), key=lambda item: item[0] if by_symbol else item[0][1])
+            target = existing or base.with_name(base.name + DataFile.SUFFIXES[0])
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_name(f"{base.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                with open(tmp, 'w', encoding='utf-8', newline='') as f:
+                    f.write(header + '\n')
+                    for _, line in ordered:
+                        f.write(line + '\n')
+                if DataFile.is_compressed(target):
+                    DataFile.compress(tmp, target)
+                else:
+                    os.replace(tmp, target)
+            finally:
+                if tmp.exists():
+                    tmp.unlink()
+
+        if ZoneMap.ENABLED:
+            ZoneMap.build(target)
+        return target
+
+    @staticmethod
+    def _safe(name: str) -> bool:
+        """能否作为目录名或文件名"""
+        return bool(name) and name not in ('.', '..') and not any(c in name for c in '/\\:')
+
+    @staticmethod
+    def _lock_for(base: Path) -> threading.Lock:
+        """获取数据文件对应的锁(按路径哈希分片)"""
+        return KlineWriter._locks[zlib.crc32(str(base).encode('utf-8')) % len(KlineWriter._locks)]
@@ -0,0 +1,187 @@
+import os
+import bisect
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple, Union
+
+from vvtr_mcp_server.util.data_file import DataFile
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class Partition:
+    """
+    解析后的单个CSV文件：表头、按行切分的数据行及每行的字节偏移
+    """
+    __slots__ = ("header", "header_end", "lines", "offsets", "size")
+
+    def __init__(self, header: str, header_end: int, lines: Tuple[str, ...], offsets: array, size: int):
+        self.header = header
+        self.header_end = header_end
+        # 数据行(不含表头和换行符)，按文件中的顺序排列；多个调用方共享，使用不可变的元组
+        self.lines = lines
+        # 第 i 行的起始字节偏移，最后多记录一个文件末尾的偏移
+        self.offsets = offsets
+        self.size = size
+
+    def row_at_offset(self, offset: int) -> int:
+        """
+        获取字节偏移处的数据行号，offset 必须是某一行的起始位置或文件末尾
+        """
+        return bisect.bisect_left(self.offsets, offset, 0, len(self.lines))
+
+
+class PartitionCache:
+    """
+    进程内的文件内容LRU缓存。
+
+    按 (文件路径, 大小, 修改时间) 缓存解析后的文件内容(按行切分的数据行，或列式数据)，
+    翻页和重复查询同一个文件时直接使用内存中的数据。缓存总大小受 PARTITION_CACHE_BYTES 限制，
+    超出时淘汰最久未使用的文件；所有操作加锁，可以在并发的工具调用中使用。
+    只读取一页的调用方不会因为第一次访问而读取整个文件，同一文件(大小和修改时间不变)第二次访问时才放入缓存。
+    """
+    # 缓存的总字节数上限，设置为0则禁用缓存
+    BUDGET = int(os.environ.get("PARTITION_CACHE_BYTES", str(256 * 1024 * 1024)))
+    # 单个文件最多占用预算的比例(超过的文件直接从磁盘读取，不进入缓存)
+    MAX_SHARE = 8
+    # 每行除文本本身之外的估计开销(字符串对象头、列表指针、偏移)
+    ROW_OVERHEAD = 64
+    # 记录访问过一次但未放入缓存的文件数上限
+    MAX_TOUCHED = 4096
+
+    _entries: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+    _touched: "OrderedDict[Tuple[str, str], Tuple[int, int]]" = OrderedDict()
+    _lock = threading.Lock()
+    _bytes = 0
+    _hits = 0
+    _misses = 0
+    _evictions = 0
+
+    @staticmethod
+    def get(path: Union[str, Path], kind: str,
+            loader: Callable[[Path, os.stat_result], Tuple[Any, int]], repeat: bool = False) -> Any:
+        """
+        获取缓存的文件内容，不存在或文件已变化时调用 loader 解析后放入缓存
+
+        Args:
+            path: 文件路径
+            kind: 内容类型,eg:rows,columnar
+            loader: 解析函数，参数为(文件路径, stat结果)，返回(内容, 估计占用的字节数)
+            repeat: 为True时第一次访问只记录下来并返回None，同一文件再次访问时才调用 loader
+        Returns:
+            文件内容，loader 返回None或 repeat 时第一次访问返回None
+        """
+        stat = os.stat(path)
+        key = (kind, str(path))
+
+        with PartitionCache._lock:
+            entry = PartitionCache._entries.get(key)
+            if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                PartitionCache._entries.move_to_end(key)
+                PartitionCache._hits += 1
+                return entry[2]
+            PartitionCache._misses += 1
+            if repeat and PartitionCache._touched.pop(key, None) != (stat.st_size, stat.st_mtime_ns):
+                PartitionCache._touched[key] = (stat.st_size, stat.st_mtime_ns)
+                while len(PartitionCache._touched) > PartitionCache.MAX_TOUCHED:
+                    PartitionCache._touched.popitem(last=False)
+                return None
+
+        value, nbytes = loader(Path(path), stat)
+        if value is None or nbytes > PartitionCache.BUDGET // PartitionCache.MAX_SHARE:
+            return value
+
+        with PartitionCache._lock:
+            previous = PartitionCache._entries.pop(key, None)
+            if previous:
+                PartitionCache._bytes -= previous[3]
+            PartitionCache._entries[key] = (stat.st_size, stat.st_mtime_ns, value, nbytes)
+            PartitionCache._bytes += nbytes
+            while PartitionCache._bytes > PartitionCache.BUDGET and PartitionCache._entries:
+                _, evicted = PartitionCache._entries.popitem(last=False)
+                PartitionCache._bytes -= evicted[3]
+                PartitionCache._evictions += 1
+        return value
+
+    @staticmethod
+    def rows(path: Union[str, Path], full: bool = False) -> Optional[Partition]:
+        """
+        获取按行切分的文件内容
+
+        Args:
+            path: CSV文件路径
+            full: 调用方要读取整个文件时为True，第一次访问就解析并放入缓存；
+                  为False时(如只读取一页)第一次访问返回None，再次访问同一文件时才读取整个文件
+        Returns:
+            文件内容，缓存已禁用、文件超过单个文件的上限或第一次按页访问时返回None(由调用方从磁盘读取)
+        """
+        if not PartitionCache.enabled():
+            return None
+        if DataFile.size(path) > PartitionCache.BUDGET // PartitionCache.MAX_SHARE:
+            return None
+        return PartitionCache.get(path, "rows", PartitionCache._load_rows, repeat=not full)
+
+    @staticmethod
+    def enabled() -> bool:
+        """是否启用缓存"""
+        return PartitionCache.BUDGET > 0
+
+    @staticmethod
+    def stats() -> dict:
+        """
+        获取缓存的统计信息
+
+        Returns:
+            字典：entries(缓存的文件数), bytes(估计占用的字节数), budget(字节上限),
+            hits(命中次数), misses(未命中次数), evictions(淘汰次数)
+        """
+        with PartitionCache._lock:
+            return {
+                "entries": len(PartitionCache._entries),
+                "bytes": PartitionCache._bytes,
+                "budget": PartitionCache.BUDGET,
+                "hits": PartitionCache._hits,
+                "misses": PartitionCache._misses,
+                "evictions": PartitionCache._evictions,
+            }
+
+    @staticmethod
+    def clear() -> None:
+        """清空缓存"""
+        with PartitionCache._lock:
+            PartitionCache._entries.clear()
+            PartitionCache._touched.clear()
+            PartitionCache._bytes = 0
+
+    @staticmethod
+    def _load_rows(path: Path, stat: os.stat_result) -> Tuple[Partition, int]:
+        """
+        读取整个文件并按行切分
+        """
+        with DataFile.open(path) as f:
+            data = f.read()
+
+        header_end = data.find(b'\n') + 1 if b'\n' in data else len(data)
+        header = data[:header_end].decode('utf-8').rstrip('\r\n')
+        body = data[header_end:]
+
+        raws = body.split(b'\n')
+        if raws and raws[-1] == b'':
+            raws.pop()
+        lines = []
+        offsets = array('q', [header_end])
+        offset = header_end
+        for raw in raws:
+            offset += len(raw) + 1
+            lines.append(raw.decode('utf-8').rstrip('\r'))
+            offsets.append(offset)
+        # 最后一行没有换行符时偏移不超过文件末尾
+        offsets[-1] = min(offsets[-1], len(data))
+
+        nbytes = len(data) + len(lines) * PartitionCache.ROW_OVERHEAD
+        return Partition(header, header_end, tuple(lines), offsets, len(data)), nbytes
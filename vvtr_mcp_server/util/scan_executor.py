@@ -0,0 +1,100 @@
+import os
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class ScanExecutor:
+    """
+    多文件扫描的并行执行器。
+
+    把每个文件的读取和过滤交给共享的线程池或进程池，结果仍按输入顺序逐个返回，
+    调用方可以像顺序读取一样合并结果，中途停止时未开始的任务会被取消。
+    同时提交的任务数有上限，已完成但还没有被取用的结果最多只有这么多个，内存占用不随文件数增长。
+
+    线程池适合I/O、解压和NumPy过滤为主的工作；逐行解析的文本文件受GIL限制，
+    可以设置 SCAN_POOL=process 改用进程池(任务函数和参数需要能被pickle)。
+    """
+    # 并行的线程数或进程数，设置为1则顺序执行
+    WORKERS = int(os.environ.get("SCAN_WORKERS", str(min(8, os.cpu_count() or 1))))
+    # 线程池(thread)或进程池(process)
+    POOL = os.environ.get("SCAN_POOL", "thread")
+    # 同时提交的任务数上限，默认为并行数的2倍
+    IN_FLIGHT = int(os.environ.get("SCAN_IN_FLIGHT", "0")) or max(1, WORKERS * 2)
+
+    _executor: Optional[Executor] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def map(fn: Callable[[T], R], items: Iterable[T], ramp: bool = False) -> Iterator[R]:
+        """
+        并行执行 fn，按 items 的顺序产生结果
+
+        Args:
+            fn: 单个文件的任务函数，异常会在取到对应结果时抛出
+            items: 任务参数
+            ramp: 为True时先只提交一个任务，每取走一个结果后提交数翻倍直到上限，
+                  用于分页读取这类通常只需要前几个文件的场景，避免预读用不到的文件
+        Returns:
+            按顺序产生的结果
+        """
+        items = list(items)
+        if ScanExecutor.WORKERS <= 1 or len(items) <= 1:
+            for item in items:
+                yield fn(item)
+            return
+
+        executor = ScanExecutor.executor()
+        window = 1 if ramp else ScanExecutor.IN_FLIGHT
+        pending = deque()
+        index = 0
+        try:
+            while index < len(items) or pending:
+                while index < len(items) and len(pending) < window:
+                    pending.append(executor.submit(fn, items[index]))
+                    index += 1
+                result = pending.popleft().result()
+                window = min(window * 2, ScanExecutor.IN_FLIGHT)
+                yield result
+        finally:
+            # 调用方提前结束时取消还没开始的任务
+            for future in pending:
+                future.cancel()
+
+    @staticmethod
+    def submit(fn: Callable[[T], R], item: T) -> Future:
+        """
+        提交单个任务，用于调用方自己控制预读顺序和数量的场景
+
+        Args:
+            fn: 单个文件的任务函数
+            item: 任务参数
+        Returns:
+            任务的 Future，调用方不再需要结果时应取消
+        """
+        return ScanExecutor.executor().submit(fn, item)
+
+    @staticmethod
+    def executor() -> Executor:
+        """获取共享的线程池或进程池，第一次使用时创建"""
+        with ScanExecutor._lock:
+            if ScanExecutor._executor is None:
+                if ScanExecutor.POOL == "process":
+                    # 服务进程中有其他线程，使用spawn避免fork时复制锁的状态
+                    ScanExecutor._executor = ProcessPoolExecutor(
+                        max_workers=ScanExecutor.WORKERS, mp_context=multiprocessing.get_context("spawn"))
+                else:
+                    ScanExecutor._executor = ThreadPoolExecutor(max_workers=ScanExecutor.WORKERS,
+                                                                thread_name_prefix="vvtr-scan")
+                logger.info(f"扫描执行器: {ScanExecutor.POOL} x {ScanExecutor.WORKERS}")
+            return ScanExecutor._executor
@@ -0,0 +1,108 @@
+import os
+import threading
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Optional, Union
+
+from vvtr_mcp_server.util.csv_merger import CsvMerger
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class Sidecar:
+    """
+    数据文件的索引附属文件(sidecar)。
+
+    附属文件按数据文件相对 API_DATA_PATH 的路径镜像存放在 INDEX_PATH 下，
+    内容中记录生成时数据文件的大小和修改时间，数据文件变化后自动失效。
+    """
+    # 索引文件所在目录，默认放在数据目录下的隐藏目录中
+    ROOT = os.environ.get("INDEX_PATH", os.path.join(CsvMerger.ROOT, ".vvtr_index"))
+
+    @staticmethod
+    def path_for(data_path: Union[str, Path], suffix: str) -> Path:
+        """
+        获取数据文件对应的附属文件路径
+
+        Args:
+            data_path: 数据文件路径
+            suffix: 附属文件后缀,eg:.zone.json
+        Returns:
+            附属文件路径
+        """
+        data_path = Path(data_path).absolute()
+        try:
+            relative = data_path.relative_to(Path(CsvMerger.ROOT).absolute())
+            return Path(Sidecar.ROOT) / relative.parent / (relative.name + suffix)
+        except ValueError:
+            # 不在数据目录下的文件按绝对路径的哈希存放
+            digest = hashlib.sha1(str(data_path).encode("utf-8")).hexdigest()
+            return Path(Sidecar.ROOT) / "_external" / digest[:2] / (digest + "_" + data_path.name + suffix)
+
+    @staticmethod
+    def load(data_path: Union[str, Path], suffix: str, stat: os.stat_result) -> Optional[dict]:
+        """
+        读取附属文件，数据文件的大小或修改时间与记录不一致时返回None
+
+        Args:
+            data_path: 数据文件路径
+            suffix: 附属文件后缀
+            stat: 数据文件当前的stat结果
+        Returns:
+            附属文件内容，不存在或已失效时返回None
+        """
+        payload = Sidecar.read(data_path, suffix)
+        if payload is None:
+            return None
+
+        if payload.get("size") != stat.st_size or payload.get("mtime_ns") != stat.st_mtime_ns:
+            return None
+        return payload
+
+    @staticmethod
+    def read(data_path: Union[str, Path], suffix: str) -> Optional[dict]:
+        """
+        读取附属文件，不校验数据文件是否变化(用于增量更新)
+
+        Args:
+            data_path: 数据文件路径
+            suffix: 附属文件后缀
+        Returns:
+            附属文件内容，不存在或无法解析时返回None
+        """
+        try:
+            with open(Sidecar.path_for(data_path, suffix), 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return payload if isinstance(payload, dict) else None
+
+    @staticmethod
+    def save(data_path: Union[str, Path], suffix: str, stat: os.stat_result, payload: dict) -> None:
+        """
+        原子地写入附属文件，写入失败(如只读目录)时只记录日志
+
+        Args:
+            data_path: 数据文件路径
+            suffix: 附属文件后缀
+            stat: 生成内容时数据文件的stat结果
+            payload: 附属文件内容
+        """
+        target = Sidecar.path_for(data_path, suffix)
+        payload = dict(payload, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        tmp = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, separators=(',', ':'))
+            os.replace(tmp, target)
+        except OSError as e:
+            logger.warning(f"写入索引文件失败: {target} - {str(e)}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
@@ -0,0 +1,356 @@
+import os
+import sys
+import json
+import shutil
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from vvtr_mcp_server.util.csv_merger import CsvMerger
+from vvtr_mcp_server.util.csv_schema import CsvSchema
+from vvtr_mcp_server.util.data_file import DataFile
+from vvtr_mcp_server.util.sidecar import Sidecar
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class SymbolStore:
+    """
+    按symbol合并的日线数据。
+
+    日线文件按日期存放，每个文件包含当天所有symbol的数据，查询单个symbol的长期历史需要读取所有日期的文件。
+    这里把同一个 1d 目录下的数据按symbol拆分到 <INDEX_PATH>/<type>/1d.symbols/<symbol>.csv，
+    每行前加上来源文件的日期(yyyyMMdd)，单个symbol的历史只需顺序读取一个文件。
+    manifest.json 记录已合并的日线文件的大小和修改时间，查询时只做增量更新：新增了更晚日期的文件时追加，
+    最后一天的文件有变化(如写入了远程获取的K线)时截断到这一天之前再重新合并这一天；
+    其他变化(更早的文件有变化、新增了更早日期的文件)以及第一次生成交给后台线程完整重新生成，
+    在这之前没有合并或已经变化的日期由调用方直接读取日线文件。
+    日线文件表头不一致或缺少symbol列时在 manifest 中记录为不可用，不再反复尝试，修复后用命令行重新生成。
+    """
+    # 设置为0则禁用按symbol合并的日线数据
+    ENABLED = os.environ.get("SYMBOL_STORE", "1") != "0"
+    # 设置为0则不在后台生成，只能用命令行生成(见文件末尾)
+    BACKGROUND = os.environ.get("SYMBOL_STORE_BACKGROUND", "1") != "0"
+    # 附属目录后缀
+    SUFFIX = ".symbols"
+    MANIFEST = "manifest.json"
+    # 写入前缓存的最大字节数
+    FLUSH_BYTES = 64 * 1024 * 1024
+
+    _locks: Dict[str, threading.Lock] = {}
+    _locks_lock = threading.Lock()
+    _pending: set = set()
+    _background: Optional[ThreadPoolExecutor] = None
+
+    @staticmethod
+    def select(paths: List[Path], symbol: str) -> Optional[Tuple[str, List[Optional[List[str]]]]]:
+        """
+        取出指定日线文件中某个symbol的数据行
+
+        Args:
+            paths: 日线文件路径列表(同一个 1d 目录下，按日期升序)
+            symbol: 种类代码
+        Returns:
+            (表头, 与 paths 一一对应的数据行列表)，某个文件没有合并或合并后有变化时对应位置为None(由调用方读取该文件)；
+            合并数据不可用时返回None(由调用方逐个读取日线文件)
+        """
+        if not SymbolStore.ENABLED or not symbol or not paths:
+            return None
+
+        day_root = SymbolStore._day_root(paths)
+        if day_root is None:
+            return None
+
+        try:
+            directory = Sidecar.path_for(day_root, SymbolStore.SUFFIX)
+            with SymbolStore._lock_for(directory):
+                manifest = SymbolStore._load_manifest(directory)
+                if manifest is None:
+                    SymbolStore._schedule(day_root)
+                    return None
+                fresh = SymbolStore._fresh_days(manifest, paths)
+                if len(fresh) < len(paths) and not manifest.get("disabled"):
+                    manifest = SymbolStore.refresh(day_root, directory, manifest)
+                    fresh = SymbolStore._fresh_days(manifest, paths)
+                if manifest.get("disabled") or not fresh:
+                    return None
+
+                lines: Dict[str, List[str]] = {}
+                try:
+                    with open(directory / SymbolStore._file_name(symbol), 'r', encoding='utf-8') as f:
+                        for raw in f:
+                            day, _, line = raw.rstrip('\r\n').partition(',')
+                            if day in fresh:
+                                lines.setdefault(day, []).append(line)
+                except FileNotFoundError:
+                    pass
+                days = [DataFile.stem(path) for path in paths]
+                return manifest["header"], [lines.get(day, []) if day in fresh else None for day in days]
+        except (OSError, ValueError) as e:
+            logger.warning(f"按symbol合并的日线数据不可用: {day_root} - {str(e)}")
+            return None
+
+    @staticmethod
+    def refresh(day_root: Path, directory: Path, manifest: dict) -> dict:
+        """
+        增量更新合并数据(调用方持有目录的锁)：追加更晚日期的文件，最后一天的文件有变化时只重新合并这一天，
+        其他变化交给后台完整重新生成
+
+        Args:
+            day_root: 日线目录,eg:<API_DATA_PATH>/11/1d
+            directory: 合并数据所在目录
+            manifest: 当前的 manifest
+        Returns:
+            更新后的 manifest
+        """
+        current = SymbolStore._day_files(day_root)
+        files = manifest["files"]
+        last = max(files, default="")
+        changed = [day for day, entry in files.items() if current.get(day, (None, None))[1] != entry]
+        days = [day for day in sorted(current) if day not in files and day > last]
+        rebuild = any(day not in files and day < last for day in current)
+
+        tail = manifest.get("tail")
+        if changed == [last] and last in current and tail and tail.get("day") == last:
+            # 只有最后一天的文件有变化：恢复到合并这一天之前的大小，重新合并这一天
+            del files[last]
+            manifest["sizes"] = dict(tail["sizes"])
+            days.insert(0, last)
+        elif changed:
+            rebuild = True
+
+        if days:
+            SymbolStore._truncate(directory, manifest)
+            SymbolStore._append(directory, manifest, current, days)
+            SymbolStore._save_manifest(directory, manifest)
+        if rebuild:
+            logger.info(f"日线文件有变化，在后台重新生成按symbol合并的数据: {day_root}")
+            SymbolStore._schedule(day_root)
+        return manifest
+
+    @staticmethod
+    def rebuild(day_root: Path) -> dict:
+        """
+        完整重新生成合并数据(后台线程或命令行中调用)：先写入临时目录，完成后替换原目录，生成期间查询不受影响
+
+        Args:
+            day_root: 日线目录,eg:<API_DATA_PATH>/11/1d
+        Returns:
+            新的 manifest，日线文件无法合并时 disabled 为原因
+        """
+        directory = Sidecar.path_for(day_root, SymbolStore.SUFFIX)
+        building = directory.with_name(f"{directory.name}.{os.getpid()}.{threading.get_ident()}.build")
+        shutil.rmtree(building, ignore_errors=True)
+        building.mkdir(parents=True)
+        try:
+            manifest = {"header": None, "files": {}, "sizes": {}}
+            current = SymbolStore._day_files(day_root)
+            SymbolStore._append(building, manifest, current, sorted(current))
+            SymbolStore._save_manifest(building, manifest)
+
+            with SymbolStore._lock_for(directory):
+                retired = directory.with_name(building.name + ".old")
+                if directory.exists():
+                    os.replace(directory, retired)
+                os.replace(building, directory)
+            shutil.rmtree(retired, ignore_errors=True)
+            return manifest
+        finally:
+            shutil.rmtree(building, ignore_errors=True)
+
+    @staticmethod
+    def _append(directory: Path, manifest: dict, current: Dict[str, Tuple[Path, List[int]]],
+                days: List[str]) -> None:
+        """
+        把日线文件的数据按symbol追加到合并数据中，表头不一致或缺少symbol列时在 manifest 中记录为不可用；
+        合并最后一天之前记录各文件的大小，这一天的文件变化时可以只重新合并这一天
+        """
+        buffers: Dict[str, List[str]] = {}
+        buffered = 0
+        for day in days:
+            path, entry = current[day]
+            header = CsvSchema.header(path)
+            symbol_index = CsvSchema.index(path, "symbol")
+            if manifest["header"] is not None and header != manifest["header"]:
+                manifest["disabled"] = f"日线文件表头不一致: {path}"
+            elif symbol_index < 0:
+                manifest["disabled"] = f"日线文件缺少symbol列: {path}"
+            if manifest.get("disabled"):
+                logger.warning(f"{manifest['disabled']}，不再使用按symbol合并的数据，"
+                               f"修复后运行 python -m vvtr_mcp_server.util.symbol_store 重新生成")
+                break
+            manifest["header"] = header
+
+            if day == days[-1]:
+                SymbolStore._flush(directory, buffers, manifest)
+                buffered = 0
+                manifest["tail"] = {"day": day, "sizes": dict(manifest["sizes"])}
+
+            with DataFile.open_text(path) as f:
+                f.readline()
+                for raw in f:
+                    line = raw.rstrip('\r\n')
+                    fields = line.split(',', symbol_index + 1)
+                    if not line.strip() or len(fields) <= symbol_index:
+                        continue
+                    buffers.setdefault(fields[symbol_index], []).append(f"{day},{line}\n")
+                    buffered += len(line) + 10
+
+            manifest["files"][day] = entry
+            if buffered > SymbolStore.FLUSH_BYTES:
+                SymbolStore._flush(directory, buffers, manifest)
+                buffered = 0
+
+        SymbolStore._flush(directory, buffers, manifest)
+
+    @staticmethod
+    def _truncate(directory: Path, manifest: dict) -> None:
+        """
+        截断到 manifest 记录的大小，丢弃上次中断时写了一半的数据和重新合并的那一天的数据
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        for entry in os.scandir(directory):
+            if entry.name == SymbolStore.MANIFEST or not entry.name.endswith(".csv"):
+                continue
+            size = manifest["sizes"].get(entry.name)
+            if size is None:
+                os.remove(entry.path)
+            elif entry.stat().st_size != size:
+                os.truncate(entry.path, size)
+
+    @staticmethod
+    def _flush(directory: Path, buffers: Dict[str, List[str]], manifest: dict) -> None:
+        """
+        把缓存的数据行追加到各symbol的文件中
+        """
+        for symbol, lines in buffers.items():
+            name = SymbolStore._file_name(symbol)
+            with open(directory / name, 'a', encoding='utf-8', newline='') as f:
+                f.writelines(lines)
+                manifest["sizes"][name] = f.tell()
+        buffers.clear()
+
+    @staticmethod
+    def _fresh_days(manifest: dict, paths: List[Path]) -> set:
+        """
+        查询的日线文件中已合并且没有变化的日期
+        """
+        fresh = set()
+        for path in paths:
+            day = DataFile.stem(path)
+            entry = manifest["files"].get(day)
+            if entry is not None:
+                stat = os.stat(path)
+                if entry == [stat.st_size, stat.st_mtime_ns]:
+                    fresh.add(day)
+        return fresh
+
+    @staticmethod
+    def _day_files(day_root: Path) -> Dict[str, Tuple[Path, List[int]]]:
+        """
+        日线目录下的所有日线文件：{日期: (路径, [大小, 修改时间])}
+        """
+        current = {}
+        for path in CsvMerger.find_csv_files_in_range(day_root, "00000000", "99999999"):
+            if SymbolStore._is_day_file(path) and DataFile.stem(path) not in current:
+                stat = os.stat(path)
+                current[DataFile.stem(path)] = (path, [stat.st_size, stat.st_mtime_ns])
+        return current
+
+    @staticmethod
+    def _day_root(paths: List[Path]) -> Optional[Path]:
+        """
+        获取日线文件所在的 1d 目录；文件不符合 1d/yyyyMM/yyyyMMdd/yyyyMMdd.csv 的结构、
+        不在同一个目录下或没有按日期升序排列时返回None
+        """
+        roots = set()
+        previous = ""
+        for path in paths:
+            path = Path(path)
+            if not SymbolStore._is_day_file(path) or DataFile.stem(path) <= previous:
+                return None
+            previous = DataFile.stem(path)
+            roots.add(path.parents[2])
+        return roots.pop() if len(roots) == 1 else None
+
+    @staticmethod
+    def _is_day_file(path: Path) -> bool:
+        """是否为 yyyyMM/yyyyMMdd/yyyyMMdd.csv(或压缩的 .csv.gz / .csv.zst) 形式的日线文件"""
+        stem = DataFile.stem(path)
+        return (len(path.parents) > 2 and len(stem) == 8 and stem.isdigit()
+                and path.parent.name == stem and path.parents[1].name == stem[:6])
+
+    @staticmethod
+    def _file_name(symbol: str) -> str:
+        """symbol对应的文件名，对路径中不能使用的字符做转义"""
+        return quote(symbol, safe='') + ".csv"
+
+    @staticmethod
+    def _schedule(day_root: Path) -> None:
+        """
+        在后台线程中完整重新生成合并数据，同一目录同时只提交一次
+        """
+        if not SymbolStore.BACKGROUND:
+            return
+        key = str(day_root)
+        with SymbolStore._locks_lock:
+            if key in SymbolStore._pending:
+                return
+            SymbolStore._pending.add(key)
+            if SymbolStore._background is None:
+                SymbolStore._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="symbol-store")
+            background = SymbolStore._background
+
+        def run() -> None:
+            try:
+                SymbolStore.rebuild(day_root)
+            except (OSError, ValueError) as e:
+                logger.warning(f"生成按symbol合并的日线数据失败: {day_root} - {str(e)}")
+            finally:
+                with SymbolStore._locks_lock:
+                    SymbolStore._pending.discard(key)
+
+        background.submit(run)
+
+    @staticmethod
+    def _lock_for(directory: Path) -> threading.Lock:
+        """获取合并数据目录对应的锁"""
+        with SymbolStore._locks_lock:
+            return SymbolStore._locks.setdefault(str(directory), threading.Lock())
+
+    @staticmethod
+    def _load_manifest(directory: Path) -> Optional[dict]:
+        """读取 manifest，不存在或无法解析时返回None"""
+        try:
+            with open(directory / SymbolStore.MANIFEST, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(manifest, dict) or not {"header", "files", "sizes"} <= manifest.keys():
+            return None
+        return manifest
+
+    @staticmethod
+    def _save_manifest(directory: Path, manifest: dict) -> None:
+        """原子地写入 manifest"""
+        tmp = directory / f"{SymbolStore.MANIFEST}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, separators=(',', ':'))
+        os.replace(tmp, directory / SymbolStore.MANIFEST)
+
+
+# 预先生成或在日线文件修复后重新生成：python -m vvtr_mcp_server.util.symbol_store <type>
+if __name__ == "__main__":
+    for type_name in sys.argv[1:] or sorted(os.listdir(CsvMerger.ROOT)):
+        root = Path(CsvMerger.ROOT) / type_name / "1d"
+        if root.is_dir():
+            result = SymbolStore.rebuild(root)
+            if result.get("disabled"):
+                print(f"{root}: 无法合并 - {result['disabled']}")
+            else:
+                print(f"{root}: 已合并 {len(result['files'])} 个日线文件, {len(result['sizes'])} 个symbol")
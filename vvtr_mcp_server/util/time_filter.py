@@ -0,0 +1,69 @@
+from datetime import datetime
+from typing import Optional
+
+
+class TimeFilter:
+    """
+    基于定长字符串的时间过滤。
+
+    数据中的时间字段为定长的 yyyy-MM-dd HH:mm:ss(可带 +0800 等时区后缀)，
+    按字符串比较与按时间比较结果一致，因此只需截取前缀比较，不必逐行调用 strptime。
+    格式不规整的值回退到 strptime，解析失败的结果与原来逐行解析时一致。
+    """
+    TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+    DATE_FORMAT = "%Y-%m-%d"
+
+    @staticmethod
+    def time_key(value: str) -> Optional[str]:
+        """
+        把时间字段转为 yyyy-MM-dd HH:mm:ss 比较键，去掉 '+' 之后的时区后缀
+
+        Args:
+            value: 时间字段,eg:2025-04-28 09:15:00+0800
+        Returns:
+            比较键，无法解析时返回None
+        """
+        if (len(value) >= 19 and (len(value) == 19 or value[19] == '+')
+                and value[4] == '-' and value[7] == '-' and value[10] == ' '
+                and value[13] == ':' and value[16] == ':'
+                and (value[0:4] + value[5:7] + value[8:10] + value[11:13] + value[14:16] + value[17:19]).isdigit()):
+            return value[:19]
+
+        try:
+            return datetime.strptime(value.split('+')[0], TimeFilter.TIME_FORMAT).strftime(TimeFilter.TIME_FORMAT)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def date_key(value: str) -> Optional[str]:
+        """
+        把时间字段转为 yyyy-MM-dd 比较键，取第一个空格之前的部分
+
+        Args:
+            value: 时间字段,eg:2025-04-28 00:00:00+0800
+        Returns:
+            比较键，无法解析时返回None
+        """
+        if (len(value) >= 10 and (len(value) == 10 or value[10] == ' ')
+                and value[4] == '-' and value[7] == '-'
+                and (value[0:4] + value[5:7] + value[8:10]).isdigit()):
+            return value[:10]
+
+        try:
+            return datetime.strptime(value.split(' ')[0], TimeFilter.DATE_FORMAT).strftime(TimeFilter.DATE_FORMAT)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def to_time_key(moment: Optional[datetime]) -> Optional[str]:
+        """
+        把查询条件中的时间转为比较键
+        """
+        return moment.strftime(TimeFilter.TIME_FORMAT) if moment else None
+
+    @staticmethod
+    def to_date_key(moment) -> Optional[str]:
+        """
+        把查询条件中的日期转为比较键
+        """
+        return moment.strftime(TimeFilter.DATE_FORMAT) if moment else None
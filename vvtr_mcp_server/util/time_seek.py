@@ -0,0 +1,151 @@
+import logging
+from pathlib import Path
+from typing import Iterator, Optional
+
+from vvtr_mcp_server.util.data_file import DataFile
+from vvtr_mcp_server.util.time_filter import TimeFilter
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class TimeSeek:
+    """
+    在按时间排序的CSV文件中按字节偏移二分查找时间位置。
+
+    分钟和tick文件内的数据按时间升序排列，查询时先二分定位到第一条不早于开始时间的数据，
+    再顺序读取到第一条晚于结束时间的数据为止，只读取匹配的片段。
+    """
+    # 剩余区间小于该字节数时改为顺序查找
+    LINEAR_BYTES = 64 * 1024
+
+    @staticmethod
+    def seek(path: Path, time_index: int, target: str, after: bool = False) -> int:
+        """
+        查找第一条时间字段不早于 target 的数据行
+
+        Args:
+            path: CSV文件路径
+            time_index: 用于查找的时间字段索引
+            target: 目标时间的比较键(yyyy-MM-dd HH:mm:ss)
+            after: 为True时查找第一条晚于 target 的数据行
+        Returns:
+            该行的字节偏移，没有满足条件的行时返回文件末尾的偏移
+        """
+        size = DataFile.size(path)
+        with DataFile.open(path) as f:
+            # lo 始终是某一行的起始位置，答案不早于 lo；hi 之前的区间内没有答案时，
+            # 答案是 hi 之后第一条能解析时间的数据行(最后的顺序查找会读过无法解析的行)
+            lo = len(f.readline())
+            hi = size
+
+            while hi - lo > TimeSeek.LINEAR_BYTES:
+                mid = (lo + hi) // 2
+                f.seek(mid)
+                f.readline()  # 跳过不完整的行
+                position = f.tell()
+                if position >= hi:
+                    break
+
+                # 无法解析时间的行不能判断先后，向后找到第一条能解析的行再比较
+                line_start = position
+                line = f.readline()
+                record_time = TimeSeek.parse_time(line, time_index)
+                while record_time is None and line and line_start + len(line) < hi:
+                    line_start += len(line)
+                    line = f.readline()
+                    record_time = TimeSeek.parse_time(line, time_index)
+                if record_time is not None and (record_time < target or (after and record_time == target)):
+                    lo = line_start + len(line)
+                else:
+                    # position 到这一行之间都无法解析，不会是答案
+                    hi = position
+
+            # 在剩余区间内顺序查找
+            f.seek(lo)
+            offset = lo
+            for line in f:
+                record_time = TimeSeek.parse_time(line, time_index)
+                if record_time is not None and (record_time > target or (not after and record_time == target)):
+                    return offset
+                offset += len(line)
+            return offset
+
+    @staticmethod
+    def line_before(path: Path, offset: int) -> Optional[str]:
+        """
+        读取在 offset 处结束的数据行(offset 必须是某一行的起始位置或文件末尾)
+
+        Args:
+            path: CSV文件路径
+            offset: 字节偏移
+        Returns:
+            去掉换行符的数据行，offset 之前没有数据行时返回None
+        """
+        with DataFile.open(path) as f:
+            start = len(f.readline())
+            end = min(offset, DataFile.size(path))
+            if end <= start:
+                return None
+
+            # 从 offset 向前按块读取，直到找到上一行的开头
+            size = 4096
+            while True:
+                begin = max(start, end - size)
+                f.seek(begin)
+                chunk = f.read(end - begin)
+                newline = chunk.rstrip(b'\n').rfind(b'\n')
+                if newline >= 0 or begin == start:
+                    return chunk[newline + 1:].decode('utf-8').rstrip('\r\n')
+                size *= 2
+
+    @staticmethod
+    def header_end(path: Path) -> int:
+        """
+        获取第一行数据的字节偏移(表头之后)
+        """
+        with DataFile.open(path) as f:
+            return len(f.readline())
+
+    @staticmethod
+    def read_lines(path: Path, offset: int, time_index: int,
+                   end_time: Optional[str]) -> Iterator[str]:
+        """
+        从指定偏移开始逐行读取，遇到第一条时间字段晚于 end_time 的数据时停止
+
+        Args:
+            path: CSV文件路径
+            offset: 开始读取的字节偏移
+            time_index: 用于判断结束的时间字段索引
+            end_time: 结束时间的比较键，为None时读到文件末尾
+        Returns:
+            去掉换行符的数据行
+        """
+        with DataFile.open(path) as f:
+            f.seek(offset)
+            for raw in f:
+                if end_time is not None:
+                    record_time = TimeSeek.parse_time(raw, time_index)
+                    if record_time is not None and record_time > end_time:
+                        return
+                yield raw.decode('utf-8').rstrip('\r\n')
+
+    @staticmethod
+    def parse_time(raw: bytes, time_index: int) -> Optional[str]:
+        """
+        取出一行中的时间字段并转为比较键，格式为 yyyy-MM-dd HH:mm:ss，可带时区后缀(+0800)
+
+        Args:
+            raw: 原始行
+            time_index: 时间字段索引
+        Returns:
+            时间比较键，解析失败时返回None
+        """
+        fields = raw.split(b',', time_index + 1)
+        if time_index < 0 or len(fields) <= time_index:
+            return None
+        try:
+            return TimeFilter.time_key(fields[time_index].decode('utf-8').strip().strip('"'))
+        except UnicodeDecodeError:
+            return None
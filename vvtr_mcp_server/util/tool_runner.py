@@ -0,0 +1,95 @@
+import os
+import asyncio
+import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class ToolRunner:
+    """
+    在线程池中执行工具中的阻塞操作(读取本地文件)，事件循环只负责调度。
+
+    线程池大小就是使用该线程池的工具同时执行的上限，远程查询使用异步HTTP客户端，
+    不占用线程池，耗时的本地文件扫描占满线程池时仍然可以执行。
+    单个工具还可以设置同时执行的上限和超时时间。
+    """
+    # 各线程池的线程数
+    POOLS = {
+        "local": int(os.environ.get("LOCAL_TOOL_WORKERS", str(min(32, (os.cpu_count() or 1) + 4)))),
+    }
+    # 工具执行的超时秒数，设置为0则不限制(超时后返回错误，已开始的操作在后台执行完)
+    TIMEOUT = float(os.environ.get("TOOL_TIMEOUT", "300"))
+    # 读取大量文件做服务端计算的工具同时执行的上限
+    HEAVY_LIMIT = int(os.environ.get("HEAVY_TOOL_CONCURRENCY", "2"))
+
+    _executors: Dict[str, ThreadPoolExecutor] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def offload(pool: str = "local", limit: int = 0,
+                timeout: Optional[float] = None) -> Callable[[Callable[..., Any]], Callable[..., Awaitable[Any]]]:
+        """
+        把同步函数包装为在线程池中执行的异步函数，保留函数名、文档和参数签名(供 mcp.tool 解析)
+
+        Args:
+            pool: 线程池名称，见 POOLS
+            limit: 该函数同时执行的上限，为0时只受线程池大小限制
+            timeout: 超时秒数，为None时使用 TIMEOUT
+        Returns:
+            装饰器
+        """
+        if pool not in ToolRunner.POOLS:
+            raise ValueError(f"线程池名称错误，可选: {','.join(ToolRunner.POOLS)}")
+
+        def decorator(fn: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+            semaphore = asyncio.Semaphore(limit) if limit > 0 else None
+
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                if semaphore is None:
+                    return await ToolRunner.run(pool, fn, *args, timeout=timeout, **kwargs)
+                async with semaphore:
+                    return await ToolRunner.run(pool, fn, *args, timeout=timeout, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    @staticmethod
+    async def run(pool: str, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        在线程池中执行函数并等待结果
+
+        Args:
+            pool: 线程池名称
+            fn: 同步函数
+            timeout: 超时秒数，为None时使用 TIMEOUT
+        Returns:
+            函数的返回值
+        Raises:
+            TimeoutError: 执行超时
+        """
+        timeout = ToolRunner.TIMEOUT if timeout is None else timeout
+        future = asyncio.get_running_loop().run_in_executor(ToolRunner.executor(pool),
+                                                            functools.partial(fn, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, timeout) if timeout > 0 else await future
+        except asyncio.TimeoutError:
+            logger.warning(f"{fn.__name__} 执行超过 {timeout} 秒")
+            raise TimeoutError(f"{fn.__name__} 执行超时({timeout}秒)，请缩小查询范围后重试")
+
+    @staticmethod
+    def executor(pool: str) -> ThreadPoolExecutor:
+        """获取线程池，第一次使用时创建"""
+        with ToolRunner._lock:
+            executor = ToolRunner._executors.get(pool)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=ToolRunner.POOLS[pool], thread_name_prefix=f"vvtr-{pool}")
+                ToolRunner._executors[pool] = executor
+            return executor
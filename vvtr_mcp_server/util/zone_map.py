@@ -0,0 +1,341 @@
+import os
+import sys
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+
+from vvtr_mcp_server.util.csv_fields import CsvFields
+from vvtr_mcp_server.util.csv_merger import CsvMerger
+from vvtr_mcp_server.util.csv_schema import CsvSchema
+from vvtr_mcp_server.util.data_file import DataFile
+from vvtr_mcp_server.util.partition_cache import PartitionCache
+from vvtr_mcp_server.util.sidecar import Sidecar
+from vvtr_mcp_server.util.time_filter import TimeFilter
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class ZoneMap:
+    """
+    CSV文件的 zone map(最小/最大值统计)。
+
+    每个文件记录：数据行数、bob 的最小值和 eob 的最大值(时间和日期两种比较键)、
+    created_at 的最小/最大值及无法解析的行数、出现过的symbol(数量较多时改为布隆过滤器)。
+    查询前根据这些统计判断文件中是否可能有匹配的数据，没有时不打开文件。
+    判断是保守的：只有按对应查询接口的过滤条件一定没有匹配行时才跳过，附属文件不存在时不跳过。
+    查询时不同步生成：附属文件不存在时交给后台线程生成，也可以用命令行预先生成(见文件末尾)。
+    """
+    # 设置为0则不生成也不使用 zone map
+    ENABLED = os.environ.get("ZONE_MAP", "1") != "0"
+    # 附属文件后缀
+    SUFFIX = ".zone.json"
+    # symbol数量不超过该值时直接记录列表，否则记录布隆过滤器
+    SYMBOL_LIMIT = 64
+    # 布隆过滤器每个symbol占用的位数和哈希函数个数(误判率约1%)
+    BLOOM_BITS = 10
+    BLOOM_HASHES = 7
+    # 进程内缓存的 zone map 数量
+    MAX_CACHED = 4096
+    # 设置为0则查询时不在后台生成缺少的 zone map
+    BACKGROUND = os.environ.get("ZONE_MAP_BACKGROUND", "1") != "0"
+
+    _cache: "OrderedDict[str, dict]" = OrderedDict()
+    _lock = threading.Lock()
+    _checked = 0
+    _pruned = 0
+    _built = 0
+    _pending: set = set()
+    _background: Optional[ThreadPoolExecutor] = None
+
+    @staticmethod
+    def load(path: Union[str, Path], build: bool = True) -> Optional[dict]:
+        """
+        获取文件的 zone map
+
+        Args:
+            path: CSV文件路径
+            build: 附属文件不存在或已失效时是否读取文件生成，为False时交给后台线程生成
+        Returns:
+            zone map 字典，未启用、不存在且不生成或文件无法读取时返回None
+        """
+        if not ZoneMap.ENABLED:
+            return None
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = str(path)
+
+        with ZoneMap._lock:
+            zone = ZoneMap._cache.get(key)
+        if zone is None or zone.get("size") != stat.st_size or zone.get("mtime_ns") != stat.st_mtime_ns:
+            zone = Sidecar.load(path, ZoneMap.SUFFIX, stat)
+            if zone is None:
+                if not build:
+                    ZoneMap._schedule(path)
+                    return None
+                try:
+                    zone = ZoneMap.build(path, stat)
+                except (OSError, UnicodeDecodeError) as e:
+                    logger.warning(f"生成zone map失败: {path} - {str(e)}")
+                    return None
+
+        with ZoneMap._lock:
+            ZoneMap._cache[key] = zone
+            ZoneMap._cache.move_to_end(key)
+            while len(ZoneMap._cache) > ZoneMap.MAX_CACHED:
+                ZoneMap._cache.popitem(last=False)
+        return zone
+
+    @staticmethod
+    def build(path: Union[str, Path], stat: Optional[os.stat_result] = None) -> dict:
+        """
+        读取整个文件生成 zone map 并写入附属文件(写入数据文件后、后台线程或命令行中调用)
+
+        Args:
+            path: CSV文件路径
+            stat: 数据文件的stat结果，为None时重新获取
+        Returns:
+            zone map 字典
+        """
+        stat = stat or os.stat(path)
+        columns = CsvSchema.load(path)["columns"]
+        bob_index = columns.get("bob", -1)
+        created_index = columns.get("created_at", -1)
+        symbol_index = columns.get("symbol", -1)
+
+        rows = 0
+        unparsed = 0
+        bob = [None, None]
+        days = [None, None]
+        created = [None, None]
+        symbols = set()
+        for line in ZoneMap._lines(path):
+            if not line.strip():
+                continue
+            rows += 1
+            # 查询按逗号切分，行数统计按CSV规则切分，含引号的行两种切分结果都计入
+            variants = [line.split(',')]
+            if '"' in line:
+                variants.append(CsvFields.parse_line(line))
+            for single in variants:
+                if 0 <= symbol_index < len(single):
+                    symbols.add(single[symbol_index])
+                if 0 <= bob_index < len(single) - 1:
+                    begin = ZoneMap._time_key(single[bob_index])
+                    end = ZoneMap._time_key(single[bob_index + 1])
+                    ZoneMap._extend(bob, begin, end)
+                    ZoneMap._extend(days, begin and begin[:10], end and end[:10])
+            if created_index >= 0:
+                field = CsvFields.field(line, created_index)
+                if field is not None:
+                    key = TimeFilter.time_key(field)
+                    if key is None:
+                        unparsed += 1
+                    ZoneMap._extend(created, key, key)
+
+        zone = {
+            "rows": rows,
+            "bob": bob if None not in bob else None,
+            "days": days if None not in days else None,
+            "created_at": created if None not in created else None,
+            "unparsed": unparsed,
+            "symbols": None,
+            "bloom": None,
+        }
+        if symbol_index >= 0:
+            if len(symbols) <= ZoneMap.SYMBOL_LIMIT:
+                zone["symbols"] = sorted(symbols)
+            else:
+                zone["bloom"] = ZoneMap._bloom(symbols)
+
+        Sidecar.save(path, ZoneMap.SUFFIX, stat, zone)
+        with ZoneMap._lock:
+            ZoneMap._built += 1
+        return dict(zone, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+    @staticmethod
+    def may_contain(path: Union[str, Path], column: Optional[str] = None, start_key: Optional[str] = None,
+                    end_key: Optional[str] = None, symbol: Optional[str] = None, build: bool = False) -> bool:
+        """
+        判断文件中是否可能有匹配的数据
+
+        Args:
+            path: CSV文件路径
+            column: 按哪个范围判断："bob"(分钟，时间比较键)、"days"(日线，日期比较键)、"created_at"(tick)，
+                    为None时不按时间判断
+            start_key: 开始时间的比较键，为None时不限制
+            end_key: 结束时间的比较键，为None时不限制
+            symbol: 种类代码，为None时不按symbol判断
+            build: zone map 不存在时是否同步生成，默认交给后台线程生成，本次不跳过
+        Returns:
+            可能有匹配的数据时返回True，一定没有时返回False
+        """
+        zone = ZoneMap.load(path, build)
+        if zone is None:
+            return True
+
+        result = ZoneMap.matches(zone, column, start_key, end_key, symbol)
+        with ZoneMap._lock:
+            ZoneMap._checked += 1
+            if not result:
+                ZoneMap._pruned += 1
+        return result
+
+    @staticmethod
+    def matches(zone: dict, column: Optional[str], start_key: Optional[str], end_key: Optional[str],
+                symbol: Optional[str]) -> bool:
+        """
+        根据 zone map 判断是否可能有匹配的数据，规则见 may_contain
+        """
+        if column is not None:
+            # tick 中无法解析时间的行总是被返回，有这样的行时不能按时间跳过
+            if column != "created_at" or not zone.get("unparsed"):
+                bounds = zone.get(column)
+                if bounds is None:
+                    # 没有可解析时间的行，查询不会返回任何数据
+                    return False
+                if start_key is not None and bounds[1] < start_key:
+                    return False
+                if end_key is not None and bounds[0] > end_key:
+                    return False
+
+        if symbol is not None:
+            if zone.get("symbols") is not None:
+                return symbol in zone["symbols"]
+            if zone.get("bloom") is not None:
+                return ZoneMap._bloom_contains(zone["bloom"], symbol)
+        return True
+
+    @staticmethod
+    def prune(paths: List[Path], symbol: Optional[str] = None, build: bool = False) -> Tuple[List[Path], int]:
+        """
+        去掉一定不包含该symbol的文件
+
+        Args:
+            paths: CSV文件路径列表
+            symbol: 种类代码，为空时不过滤
+            build: zone map 不存在时是否生成，默认只使用已有的附属文件
+        Returns:
+            (保留的文件路径列表, 跳过的文件数)
+        """
+        if not symbol or not ZoneMap.ENABLED:
+            return paths, 0
+        kept = [path for path in paths if ZoneMap.may_contain(path, symbol=symbol, build=build)]
+        return kept, len(paths) - len(kept)
+
+    @staticmethod
+    def stats() -> dict:
+        """
+        获取统计信息
+
+        Returns:
+            字典：checked(判断的文件数), pruned(跳过的文件数), built(生成的 zone map 数)
+        """
+        with ZoneMap._lock:
+            return {"checked": ZoneMap._checked, "pruned": ZoneMap._pruned, "built": ZoneMap._built}
+
+    @staticmethod
+    def _schedule(path: Union[str, Path]) -> None:
+        """
+        在后台线程中生成 zone map，同一文件同时只提交一次
+        """
+        if not ZoneMap.BACKGROUND:
+            return
+        key = str(path)
+        with ZoneMap._lock:
+            if key in ZoneMap._pending:
+                return
+            ZoneMap._pending.add(key)
+            if ZoneMap._background is None:
+                ZoneMap._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="zone-map")
+            background = ZoneMap._background
+
+        def run() -> None:
+            try:
+                ZoneMap.load(path, build=True)
+            finally:
+                with ZoneMap._lock:
+                    ZoneMap._pending.discard(key)
+
+        background.submit(run)
+
+    @staticmethod
+    def _lines(path: Union[str, Path]) -> Iterator[str]:
+        """
+        逐行读取数据行(不含表头)，文件内容在缓存中时直接从内存读取
+        """
+        partition = PartitionCache.rows(path, full=True)
+        if partition is not None:
+            yield from partition.lines
+            return
+        with DataFile.open_text(path) as f:
+            f.readline()
+            for raw in f:
+                yield raw.rstrip('\r\n')
+
+    @staticmethod
+    def _time_key(value: str) -> Optional[str]:
+        """
+        bob/eob 的比较键，按列式缓存的宽松规则解析(去掉首尾空白，只有日期时按当天0点)，
+        逐行过滤能解析的值这里一定能解析且结果相同，统计出的范围对两种过滤方式都成立
+        """
+        value = value.strip()
+        key = TimeFilter.time_key(value)
+        if key is None:
+            day = TimeFilter.date_key(value)
+            key = day + " 00:00:00" if day is not None else None
+        return key
+
+    @staticmethod
+    def _extend(bounds: list, low: Optional[str], high: Optional[str]) -> None:
+        """用一行的值更新 [最小值, 最大值]，无法解析的值不参与"""
+        if low is not None and (bounds[0] is None or low < bounds[0]):
+            bounds[0] = low
+        if high is not None and (bounds[1] is None or high > bounds[1]):
+            bounds[1] = high
+
+    @staticmethod
+    def _positions(symbol: str, bits: int) -> Iterator[int]:
+        """symbol在布隆过滤器中的位置(双重哈希)"""
+        digest = hashlib.blake2b(symbol.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        for i in range(ZoneMap.BLOOM_HASHES):
+            yield (h1 + i * h2) % bits
+
+    @staticmethod
+    def _bloom(symbols: set) -> str:
+        """生成布隆过滤器，以十六进制字符串表示"""
+        bits = bytearray(max(8, (len(symbols) * ZoneMap.BLOOM_BITS + 7) // 8))
+        for symbol in symbols:
+            for position in ZoneMap._positions(symbol, len(bits) * 8):
+                bits[position >> 3] |= 1 << (position & 7)
+        return bits.hex()
+
+    @staticmethod
+    def _bloom_contains(bloom: str, symbol: str) -> bool:
+        """布隆过滤器中是否可能有该symbol"""
+        bits = bytes.fromhex(bloom)
+        return all(bits[position >> 3] & (1 << (position & 7))
+                   for position in ZoneMap._positions(symbol, len(bits) * 8))
+
+
+# 预先生成：python -m vvtr_mcp_server.util.zone_map <type> [interval]
+if __name__ == "__main__":
+    for type_name in sys.argv[1:2] or sorted(os.listdir(CsvMerger.ROOT)):
+        type_root = Path(CsvMerger.ROOT) / type_name
+        if type_name.startswith(".") or not type_root.is_dir():
+            continue
+        for interval in sys.argv[2:3] or sorted(os.listdir(type_root)):
+            root = type_root / interval
+            paths = CsvMerger.find_csv_files_in_range(root, "00000000", "99999999") if root.is_dir() else []
+            count = sum(1 for csv_path in paths if ZoneMap.load(csv_path) is not None)
+            print(f"{root}: 已生成 {count} 个文件的zone map")